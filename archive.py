@@ -0,0 +1,754 @@
+# archive.py
+# 圖庫 (pages 資料夾) 的共用資料模型與後端操作，不依賴任何 GUI 元件。
+# manager.py、image_processor.py、exporter.py 及其他命令列工具都透過這個模組讀寫索引。
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import fnmatch
+import contextlib
+from tracing import span
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+INDEX_FILENAME = 'index.json'
+VEHICLE_INFO_KEYS = ("company", "year", "manufacturer", "model")
+DATE_IN_FILENAME = re.compile(r".*?_(\d{4}-\d{2}-\d{2})")
+# 等待其他程式釋放索引鎖定的上限 (秒)
+LOCK_TIMEOUT_SECONDS = 10
+# pages 資料夾的配置 (見 read_layout)，記錄在 pages 底下的隱藏檔中
+LAYOUT_FILENAME = '.layout.json'
+LAYOUT_FLAT = 'flat'  # pages/EAL-3100/
+LAYOUT_SHARDED = 'sharded'  # pages/EAL/EAL-3100/
+LAYOUT_COMPAT = 'compat'  # 兩種配置並存 (例如遷移到一半)，新的車牌資料夾建立在分片中
+LAYOUTS = (LAYOUT_FLAT, LAYOUT_SHARDED, LAYOUT_COMPAT)
+# 沒有 '-' 的車牌以前幾個字元作為分片名稱
+SHARD_PREFIX_LENGTH = 3
+# 各車牌的鎖定檔放在 pages 底下的這個隱藏資料夾中，而不是車牌資料夾內
+LOCKS_DIRNAME = '.locks'
+
+
+def load_pil_image():
+    """延遲匯入 PIL：只有在需要讀取圖片解析度時才載入。"""
+    from startup_profile import PROFILER
+    Image = PROFILER.import_module('PIL.Image')
+    Image.MAX_IMAGE_PIXELS = None
+    return Image
+
+
+def _intern(value):
+    """客運、廠牌等欄位在整個圖庫中大量重複，以 sys.intern 讓相同字串共用同一個物件。"""
+    return sys.intern(value) if isinstance(value, str) else sys.intern(str(value))
+
+
+# --- 資料紀錄 ---
+
+class Vehicle:
+    """主索引中的一輛車 (車牌為主索引字典的鍵，不存於紀錄中)。"""
+    __slots__ = VEHICLE_INFO_KEYS
+
+    def __init__(self, company="", year="", manufacturer="", model=""):
+        self.company = _intern(company)
+        self.year = _intern(year)
+        self.manufacturer = _intern(manufacturer)
+        self.model = _intern(model)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: data.get(key, "") for key in VEHICLE_INFO_KEYS})
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in VEHICLE_INFO_KEYS}
+
+    def is_complete(self):
+        """所有欄位皆已填寫 (不只包含空白字元)。"""
+        return all(getattr(self, key).strip() for key in VEHICLE_INFO_KEYS)
+
+    def __eq__(self, other):
+        if not isinstance(other, Vehicle):
+            return NotImplemented
+        return all(getattr(self, key) == getattr(other, key) for key in VEHICLE_INFO_KEYS)
+
+    def __repr__(self):
+        return f"Vehicle({', '.join(f'{key}={getattr(self, key)!r}' for key in VEHICLE_INFO_KEYS)})"
+
+
+class Photo:
+    """車輛圖片索引中的一張照片 (檔名為圖片索引字典的鍵，不存於紀錄中)。"""
+    __slots__ = ("date", "description", "width", "height")
+
+    def __init__(self, date="YYYY-MM-DD", description="", width=None, height=None):
+        self.date = _intern(date)
+        self.description = description
+        self.width = width
+        self.height = height
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("date", "YYYY-MM-DD"), data.get("description", ""),
+                   data.get("width"), data.get("height"))
+
+    def to_dict(self):
+        data = {"date": self.date, "description": self.description}
+        if self.width is not None and self.height is not None:
+            data["width"], data["height"] = self.width, self.height
+        return data
+
+    def __repr__(self):
+        return f"Photo(date={self.date!r}, description={self.description!r}, width={self.width}, height={self.height})"
+
+
+def empty_vehicle_info():
+    return Vehicle()
+
+
+def list_images(folder):
+    with span("os.listdir"):
+        return [f for f in os.listdir(folder) if f.lower().endswith(SUPPORTED_FORMATS)]
+
+
+def guess_date_from_filename(filename, default="YYYY-MM-DD"):
+    match = DATE_IN_FILENAME.match(filename)
+    return match.group(1) if match else default
+
+
+# --- 資料夾配置 ---
+
+_layouts = {}  # pages 資料夾的絕對路徑 -> 配置
+
+
+def read_layout(pages_dir):
+    """
+    回傳 pages 資料夾的配置 (LAYOUT_FLAT、LAYOUT_SHARDED 或 LAYOUT_COMPAT)；沒有配置檔時為 LAYOUT_FLAT。
+    每個程式只讀取一次，之後由記憶體回傳 (切換配置後需重新啟動其他工具，見 layout.py)。
+    """
+    key = os.path.abspath(pages_dir)
+    layout = _layouts.get(key)
+    if layout is None:
+        try:
+            with open(os.path.join(pages_dir, LAYOUT_FILENAME), 'r', encoding='utf-8') as f:
+                layout = json.load(f).get("layout")
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            layout = None
+        layout = layout if layout in LAYOUTS else LAYOUT_FLAT
+        _layouts[key] = layout
+    return layout
+
+
+def write_layout(pages_dir, layout):
+    if layout not in LAYOUTS:
+        raise ValueError(f"未知的資料夾配置 '{layout}'")
+    write_json_atomic(os.path.join(pages_dir, LAYOUT_FILENAME), {"layout": layout})
+    _layouts[os.path.abspath(pages_dir)] = layout
+
+
+def shard_name(plate):
+    """車牌所屬的分片：'-' 之前的部分 (EAL-3100 -> EAL)，沒有 '-' 時為前 SHARD_PREFIX_LENGTH 個字元。"""
+    prefix = plate.split('-', 1)[0] if '-' in plate else plate[:SHARD_PREFIX_LENGTH]
+    return prefix or '_'
+
+
+def plate_dir(pages_dir, plate, layout=None):
+    """
+    車牌資料夾的路徑。相容模式下優先使用分片中的資料夾，只有平面的資料夾存在時才回傳平面路徑，
+    兩者都不存在 (新車牌) 時回傳分片路徑。
+    """
+    layout = layout or read_layout(pages_dir)
+    if layout == LAYOUT_FLAT:
+        return os.path.join(pages_dir, plate)
+    sharded = os.path.join(pages_dir, shard_name(plate), plate)
+    if layout == LAYOUT_COMPAT and not os.path.isdir(sharded) and os.path.isdir(os.path.join(pages_dir, plate)):
+        return os.path.join(pages_dir, plate)
+    return sharded
+
+
+def image_path(pages_dir, plate, filename):
+    return os.path.join(plate_dir(pages_dir, plate), filename)
+
+
+def _subdirectories(path):
+    """列出子資料夾，略過隱藏資料夾 (例如 .locks)。"""
+    with os.scandir(path) as entries:
+        return {entry.name: entry.path for entry in entries if entry.is_dir() and not entry.name.startswith('.')}
+
+
+def scan_layout(pages_dir):
+    """
+    列出所有車牌資料夾，回傳 ({車牌: 資料夾路徑}, [分片資料夾路徑])。以 os.scandir 的檔案類型判斷資料夾，
+    不需對每個項目呼叫 os.path.isdir。相容模式下，名稱等於自身分片名稱且含有子資料夾的項目視為分片。
+    """
+    layout = read_layout(pages_dir)
+    plates, shards = {}, []
+    with span("os.scandir"):
+        for name, path in _subdirectories(pages_dir).items():
+            if layout == LAYOUT_FLAT:
+                plates[name] = path
+                continue
+            children = _subdirectories(path) if layout == LAYOUT_SHARDED or name == shard_name(name) else {}
+            if layout == LAYOUT_SHARDED or children:
+                shards.append(path)
+                for plate, child_path in children.items():
+                    # 相容模式下平面與分片中都有同一個車牌時，以分片中的為準 (與 plate_dir 相同)
+                    plates[plate] = child_path
+            else:
+                plates.setdefault(name, path)
+    return plates, shards
+
+
+def list_plate_dirs(pages_dir):
+    """回傳 {車牌: 資料夾路徑} (不論配置)。"""
+    return scan_layout(pages_dir)[0]
+
+
+def remove_empty_shard(pages_dir, plate):
+    """車牌資料夾被移走或刪除後，移除已經空了的分片資料夾 (平面配置下不做任何事)。"""
+    shard_path = os.path.join(pages_dir, shard_name(plate))
+    if read_layout(pages_dir) == LAYOUT_FLAT or not os.path.isdir(shard_path):
+        return
+    try:
+        os.rmdir(shard_path)
+    except OSError:
+        pass  # 還有其他車牌
+
+
+# --- 索引讀寫 ---
+
+def main_index_path(pages_dir):
+    return os.path.join(pages_dir, INDEX_FILENAME)
+
+
+def vehicle_index_path(pages_dir, plate):
+    return os.path.join(plate_dir(pages_dir, plate), INDEX_FILENAME)
+
+
+def parse_main_index(raw):
+    """將主索引的 JSON (字串或位元組) 轉為 {車牌: Vehicle}。"""
+    with span("json.load"):
+        return {plate: Vehicle.from_dict(info) for plate, info in json.loads(raw).items()}
+
+
+def parse_vehicle_index(raw):
+    """將車輛圖片索引的 JSON (字串或位元組) 轉為 {檔名: Photo}，保留原本的順序。"""
+    with span("json.load"):
+        return {filename: Photo.from_dict(info) for filename, info in json.loads(raw).items()}
+
+
+def read_main_index(pages_dir):
+    """讀取主索引；檔案不存在或損毀時拋出 FileNotFoundError / json.JSONDecodeError。"""
+    with open(main_index_path(pages_dir), 'rb') as f:
+        return parse_main_index(f.read())
+
+
+def write_json_atomic(path, data):
+    """先寫入同資料夾的暫存檔再以 os.replace 取代，中途失敗也不會留下寫到一半的索引檔。"""
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    try:
+        with span("json.dump"), open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_main_index(pages_dir, main_index_data):
+    """
+    依車牌排序後寫入主索引，回傳排序後的資料。寫入失敗時會拋出例外。
+    不會取得鎖定，與其他程式同時運作時應透過 ArchiveModel.write_vehicles() 寫入。
+    """
+    sorted_main_index_data = {key: main_index_data[key] for key in sorted(main_index_data.keys())}
+    serializable = {plate: vehicle.to_dict() for plate, vehicle in sorted_main_index_data.items()}
+    write_json_atomic(main_index_path(pages_dir), serializable)
+    return sorted_main_index_data
+
+
+def write_vehicle_index(pages_dir, plate, data):
+    """寫入車輛的圖片索引 (不會取得鎖定，見 ArchiveModel.write_photos())。"""
+    serializable = {filename: photo.to_dict() for filename, photo in data.items()}
+    write_json_atomic(vehicle_index_path(pages_dir, plate), serializable)
+
+
+def read_vehicle_index(pages_dir, plate):
+    """讀取車輛的圖片索引；檔案不存在或損毀時回傳空字典。"""
+    try:
+        with open(vehicle_index_path(pages_dir, plate), 'rb') as f:
+            return parse_vehicle_index(f.read())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+# --- 鎖定與合併 ---
+
+def _try_lock(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def _unlock(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def _lock_file(lock_path, target, timeout):
+    """以 lock_path 取得 target 的建議性鎖定；不可重入，超過 timeout 秒仍無法取得時拋出 TimeoutError。"""
+    deadline = time.monotonic() + timeout
+    with open(lock_path, 'a+b') as f:
+        while True:
+            try:
+                _try_lock(f)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"無法鎖定 '{target}'，可能有其他程式正在寫入。")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+
+def index_lock(path, timeout=LOCK_TIMEOUT_SECONDS):
+    """
+    取得索引檔的建議性鎖定 (同資料夾下的隱藏檔 '.index.json.lock')，讓多個程式不會同時「讀取-修改-寫入」同一個索引。
+    鎖定不可重入；超過 timeout 秒仍無法取得時拋出 TimeoutError。
+    """
+    return _lock_file(os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.lock"), path, timeout)
+
+
+def plate_lock(pages_dir, plate, timeout=LOCK_TIMEOUT_SECONDS):
+    """
+    鎖定單一車牌 (與其圖片索引共用同一個鎖)，例如在決定流水號並寫入圖片期間。
+    鎖定檔為 pages/.locks/<車牌>.lock 而不在車牌資料夾內：持有鎖定時仍可搬移或重命名車牌資料夾
+    (Windows 無法搬移含有已開啟檔案的資料夾)，等待中的程式取得的也一定是同一個鎖定檔。
+    """
+    locks_dir = os.path.join(pages_dir, LOCKS_DIRNAME)
+    os.makedirs(locks_dir, exist_ok=True)
+    return _lock_file(os.path.join(locks_dir, f"{plate}.lock"), vehicle_index_path(pages_dir, plate), timeout)
+
+
+def file_key(path):
+    """回傳檔案的 (mtime_ns, 大小)，用來判斷檔案是否被修改過；檔案不存在時回傳 None。"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def copy_records(records):
+    """複製一份 {鍵: 紀錄}，作為之後三方合併的基準 (紀錄可能會被就地修改)。"""
+    return {key: type(record).from_dict(record.to_dict()) for key, record in records.items()}
+
+
+def merge_records(base, ours, theirs):
+    """
+    三方合併索引 ({鍵: Vehicle 或 Photo})：base 為讀入時的內容，ours 為記憶體中修改後的內容，
+    theirs 為目前磁碟上 (其他程式寫入) 的內容。以欄位為單位，我們修改過的欄位採用我們的值，
+    其餘採用磁碟上的值；我們新增或刪除的項目照做，其他程式新增的項目保留。同一欄位兩邊都修改時以我們為準。
+    合併結果保留 ours 的順序，其他程式新增的項目接在最後。
+    """
+    merged = {}
+    for key, mine in ours.items():
+        original, their = base.get(key), theirs.get(key)
+        if their is None:
+            # 其他程式已刪除：只有我們新增或修改過的項目才保留
+            if original is None or mine.to_dict() != original.to_dict():
+                merged[key] = mine
+            continue
+        if original is None:
+            merged[key] = mine
+            continue
+        mine_fields, original_fields, their_fields = mine.to_dict(), original.to_dict(), their.to_dict()
+        fields = {name: mine_fields.get(name) if mine_fields.get(name) != original_fields.get(name)
+                  else their_fields.get(name)
+                  for name in mine_fields.keys() | their_fields.keys()}
+        fields = {name: value for name, value in fields.items() if value is not None}
+        merged[key] = mine if fields == mine_fields else type(mine).from_dict(fields)
+    for key, their in theirs.items():
+        if key not in merged and key not in base:
+            merged[key] = their
+    return merged
+
+
+def match_plates(plates, patterns):
+    """
+    回傳符合任一樣式的車牌 (依原順序)。樣式使用 fnmatch 語法 (例如 'EAL-*')，不分大小寫。
+    """
+    patterns = [pattern.upper() for pattern in patterns]
+    return [plate for plate in plates
+            if any(fnmatch.fnmatchcase(plate.upper(), pattern) for pattern in patterns)]
+
+
+# --- 索引與資料夾同步 ---
+
+def scan_main_index(pages_dir, main_index_data=None):
+    """
+    比對主索引與 pages 底下的車牌資料夾：補上新資料夾、移除已不存在的項目。
+    main_index_data 為已載入的主索引 (會被修改)；未提供時從檔案讀取。
+    回傳 (主索引資料, 是否需要寫回)，不會寫入檔案。
+    """
+    if not os.path.isdir(pages_dir): os.makedirs(pages_dir, exist_ok=True)
+    is_dirty = False
+    if main_index_data is None:
+        try:
+            main_index_data = read_main_index(pages_dir)
+        except (FileNotFoundError, json.JSONDecodeError):
+            main_index_data = {}
+            is_dirty = True
+
+    found_plates = set(list_plate_dirs(pages_dir))
+
+    for plate in found_plates:
+        if plate not in main_index_data:
+            main_index_data[plate] = empty_vehicle_info()
+            is_dirty = True
+
+    plates_to_remove = [plate for plate in main_index_data if plate not in found_plates]
+    if plates_to_remove:
+        for plate in plates_to_remove:
+            del main_index_data[plate]
+        is_dirty = True
+
+    return main_index_data, is_dirty
+
+
+def scan_vehicle_index(pages_dir, plate_folder, vehicle_data=None):
+    """
+    比對車輛的圖片索引與資料夾中的圖片：移除失效記錄、新增未記錄的圖片並補上解析度。
+    vehicle_data 為已載入的圖片索引 (會被修改)；未提供時從檔案讀取。
+    回傳 (圖片索引資料, 是否需要寫回)，不會寫入檔案。
+    """
+    vehicle_dir = plate_dir(pages_dir, plate_folder)
+    is_dirty = False
+    if vehicle_data is None:
+        try:
+            with open(vehicle_index_path(pages_dir, plate_folder), 'rb') as f:
+                vehicle_data = parse_vehicle_index(f.read())
+        except (FileNotFoundError, json.JSONDecodeError):
+            vehicle_data = {}
+            is_dirty = True
+
+    found_images_set = set(list_images(vehicle_dir))
+
+    images_to_remove = [img for img in vehicle_data if img not in found_images_set]
+    if images_to_remove:
+        for img in images_to_remove:
+            del vehicle_data[img]
+        is_dirty = True
+
+    for img_filename in sorted(list(found_images_set)):
+        entry = vehicle_data.get(img_filename)
+        if not entry:
+            entry = Photo(guess_date_from_filename(img_filename), "")
+            vehicle_data[img_filename] = entry
+            is_dirty = True
+
+        if entry.width is None or entry.height is None:
+            try:
+                with span("Image.open"), load_pil_image().open(os.path.join(vehicle_dir, img_filename)) as img:
+                    entry.width, entry.height = img.size
+                    is_dirty = True
+            except Exception as e:
+                print(f"警告：無法讀取圖片 '{img_filename}' 的解析度。錯誤: {e}")
+                entry.width, entry.height = 0, 0
+
+    return vehicle_data, is_dirty
+
+
+def sync_main_index(pages_dir):
+    """在鎖定下同步並在需要時寫回主索引，回傳最新的主索引資料。"""
+    if not os.path.isdir(pages_dir): os.makedirs(pages_dir, exist_ok=True)
+    with index_lock(main_index_path(pages_dir)):
+        main_index_data, is_dirty = scan_main_index(pages_dir)
+        if is_dirty:
+            main_index_data = write_main_index(pages_dir, main_index_data)
+    return main_index_data
+
+
+def sync_vehicle_index(pages_dir, plate_folder):
+    """在鎖定下同步並在需要時寫回車輛的圖片索引，回傳最新的圖片索引資料。"""
+    with plate_lock(pages_dir, plate_folder):
+        vehicle_data, is_dirty = scan_vehicle_index(pages_dir, plate_folder)
+        if is_dirty:
+            write_vehicle_index(pages_dir, plate_folder, vehicle_data)
+    return vehicle_data
+
+
+# --- 車牌資料夾操作 ---
+
+def rename_plate_folder(pages_dir, old_name, new_name):
+    """重命名車牌資料夾，並將其中 'OLD_...' 開頭的圖片改為 'NEW_...'。不更新任何索引。"""
+    new_path = plate_dir(pages_dir, new_name)
+    # 1. 重命名實體資料夾 (分片配置下可能移到另一個分片)
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    os.rename(plate_dir(pages_dir, old_name), new_path)
+    remove_empty_shard(pages_dir, old_name)
+
+    # 2. 重命名資料夾內的所有圖片 (檔名格式為 PLATE_YYYY-MM-DD_NN.ext)
+    for filename in list_images(new_path):
+        if filename.startswith(old_name + '_'):
+            new_filename = new_name + filename[len(old_name):]
+            os.rename(os.path.join(new_path, filename), os.path.join(new_path, new_filename))
+
+
+def merge_plate_folders(pages_dir, old_name, new_name):
+    """
+    將一個車牌的圖片合併到另一個車牌，刪除舊資料夾，並依拍攝日期重新編號目標資料夾中的所有圖片。
+    不更新任何索引，呼叫端需自行同步。
+    """
+    old_path = plate_dir(pages_dir, old_name)
+    new_path = plate_dir(pages_dir, new_name)
+
+    # 1. 將所有圖片檔案從舊資料夾移動到新資料夾
+    for filename in list_images(old_path):
+        shutil.move(os.path.join(old_path, filename), os.path.join(new_path, filename))
+
+    # 2. 刪除舊資料夾
+    shutil.rmtree(old_path)
+    remove_empty_shard(pages_dir, old_name)
+
+    # 3. 重新編號目標資料夾中的所有圖片
+    all_images = list_images(new_path)
+
+    # 為了避免在重新命名時發生衝突 (例如 A->B, B->C)，我們先將所有檔案重命名為暫存名稱
+    temp_suffix = "_TEMP_RENAME_"
+    for filename in all_images:
+        try:
+            os.rename(os.path.join(new_path, filename), os.path.join(new_path, filename + temp_suffix))
+        except FileExistsError: # 如果暫存檔已存在，則使用更獨特的名稱
+            os.rename(os.path.join(new_path, filename), os.path.join(new_path, filename + temp_suffix + os.urandom(4).hex()))
+
+    temp_images = [f for f in os.listdir(new_path) if temp_suffix in f]
+    date_groups = {}
+
+    # 根據原始檔名中的日期對暫存檔案進行分組
+    for temp_filename in temp_images:
+        original_name = temp_filename.split(temp_suffix)[0]
+        date_key = guess_date_from_filename(original_name, "unknown_date")
+        date_groups.setdefault(date_key, []).append(temp_filename)
+
+    # 在每個日期組內對檔案進行排序並重命名
+    for date, files in date_groups.items():
+        # 對於無法解析日期的檔案，為安全起見僅還原其原始名稱
+        if date == "unknown_date":
+            print(f"警告：在 '{new_name}' 中發現無法解析日期的檔案，將跳過重新編號：{[f.split(temp_suffix)[0] for f in files]}")
+            for temp_filename in files:
+                original_name = temp_filename.split(temp_suffix)[0]
+                os.rename(os.path.join(new_path, temp_filename), os.path.join(new_path, original_name))
+            continue
+
+        # 排序以確保重新編號順序的一致性
+        for i, temp_filename in enumerate(sorted(files), 1):
+            original_name = temp_filename.split(temp_suffix)[0]
+            _, ext = os.path.splitext(original_name)
+            # 建立新的標準化檔名
+            new_filename = f"{new_name}_{date}_{i:02d}{ext.lower()}"
+            os.rename(os.path.join(new_path, temp_filename), os.path.join(new_path, new_filename))
+
+
+# --- 共用資料模型 ---
+
+class ArchiveModel:
+    """
+    整個圖庫的記憶體模型：主索引 (vehicles) 與延遲載入的各車輛圖片索引快取。
+    車輛圖片索引以檔案的 (mtime_ns, 大小) 作為快取鍵，檔案在外部被修改時會自動重新讀取；
+    同一輛車重複選取時只需要一次 os.stat，不會重新讀取與解析 JSON。
+    透過本模型寫入的索引會立即更新快取，不需重新讀取。
+    寫入時會鎖定索引檔；若索引在讀入後已被其他程式 (例如另一台電腦上的 image_processor.py) 修改，
+    會先與磁碟上的版本合併 (見 merge_records) 再寫入，不會覆蓋掉對方的變更。
+    """
+
+    def __init__(self, pages_dir):
+        self.pages_dir = pages_dir
+        self.vehicles = {}
+        self._vehicles_base = (None, {})  # 主索引讀入 (或寫入) 時的 ((mtime_ns, size), {車牌: Vehicle})
+        self._photo_cache = {}  # 車牌 -> ((mtime_ns, size), {檔名: Photo}, 讀入時的 {檔名: Photo})
+
+    # --- 主索引 ---
+
+    def _read_vehicles(self):
+        """讀取主索引並記錄檔案狀態作為合併基準，回傳是否讀取成功。"""
+        path = main_index_path(self.pages_dir)
+        key = file_key(path)
+        try:
+            self.vehicles = read_main_index(self.pages_dir)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.vehicles = {}
+            self._vehicles_base = (key, {})
+            return False
+        # Vehicle 不會被就地修改，淺複製即可作為合併基準
+        self._vehicles_base = (key, dict(self.vehicles))
+        return True
+
+    def load_vehicles(self, strict=False):
+        """讀取主索引；檔案不存在或損毀時視為空的主索引 (strict 為 True 時改為拋出例外)。"""
+        if not self._read_vehicles() and strict:
+            read_main_index(self.pages_dir)
+        return self.vehicles
+
+    def scan_vehicles(self):
+        """與 pages 底下的資料夾比對，回傳是否需要寫回 (不寫入檔案)。"""
+        if not os.path.isdir(self.pages_dir): os.makedirs(self.pages_dir, exist_ok=True)
+        is_valid = self._read_vehicles()
+        self.vehicles, is_dirty = scan_main_index(self.pages_dir, self.vehicles)
+        return is_dirty or not is_valid
+
+    def sync_vehicles(self):
+        if self.scan_vehicles():
+            self.write_vehicles()
+        return self.vehicles
+
+    def write_vehicles(self):
+        """
+        在鎖定下寫入主索引並保持 vehicles 依車牌排序；主索引在讀入後被其他程式修改時先合併再寫入。
+        寫入失敗時會拋出例外。
+        """
+        path = main_index_path(self.pages_dir)
+        with index_lock(path):
+            vehicles = self.vehicles
+            base_key, base = self._vehicles_base
+            if file_key(path) != base_key:
+                try:
+                    theirs = read_main_index(self.pages_dir)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    theirs = {}
+                vehicles = merge_records(base, vehicles, theirs)
+            self.vehicles = write_main_index(self.pages_dir, vehicles)
+            self._vehicles_base = (file_key(path), dict(self.vehicles))
+
+    def update_vehicles(self, plates, fields):
+        """
+        將 fields ({欄位: 值}，只含要變更的欄位) 套用到多輛車，全部變更只寫入一次主索引。
+        寫入失敗時拋出例外，記憶體中的資料維持不變。回傳實際有變動的車牌列表。
+        """
+        unknown = set(fields) - set(VEHICLE_INFO_KEYS)
+        if unknown:
+            raise ValueError(f"未知的欄位：{', '.join(sorted(unknown))}")
+        updated = dict(self.vehicles)
+        changed = []
+        for plate in plates:
+            current = updated.get(plate)
+            if current is None:
+                continue
+            new_vehicle = Vehicle.from_dict({**current.to_dict(), **fields})
+            if new_vehicle != current:
+                updated[plate] = new_vehicle
+                changed.append(plate)
+        if changed:
+            previous, self.vehicles = self.vehicles, updated
+            try:
+                self.write_vehicles()
+            except Exception:
+                self.vehicles = previous
+                raise
+        return changed
+
+    # --- 車輛圖片索引 ---
+
+    def _stat_key(self, plate):
+        return file_key(vehicle_index_path(self.pages_dir, plate))
+
+    def _read_photos(self, plate, key):
+        """從檔案讀取圖片索引並放入快取，回傳 (圖片索引, 是否讀取成功)。"""
+        try:
+            with open(vehicle_index_path(self.pages_dir, plate), 'rb') as f:
+                photos = parse_vehicle_index(f.read())
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._photo_cache.pop(plate, None)
+            return {}, False
+        if key is not None:
+            self._photo_cache[plate] = (key, photos, copy_records(photos))
+        return photos, True
+
+    def photos(self, plate):
+        """
+        回傳車輛的圖片索引 {檔名: Photo}；索引檔自上次讀取後未變動時直接使用快取。
+        回傳的字典為快取本身，呼叫端修改後應以 write_photos() 寫回。
+        """
+        key = self._stat_key(plate)
+        cached = self._photo_cache.get(plate)
+        if cached is not None and key is not None and cached[0] == key:
+            return cached[1]
+        return self._read_photos(plate, key)[0]
+
+    def scan_photos(self, plate):
+        """
+        與資料夾中的圖片比對 (見 scan_vehicle_index)，回傳 (圖片索引, 是否需要寫回)。
+        索引檔未變動時以快取為基礎比對，省去讀取與解析 JSON。
+        """
+        key = self._stat_key(plate)
+        cached = self._photo_cache.get(plate)
+        if cached is not None and key is not None and cached[0] == key:
+            return scan_vehicle_index(self.pages_dir, plate, cached[1])
+        photos, is_valid = self._read_photos(plate, key)
+        photos, is_dirty = scan_vehicle_index(self.pages_dir, plate, photos)
+        return photos, is_dirty or not is_valid
+
+    def sync_photos(self, plate):
+        photos, is_dirty = self.scan_photos(plate)
+        if is_dirty:
+            self.write_photos(plate, photos)
+        return photos
+
+    def write_photos(self, plate, photos):
+        """
+        在鎖定下寫入車輛的圖片索引並以寫入後的檔案狀態更新快取。
+        索引在讀入後被其他程式修改時先合併，photos 會就地更新為合併後的內容。
+        寫入失敗時會拋出例外並清除快取。
+        """
+        cached = self._photo_cache.get(plate)
+        try:
+            with plate_lock(self.pages_dir, plate):
+                key = self._stat_key(plate)
+                if key is not None and (cached is None or cached[0] != key):
+                    merged = merge_records(cached[2] if cached else {}, photos,
+                                           read_vehicle_index(self.pages_dir, plate))
+                    photos.clear()
+                    photos.update(merged)
+                write_vehicle_index(self.pages_dir, plate, photos)
+                key = self._stat_key(plate)
+        except Exception:
+            self._photo_cache.pop(plate, None)
+            raise
+        if key is not None:
+            self._photo_cache[plate] = (key, photos, copy_records(photos))
+
+    def invalidate(self, plate=None):
+        """清除指定車輛 (或全部) 的圖片索引快取，例如資料夾被重命名或合併之後。"""
+        if plate is None:
+            self._photo_cache.clear()
+        else:
+            self._photo_cache.pop(plate, None)
+
+    def next_sequence(self, plate, date):
+        """
+        回傳指定車輛在某一天的下一個可用流水號。
+        同時檢查索引與資料夾中的實際檔案，避免覆寫尚未同步進索引的圖片。
+        """
+        prefix = f"{plate}_{date}_"
+        names = set(self.photos(plate))
+        folder = plate_dir(self.pages_dir, plate)
+        if os.path.isdir(folder):
+            names.update(list_images(folder))
+        highest = 0
+        for name in names:
+            if name.startswith(prefix):
+                number = os.path.splitext(name[len(prefix):])[0]
+                if number.isdigit():
+                    highest = max(highest, int(number))
+        return highest + 1
@@ -0,0 +1,268 @@
+# benchmark.py
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import datetime
+import statistics
+import contextlib
+
+# 本腳本不建立任何視窗，可在沒有顯示器的環境執行
+import archive
+import export_async
+from widgets import SortedFilterModel
+
+SCALES = {"1k": 1000, "10k": 10000, "100k": 100000}
+COMPANIES = ["國光客運", "指南客運", "桃園客運", "中壢客運", "三重客運", "首都客運", "大都會客運", "新竹客運"]
+MANUFACTURERS = [("日野 HINO", "RK8JRSA"), ("金龍 KINGLONG", "KL6112U1"), ("大宇 DAEWOO", "BH115K"),
+                 ("富豪 VOLVO", "B7RLE"), ("成運 MBUS", "MB120NSE"), ("賓士 BENZ", "O500")]
+PLATE_PREFIXES = ["EAL", "EAA", "KKA", "KKB", "FAA", "AAC", "U6", "FX"]
+
+
+def make_image_bytes(width, height):
+    """產生一張指定尺寸的 JPEG，所有合成照片共用同一份內容以加快產生速度。"""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (90, 120, 160)).save(buffer, 'JPEG', quality=80)
+    return buffer.getvalue()
+
+
+def generate_archive(pages_dir, plates, photos_per_plate, image_size, seed=0, with_vehicle_indexes=True):
+    """
+    產生合成的 pages 資料夾：主索引、每輛車的資料夾、圖片與 (選用的) 車輛索引。
+    回傳產生的車牌列表與所有照片使用的日期。
+    """
+    rng = random.Random(seed)
+    image_bytes = make_image_bytes(*image_size)
+    os.makedirs(pages_dir, exist_ok=True)
+    start_date = datetime.date(2024, 1, 1)
+
+    main_index_data = {}
+    dates_used = set()
+    plate_names = []
+    for i in range(plates):
+        plate = f"{PLATE_PREFIXES[i % len(PLATE_PREFIXES)]}-{1000 + i}"
+        plate_names.append(plate)
+        manufacturer, model = rng.choice(MANUFACTURERS)
+        main_index_data[plate] = archive.Vehicle(
+            rng.choice(COMPANIES), str(rng.randint(2008, 2025)), manufacturer, model)
+
+        plate_dir = os.path.join(pages_dir, plate)
+        os.makedirs(plate_dir, exist_ok=True)
+        vehicle_data = {}
+        counters = {}
+        for _ in range(photos_per_plate):
+            shot_date = (start_date + datetime.timedelta(days=rng.randint(0, 700))).isoformat()
+            dates_used.add(shot_date)
+            counters[shot_date] = counters.get(shot_date, 0) + 1
+            filename = f"{plate}_{shot_date}_{counters[shot_date]:02d}.jpg"
+            with open(os.path.join(plate_dir, filename), 'wb') as f:
+                f.write(image_bytes)
+            vehicle_data[filename] = archive.Photo(shot_date, "", image_size[0], image_size[1])
+        if with_vehicle_indexes:
+            archive.write_vehicle_index(pages_dir, plate, vehicle_data)
+
+    archive.write_main_index(pages_dir, main_index_data)
+    return plate_names, sorted(dates_used)
+
+
+def run_timed(func, repeat, setup=None):
+    """執行 func 數次並回傳每次的耗時 (秒)；setup 在每次計時之前執行，不列入計時。"""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def summarize(runs, items=None):
+    result = {
+        "runs": [round(r, 6) for r in runs],
+        "min": round(min(runs), 6),
+        "median": round(statistics.median(runs), 6),
+        "mean": round(statistics.fmean(runs), 6),
+    }
+    if items:
+        result["items"] = items
+        result["per_item_us"] = round(min(runs) / items * 1e6, 3)
+    return result
+
+
+def run_benchmarks(workdir, plates, photos_per_plate, image_size, repeat, seed=0):
+    pages_dir = os.path.join(workdir, "pages")
+    out_dir = os.path.join(workdir, "out")
+    rng = random.Random(seed + 1)
+    results = {}
+
+    start = time.perf_counter()
+    plate_names, dates = generate_archive(pages_dir, plates, photos_per_plate, image_size, seed)
+    generation_seconds = time.perf_counter() - start
+
+    # --- 同步主索引 (無變動的熱路徑) ---
+    results["sync_main_index"] = summarize(
+        run_timed(lambda: archive.sync_main_index(pages_dir), repeat), plates)
+
+    # --- 同步所有車輛索引 (索引已是最新) ---
+    def sync_all():
+        for plate in plate_names:
+            archive.sync_vehicle_index(pages_dir, plate)
+    results["sync_vehicle_index_warm"] = summarize(run_timed(sync_all, repeat), plates)
+
+    # --- 重複選取車牌：第一次讀取索引檔，之後只需 os.stat 檢查快取 ---
+    archive_model = archive.ArchiveModel(pages_dir)
+
+    def select_all():
+        for plate in plate_names:
+            archive_model.photos(plate)
+    results["select_plate_uncached"] = summarize(
+        run_timed(select_all, repeat, setup=archive_model.invalidate), plates)
+    results["select_plate_cached"] = summarize(run_timed(select_all, repeat), plates)
+
+    # --- 同步缺少索引的車輛 (需讀取圖片解析度並寫入索引) ---
+    cold_plates = rng.sample(plate_names, min(len(plate_names), 200))
+
+    def remove_cold_indexes():
+        for plate in cold_plates:
+            path = archive.vehicle_index_path(pages_dir, plate)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def sync_cold():
+        for plate in cold_plates:
+            archive.sync_vehicle_index(pages_dir, plate)
+    results["sync_vehicle_index_cold"] = summarize(
+        run_timed(sync_cold, repeat, setup=remove_cold_indexes), len(cold_plates))
+
+    # --- 搜尋車牌：模擬逐字輸入與清除 ---
+    main_index_data = archive.sync_main_index(pages_dir)
+    sample_plate = rng.choice(plate_names)
+    typed_terms = [sample_plate[:n] for n in range(1, len(sample_plate) + 1)] + [""]
+    model = SortedFilterModel(main_index_data.keys())
+
+    def search():
+        for term in typed_terms:
+            model.set_filter(term)
+    results["filter_plates"] = summarize(run_timed(search, repeat), len(typed_terms))
+
+    def model_insert_remove():
+        for plate in cold_plates:
+            model.remove(plate)
+        for plate in cold_plates:
+            model.insert(plate)
+    results["plate_list_insert_remove"] = summarize(run_timed(model_insert_remove, repeat), len(cold_plates) * 2)
+
+    # --- 合併車牌：每次將一對車牌合併後同步目標索引 ---
+    merge_pairs = []
+    candidates = [p for p in plate_names if p not in cold_plates]
+    rng.shuffle(candidates)
+    for _ in range(repeat):
+        if len(candidates) < 2:
+            break
+        merge_pairs.append((candidates.pop(), candidates.pop()))
+    merge_runs = []
+    for old_name, new_name in merge_pairs:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            archive.merge_plate_folders(pages_dir, old_name, new_name)
+            archive.sync_vehicle_index(pages_dir, new_name)
+        merge_runs.append(time.perf_counter() - start)
+    if merge_runs:
+        results["merge_plates"] = summarize(merge_runs)
+    archive.sync_main_index(pages_dir)
+
+    # --- 匯出某一天的照片 ---
+    export_date = rng.choice(dates)
+
+    def clear_output():
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    exported = {}
+
+    def export():
+        exported["count"] = export_async.run_export(export_date, pages_dir=pages_dir, output_dir=out_dir)
+    results["export_by_date"] = summarize(run_timed(export, repeat, setup=clear_output))
+    results["export_by_date"]["photos"] = exported.get("count", 0)
+
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "plates": plates,
+            "photos_per_plate": photos_per_plate,
+            "image_size": list(image_size),
+            "repeat": repeat,
+            "seed": seed,
+            "generation_seconds": round(generation_seconds, 3),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline_path):
+    """將本次結果與先前的 JSON 結果比較 (以最小值為準)。"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"-- 與 '{baseline_path}' 比較 (最小值，<1.00 代表變快) --", file=sys.stderr)
+    for name, result in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            print(f"  {name:<28} (新項目)", file=sys.stderr)
+            continue
+        ratio = result["min"] / old["min"] if old["min"] else float('inf')
+        print(f"  {name:<28} {old['min'] * 1000:10.2f} ms -> {result['min'] * 1000:10.2f} ms  x{ratio:.2f}", file=sys.stderr)
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以合成的圖庫量測 manager 後端操作與 exporter 的效能。")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k", help="車牌數量級 (預設 1k)")
+    parser.add_argument("--plates", type=int, help="直接指定車牌數量 (會覆蓋 --scale)")
+    parser.add_argument("--photos-per-plate", type=int, default=3, help="每輛車的照片數 (預設 3)")
+    parser.add_argument("--image-size", type=parse_size, default=(64, 48), help="合成圖片尺寸，例如 640x480 (預設 64x48)")
+    parser.add_argument("--repeat", type=int, default=3, help="每個項目重複次數 (預設 3)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="產生合成圖庫的資料夾 (預設使用暫存資料夾，結束後刪除)")
+    parser.add_argument("--output", help="將結果寫入此 JSON 檔")
+    parser.add_argument("--compare", help="與先前輸出的 JSON 結果比較")
+    args = parser.parse_args()
+
+    plates = args.plates or SCALES[args.scale]
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        workdir, cleanup = args.workdir, False
+    else:
+        workdir, cleanup = tempfile.mkdtemp(prefix="bus_gallery_bench_"), True
+
+    print(f"正在產生 {plates} 個車牌、每車 {args.photos_per_plate} 張照片的合成圖庫於 '{workdir}'...", file=sys.stderr)
+    try:
+        result = run_benchmarks(workdir, plates, args.photos_per_plate, args.image_size, args.repeat, args.seed)
+    finally:
+        if cleanup:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(result, indent=4, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=4, ensure_ascii=False)
+        print(f"結果已寫入 '{os.path.abspath(args.output)}'。", file=sys.stderr)
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
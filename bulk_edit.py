@@ -0,0 +1,66 @@
+# bulk_edit.py
+import os
+import sys
+import json
+import argparse
+import archive
+
+# --- 常數設定 ---
+# 假設此腳本與 manager.py 在同一個目錄下
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(SCRIPT_DIR, "pages")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="批次修改多輛車的主索引資訊，所有變更只寫入一次主索引。",
+        epilog="範例：python bulk_edit.py 'EAL-*' 'EAA-01*' --company 國光客運 --manufacturer '日野 HINO'")
+    parser.add_argument("patterns", nargs='+', help="車牌或 fnmatch 樣式 (例如 EAL-*)，不分大小寫")
+    parser.add_argument("--company", help="客運")
+    parser.add_argument("--year", help="年份")
+    parser.add_argument("--manufacturer", help="廠牌")
+    parser.add_argument("--model", help="型號")
+    parser.add_argument("--dry-run", action="store_true", help="只列出會變更的車牌，不寫入檔案")
+    args = parser.parse_args(argv)
+
+    fields = {key: getattr(args, key).strip() for key in archive.VEHICLE_INFO_KEYS if getattr(args, key) is not None}
+    if not fields:
+        parser.error("請至少指定一個要修改的欄位 (--company / --year / --manufacturer / --model)。")
+
+    model = archive.ArchiveModel(PAGES_DIR)
+    try:
+        vehicles = model.load_vehicles(strict=True)
+    except FileNotFoundError:
+        print(f"錯誤：找不到主索引檔 '{archive.main_index_path(PAGES_DIR)}'。")
+        return 1
+    except json.JSONDecodeError:
+        print(f"錯誤：主索引檔 '{archive.main_index_path(PAGES_DIR)}' 格式損毀，無法解析。")
+        return 1
+
+    plates = archive.match_plates(vehicles.keys(), args.patterns)
+    if not plates:
+        print("沒有任何車牌符合指定的樣式。")
+        return 1
+
+    if args.dry_run:
+        for plate in plates:
+            current = vehicles[plate].to_dict()
+            changes = [f"{key}: '{current[key]}' -> '{value}'" for key, value in fields.items() if current[key] != value]
+            if changes:
+                print(f"  {plate}: {', '.join(changes)}")
+        print(f"(試執行) 符合 {len(plates)} 個車牌，未寫入任何檔案。")
+        return 0
+
+    try:
+        changed = model.update_vehicles(plates, fields)
+    except OSError as e:
+        print(f"錯誤：無法寫入主索引檔案: {e}")
+        return 1
+    for plate in changed:
+        print(f"  > 已更新: {plate}")
+    print(f"符合 {len(plates)} 個車牌，其中 {len(changed)} 個有變更。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+# export_async.py
+# 以 asyncio 實作的日期匯出，可作為函式庫嵌入其他程式 (例如上傳工具)，也是 exporter.py --date 使用的實作。
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import archive
+import exporter
+from tracing import span
+
+# 同時進行的檔案操作 (讀取索引、檢查檔案、複製) 上限
+DEFAULT_CONCURRENCY = 8
+STAGING_PREFIX = ".export-"
+
+
+class ExportProgress:
+    """
+    匯出進度事件。phase 為 'scan' (仍在讀取車輛索引，總數會持續增加)、'copy' (總數已確定)、
+    'commit' (所有檔案已複製，正在移入輸出資料夾) 或 'done'。
+    """
+    __slots__ = ("phase", "plates_done", "plates_total", "files_done", "files_total",
+                 "bytes_done", "bytes_total", "elapsed", "current")
+
+    def __init__(self, plates_total=0):
+        self.phase = "scan"
+        self.plates_done, self.plates_total = 0, plates_total
+        self.files_done = self.files_total = 0
+        self.bytes_done = self.bytes_total = 0
+        self.elapsed = 0.0
+        self.current = None
+
+    @property
+    def eta(self):
+        """以目前的平均速度估計剩餘秒數；總數尚未確定或還沒有複製任何資料時為 None。"""
+        if self.phase == "scan" or not self.bytes_done or not self.elapsed:
+            return None
+        return (self.bytes_total - self.bytes_done) / (self.bytes_done / self.elapsed)
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["eta"] = self.eta
+        return data
+
+
+class ExportResult:
+    __slots__ = ("copied", "missing", "errors", "info_file")
+
+    def __init__(self):
+        self.copied = []  # 匯出的檔名
+        self.missing = []  # 索引中有記錄但找不到實體檔案的檔名
+        self.errors = []  # (檔名, 例外)
+        self.info_file = None
+
+
+async def export_by_date_async(target_date, pages_dir=exporter.PAGES_DIR, output_dir=exporter.OUTPUT_DIR,
+                               concurrency=DEFAULT_CONCURRENCY, on_progress=None):
+    """
+    匯出指定拍攝日期的照片與 'out.txt'，回傳 ExportResult：
+    1. 各車輛索引的讀取、來源檔案的檢查與複製在執行緒池中重疊進行，同時進行的操作不超過 concurrency 個。
+    2. 檔案先複製到輸出資料夾中的隱藏暫存資料夾，全部完成後才一次移入並寫入 'out.txt'，
+       這個步驟中沒有任何 await，不會被取消打斷。
+    3. 被取消 (或發生未預期的錯誤) 時等待進行中的複製結束並刪除暫存資料夾，輸出資料夾維持匯出前的內容。
+    on_progress 為接收 ExportProgress 的函數，在事件迴圈的執行緒中呼叫。
+    找不到主索引或主索引損毀時拋出 FileNotFoundError / json.JSONDecodeError。
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="export")
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.monotonic()
+    target_bytes = target_date.encode('ascii')
+    result = ExportResult()
+    vehicles_with_photos = {}
+
+    async def run(func, *args):
+        async with semaphore:
+            return await loop.run_in_executor(executor, func, *args)
+
+    def report(current=None):
+        progress.elapsed = time.monotonic() - started
+        progress.current = current
+        if on_progress:
+            on_progress(progress)
+
+    # 以下函數在工作執行緒中執行；區段名稱與同步版本的匯出相同，追蹤檔中的直方圖可以直接比較
+    def read_bytes(path):
+        try:
+            with span("index.read"), open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def stat_file(path):
+        with span("os.stat"):
+            return os.stat(path)
+
+    def copy_file(source_path, dest_path):
+        try:
+            with span("shutil.copy2"):
+                shutil.copy2(source_path, dest_path)
+        except BaseException:
+            # 複製失敗時刪除寫到一半的檔案，暫存資料夾中只留下完整的照片
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            raise
+
+    def discard_staging():
+        # 取消時仍有複製在執行緒中進行，等它們結束後才能刪除暫存資料夾
+        executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    async def copy_photo(plate, vehicle_info, source_path, name):
+        try:
+            size = (await run(stat_file, source_path)).st_size
+        except FileNotFoundError:
+            result.missing.append(name)
+            return
+        progress.files_total += 1
+        progress.bytes_total += size
+        try:
+            await run(copy_file, source_path, os.path.join(staging_dir, name))
+        except OSError as e:
+            result.errors.append((name, e))
+            return
+        result.copied.append(name)
+        vehicles_with_photos.setdefault(plate, vehicle_info)
+        progress.files_done += 1
+        progress.bytes_done += size
+        report(name)
+
+    async def export_plate(plate, vehicle_info):
+        raw_index = await run(read_bytes, archive.vehicle_index_path(pages_dir, plate))
+        progress.plates_done += 1
+        if progress.plates_done == progress.plates_total:
+            progress.phase = "copy"
+        # 先以位元組搜尋日期字串，沒有出現目標日期的索引檔就不需要解析 JSON
+        if not raw_index or target_bytes not in raw_index:
+            return
+        try:
+            photos = archive.parse_vehicle_index(raw_index)
+        except json.JSONDecodeError as e:
+            result.errors.append((archive.vehicle_index_path(pages_dir, plate), e))
+            return
+        vehicle_dir = archive.plate_dir(pages_dir, plate)
+        await asyncio.gather(*(copy_photo(plate, vehicle_info, os.path.join(vehicle_dir, name), name)
+                               for name, photo in photos.items() if photo.date == target_date))
+
+    # 執行緒池在任何情況下 (包括讀取主索引失敗) 都會在離開時關閉
+    try:
+        main_index_data = await loop.run_in_executor(executor, archive.read_main_index, pages_dir)
+        progress = ExportProgress(len(main_index_data))
+        os.makedirs(output_dir, exist_ok=True)
+        staging_dir = os.path.join(output_dir, f"{STAGING_PREFIX}{os.getpid()}-{int(started * 1000)}")
+        os.makedirs(staging_dir)
+        try:
+            await asyncio.gather(*(export_plate(plate, info) for plate, info in main_index_data.items()))
+            progress.phase = "commit"
+            report()
+            if result.copied:
+                exporter.write_info_file(os.path.join(staging_dir, "out.txt"),
+                                         [(plate, info, exporter.format_output_date(target_date))
+                                          for plate, info in vehicles_with_photos.items()])
+                for name in result.copied + ["out.txt"]:
+                    os.replace(os.path.join(staging_dir, name), os.path.join(output_dir, name))
+                result.info_file = os.path.join(output_dir, "out.txt")
+            # 照片已全部移入輸出資料夾，暫存資料夾中即使有殘留的檔案也不影響結果
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        except BaseException:
+            # 在另一個執行緒中等待並清理，不會卡住事件迴圈；shield 確保再次被取消時清理仍會完成
+            # (asyncio.run 結束前會等待預設執行緒池中的工作)
+            await asyncio.shield(loop.run_in_executor(None, discard_staging))
+            raise
+    finally:
+        executor.shutdown(wait=False)
+    progress.phase = "done"
+    report()
+    return result
+
+
+def format_progress(progress):
+    """命令列顯示用的單行進度。"""
+    line = f"{progress.files_done}/{progress.files_total} 張，{progress.bytes_done / 1048576:.1f} MB"
+    if progress.phase == "scan":
+        line += f" (已讀取 {progress.plates_done}/{progress.plates_total} 個車輛索引)"
+    elif progress.eta is not None:
+        line += f"，剩餘約 {progress.eta:.0f} 秒"
+    return line
+
+
+def run_export(target_date, pages_dir=exporter.PAGES_DIR, output_dir=exporter.OUTPUT_DIR,
+               concurrency=DEFAULT_CONCURRENCY):
+    """命令列入口：以單行進度取代逐檔輸出，按 Ctrl+C 取消時輸出資料夾維持原狀。回傳匯出的照片數。"""
+    main_index_file = archive.main_index_path(pages_dir)
+    print(f"\n正在搜尋拍攝日期為 '{target_date}' 的所有照片...")
+
+    def show(progress):
+        # 以空白補齊，較短的一行不會殘留上一行的尾端
+        print(f"\r  {format_progress(progress):<60}", end="", flush=True)
+
+    try:
+        result = asyncio.run(export_by_date_async(target_date, pages_dir, output_dir, concurrency, show))
+    except json.JSONDecodeError:
+        print(f"錯誤：主索引檔 '{main_index_file}' 格式損毀，無法解析。")
+        return 0
+    except KeyboardInterrupt:
+        print("\n已取消匯出，輸出資料夾未被修改。")
+        return 0
+    except OSError as e:
+        if isinstance(e, FileNotFoundError) and e.filename == main_index_file:
+            print(f"錯誤：找不到主索引檔 '{main_index_file}'。")
+            print("請確認此腳本是否與 manager.py 在同一個資料夾，且 'pages' 資料夾已存在。")
+        else:
+            print(f"\n錯誤：匯出時發生錯誤，輸出資料夾可能只有部分照片: {e}")
+        return 0
+    print()
+
+    for name in result.missing:
+        print(f"警告：索引中存在 '{name}' 的記錄，但找不到實體檔案。")
+    for name, error in result.errors:
+        print(f"錯誤：處理 '{name}' 時失敗: {error}")
+    print("-" * 40)
+    if result.copied:
+        print("處理完成！")
+        print(f"總共複製了 {len(result.copied)} 張照片至 '{os.path.abspath(output_dir)}' 資料夾。")
+        print(f"車輛資訊已寫入 '{os.path.abspath(result.info_file)}'。")
+    else:
+        print(f"完成搜尋，但在 '{target_date}' 這天找不到任何照片。")
+    return len(result.copied)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以非同步方式匯出指定拍攝日期的所有照片與車輛資訊。")
+    parser.add_argument("date", help="要匯出的日期 (YYYY-MM-DD)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"同時進行的檔案操作上限 (預設 {DEFAULT_CONCURRENCY})")
+    args = parser.parse_args(argv)
+    if not exporter.is_valid_date(args.date):
+        print("無效的日期格式，請確保您的輸入格式為 YYYY-MM-DD。")
+        return 1
+    run_export(args.date, concurrency=args.concurrency)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
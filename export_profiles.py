@@ -0,0 +1,169 @@
+# export_profiles.py
+import os
+import json
+import shutil
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import archive
+from tracing import span
+
+# --- 常數設定 ---
+# 假設此腳本與 manager.py 在同一個目錄下
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# 轉換結果依 (原始檔雜湊, 設定檔) 快取，重新匯出同一天時直接從快取複製
+EXPORT_CACHE_DIR = os.path.join(SCRIPT_DIR, ".export_cache")
+HASH_LEDGER_NAME = "hashes.json"
+
+# 匯出設定檔：None 代表直接複製原始檔
+#   fit       等比例縮小到長邊上限
+#   crop-pad  先裁掉最多 max_crop 比例的多餘部分，剩下的比例差距以背景色補齊到固定尺寸
+EXPORT_PROFILES = {
+    "original": None,
+    "2048px": {"mode": "fit", "size": [2048, 2048], "quality": 90},
+    "1080x1350": {"mode": "crop-pad", "size": [1080, 1350], "quality": 90, "max_crop": 0.2,
+                  "background": [255, 255, 255]},
+}
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def settings_key(settings):
+    """設定內容的短雜湊：調整設定檔參數後舊的快取自然失效。"""
+    payload = json.dumps(settings, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:12]
+
+
+def cache_path(profile_name, source_hash):
+    settings = EXPORT_PROFILES[profile_name]
+    return os.path.join(EXPORT_CACHE_DIR, f"{profile_name}-{settings_key(settings)}",
+                        source_hash[:2], source_hash + ".jpg")
+
+
+def crop_towards(img, target_ratio, max_crop):
+    """朝目標長寬比置中裁切，最多裁掉 max_crop 比例的寬或高。"""
+    width, height = img.size
+    ratio = width / height
+    if ratio > target_ratio:
+        new_width = max(int(width * (1 - max_crop)), round(height * target_ratio))
+        left = (width - new_width) // 2
+        return img.crop((left, 0, left + new_width, height))
+    if ratio < target_ratio:
+        new_height = max(int(height * (1 - max_crop)), round(width / target_ratio))
+        top = (height - new_height) // 2
+        return img.crop((0, top, width, top + new_height))
+    return img
+
+
+def render_profile(task):
+    """依設定檔轉換單一圖片並寫入快取 (在子行程中執行)，回傳快取路徑。"""
+    from PIL import Image, ImageOps
+    Image.MAX_IMAGE_PIXELS = None
+    settings = task["settings"]
+    width, height = settings["size"]
+    with Image.open(task["source_path"]) as img:
+        # 讓 JPEG 解碼器直接以縮小的比例解碼
+        img.draft('RGB', (width, height))
+        work = ImageOps.exif_transpose(img).convert('RGB')
+    if settings["mode"] == "fit":
+        work.thumbnail((width, height), Image.Resampling.LANCZOS)
+    else:
+        work = crop_towards(work, width / height, settings["max_crop"])
+        work = ImageOps.pad(work, (width, height), method=Image.Resampling.LANCZOS,
+                            color=tuple(settings["background"]))
+
+    out_path = task["cache_path"]
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = out_path + f".{os.getpid()}.tmp"
+    work.save(tmp_path, "JPEG", quality=settings["quality"], optimize=True, progressive=True)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def load_hash_ledger():
+    try:
+        with open(os.path.join(EXPORT_CACHE_DIR, HASH_LEDGER_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def source_hashes(paths):
+    """
+    回傳 {原始檔路徑: SHA-256}。大小與修改時間和上次記錄相同時直接沿用記錄的雜湊，
+    只有新的或變動過的原始檔才需要重新讀取整個檔案。
+    """
+    ledger = load_hash_ledger()
+    hashes, changed = {}, False
+    for path in paths:
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        entry = ledger.get(key)
+        if entry and entry[:2] == [st.st_size, st.st_mtime_ns]:
+            hashes[path] = entry[2]
+            continue
+        with span("export.hash"):
+            hashes[path] = file_sha256(path)
+        ledger[key] = [st.st_size, st.st_mtime_ns, hashes[path]]
+        changed = True
+    if changed:
+        os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+        archive.write_json_atomic(os.path.join(EXPORT_CACHE_DIR, HASH_LEDGER_NAME), ledger)
+    return hashes
+
+
+def output_name(image_name, profile_name):
+    """原始設定檔保留原檔名，其餘設定檔一律輸出 JPEG。"""
+    if EXPORT_PROFILES[profile_name] is None:
+        return image_name
+    return os.path.splitext(image_name)[0] + ".jpg"
+
+
+def export_photos(jobs, output_dir, profile_name, workers=None):
+    """
+    依設定檔匯出照片，並為每張照片寫入同名的 .txt 說明檔。
+    jobs 為 (原始檔路徑, 圖片檔名, 說明文字) 的列表；回傳成功匯出的原始檔路徑列表。
+    1. 計算原始檔雜湊 (以大小與修改時間快取)。
+    2. 快取中沒有的轉換結果在行程池中平行產生。
+    3. 從快取 (或原始檔) 複製到輸出資料夾。
+    """
+    settings = EXPORT_PROFILES[profile_name]
+    exported = []
+    if settings is None:
+        sources = {source_path: source_path for source_path, _, _ in jobs}
+    else:
+        hashes = source_hashes([source_path for source_path, _, _ in jobs])
+        sources = {source_path: cache_path(profile_name, hashes[source_path]) for source_path, _, _ in jobs}
+        tasks = [{"source_path": source, "cache_path": cached, "settings": settings}
+                 for source, cached in sources.items() if not os.path.exists(cached)]
+        if tasks:
+            print(f"正在以設定檔 '{profile_name}' 轉換 {len(tasks)} 張照片 (其餘 {len(sources) - len(tasks)} 張使用快取)...")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(render_profile, task): task["source_path"] for task in tasks}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"錯誤：轉換 '{os.path.basename(futures[future])}' 時失敗: {e}")
+                        sources.pop(futures[future])
+
+    for source_path, image_name, caption in jobs:
+        if source_path not in sources:
+            continue
+        name = output_name(image_name, profile_name)
+        try:
+            with span("shutil.copy2"):
+                shutil.copy2(sources[source_path], os.path.join(output_dir, name))
+            with open(os.path.join(output_dir, os.path.splitext(name)[0] + ".txt"), 'w', encoding='utf-8') as f:
+                f.write(caption)
+        except Exception as e:
+            print(f"錯誤：匯出檔案 '{image_name}' 時失敗: {e}")
+            continue
+        print(f"  > 已匯出: {name}")
+        exported.append(source_path)
+    return exported
@@ -2,7 +2,12 @@
 import os
 import json
 import shutil
+import argparse
 import datetime
+from startup_profile import PROFILER, PROFILE_FLAG
+from tracing import TRACE_FLAG, TRACER, span, traced
+import archive
+import export_profiles
 
 # --- 常數設定 ---
 # 假設此腳本與 manager.py 在同一個目錄下
@@ -10,6 +15,18 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PAGES_DIR = os.path.join(SCRIPT_DIR, "pages")
 OUTPUT_DIR = os.path.join(SCRIPT_DIR, "out")
 MAIN_INDEX_FILE = os.path.join(PAGES_DIR, 'index.json')
+# 上次發布的水位線：發布時間與每個檔案的指紋，用於「自上次發布以來的變更」匯出
+PUBLISH_STATE_FILE = os.path.join(SCRIPT_DIR, "publish_state.json")
+STARTUP_BUDGET_MS = 100  # 從啟動到可以輸入日期的時間預算
+
+PROFILER.mark("匯入模組")
+
+def is_valid_date(date_str):
+    try:
+        datetime.datetime.strptime(date_str, '%Y-%m-%d')
+        return True
+    except ValueError:
+        return False
 
 def get_target_date():
     """
@@ -18,17 +35,89 @@ def get_target_date():
     """
     while True:
         date_str = input("請輸入要匯出的日期 (格式 YYYY-MM-DD): ")
-        try:
-            # 嘗試將輸入的字串解析為日期物件，以驗證格式
-            datetime.datetime.strptime(date_str, '%Y-%m-%d')
+        # 嘗試將輸入的字串解析為日期物件，以驗證格式
+        if is_valid_date(date_str):
             return date_str
-        except ValueError:
-            print("無效的日期格式，請確保您的輸入格式為 YYYY-MM-DD。")
+        print("無效的日期格式，請確保您的輸入格式為 YYYY-MM-DD。")
 
-def main():
+def main(argv=None):
     """
     主執行函數：
-    1. 獲取使用者指定的日期。
+    1. 獲取使用者指定的日期 (可由 --date 參數指定)。
+    2-9. 交由 export_by_date 搜尋、複製照片並產生 'out.txt'。
+    使用 --since-last-publish 時改為匯出自上次發布以來新增或修改的照片 (見 export_changes)。
+    """
+    parser = argparse.ArgumentParser(description="匯出指定拍攝日期的所有照片與車輛資訊。")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--date", help="要匯出的日期 (YYYY-MM-DD)；未指定時會提示輸入")
+    mode.add_argument("--since-last-publish", action="store_true",
+                      help="只匯出自上次發布以來新增、修改的照片與資訊有變動的車輛，並更新發布水位線")
+    mode.add_argument("--mark-published", action="store_true",
+                      help="不匯出任何檔案，只將目前的圖庫狀態記錄為已發布")
+    parser.add_argument("--dry-run", action="store_true", help="搭配 --since-last-publish：只列出變更，不複製也不更新水位線")
+    parser.add_argument("--profile", choices=sorted(export_profiles.EXPORT_PROFILES),
+                        help="以指定的設定檔轉換照片 (結果會快取)，並為每張照片產生同名的說明文字檔")
+    parser.add_argument(PROFILE_FLAG, action="store_true", help="輸出匯入時間與各階段耗時分析")
+    parser.add_argument(TRACE_FLAG, nargs='?', metavar="PATH", const=True,
+                        help="記錄各項 I/O 操作的耗時直方圖 (JSONL)，可指定輸出路徑")
+    args = parser.parse_args(argv)
+    # 追蹤器在匯入時就已由命令列開啟；這裡確保 argparse 解析出的路徑與實際寫入的路徑一致
+    if TRACER.enabled and isinstance(args.trace, str):
+        TRACER.path = args.trace
+    PROFILER.mark("首次可互動")
+
+    if args.since_last_publish or args.mark_published:
+        export_changes(dry_run=args.dry_run, mark_only=args.mark_published, profile=args.profile)
+        PROFILER.report("exporter.py", "首次可互動", STARTUP_BUDGET_MS)
+        if TRACER.enabled:
+            print(f"操作耗時記錄已附加至 '{os.path.abspath(TRACER.path)}'。")
+        return
+
+    # 步驟 1: 獲取使用者輸入的目標日期
+    if args.date and is_valid_date(args.date):
+        target_date = args.date
+    else:
+        if args.date:
+            print("無效的日期格式，請確保您的輸入格式為 YYYY-MM-DD。")
+        target_date = get_target_date()
+        PROFILER.mark("等待使用者輸入")
+
+    export_by_date(target_date, profile=args.profile)
+    PROFILER.report("exporter.py", "首次可互動", STARTUP_BUDGET_MS)
+    if TRACER.enabled:
+        print(f"操作耗時記錄已附加至 '{os.path.abspath(TRACER.path)}'。")
+
+def format_output_date(date_str):
+    return date_str.replace('-', '/')
+
+def write_info_file(path, blocks):
+    """
+    將車輛資訊寫入 'out.txt'。blocks 為 (車牌, Vehicle, 日期文字) 的列表，
+    為了讓輸出順序固定，會依車牌號排序。
+    """
+    sorted_blocks = sorted(blocks, key=lambda block: block[0])
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, block in enumerate(sorted_blocks):
+            f.write(format_vehicle_block(*block))
+
+            # 在每個車輛資訊塊之間插入兩行空行（最後一個除外）
+            if i < len(sorted_blocks) - 1:
+                f.write("\n")
+
+def format_vehicle_block(plate, info, date_text):
+    """組合單一車輛的文字區塊，'out.txt' 與每張照片的說明檔共用同一格式。"""
+    year = info.year or "年份不詳"
+    manufacturer = info.manufacturer or "廠牌不詳"
+    model = info.model or "型號不詳"
+    company = info.company or "客運不詳"
+    return f"{plate}\n{year} {manufacturer} {model}\n{date_text}\n\n#{company}\n"
+
+@traced("exporter.export_by_date")
+def export_by_date(target_date, pages_dir=PAGES_DIR, output_dir=OUTPUT_DIR, profile=None):
+    """
+    匯出指定日期的照片，回傳匯出的照片數量。
+    未指定 profile 時直接複製原始照片，交由 export_async.run_export 處理 (可按 Ctrl+C 取消)；
+    指定 profile 時照片改由 export_profiles 依設定檔轉換並附上說明檔：
     2. 檢查必要的檔案和資料夾是否存在。
     3. 建立輸出資料夾。
     4. 讀取主索引檔以獲取所有車輛列表。
@@ -38,105 +127,92 @@ def main():
     8. 生成 'out.txt' 檔案，其中包含所有找到的車輛資訊。
     9. 顯示最終處理結果。
     """
-    # 步驟 1: 獲取使用者輸入的目標日期
-    target_date = get_target_date()
+    if not profile:
+        # 延遲匯入：asyncio 只在實際匯出時才需要，不影響啟動時間
+        import export_async
+        return export_async.run_export(target_date, pages_dir, output_dir)
+
+    main_index_file = archive.main_index_path(pages_dir)
     print(f"\n正在搜尋拍攝日期為 '{target_date}' 的所有照片...")
 
     # 步驟 2: 檢查 'pages' 資料夾和主索引檔是否存在
-    if not os.path.exists(MAIN_INDEX_FILE):
-        print(f"錯誤：找不到主索引檔 '{MAIN_INDEX_FILE}'。")
+    if not os.path.exists(main_index_file):
+        print(f"錯誤：找不到主索引檔 '{main_index_file}'。")
         print("請確認此腳本是否與 manager.py 在同一個資料夾，且 'pages' 資料夾已存在。")
-        return
+        return 0
 
     # 步驟 3: 建立輸出資料夾 'out'，如果它不存在的話
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
-        print(f"已建立輸出資料夾: '{os.path.abspath(OUTPUT_DIR)}'")
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print(f"已建立輸出資料夾: '{os.path.abspath(output_dir)}'")
 
     # 步驟 4: 讀取主索引檔
     try:
-        with open(MAIN_INDEX_FILE, 'r', encoding='utf-8') as f:
-            main_index_data = json.load(f)
+        main_index_data = archive.read_main_index(pages_dir)
     except json.JSONDecodeError:
-        print(f"錯誤：主索引檔 '{MAIN_INDEX_FILE}' 格式損毀，無法解析。")
-        return
+        print(f"錯誤：主索引檔 '{main_index_file}' 格式損毀，無法解析。")
+        return 0
+    PROFILER.mark("讀取主索引")
 
     # 步驟 5 & 6: 處理所有車輛，尋找並複製照片
     found_photos_count = 0
     # 使用一個字典來儲存所有找到照片的車輛資訊，可避免重複記錄
     vehicles_with_photos = {}
+    # 先收集所有照片，再一次交給行程池依設定檔處理
+    profile_jobs, job_vehicles = [], {}
 
     # 遍歷主索引中的每一輛車
     for plate, vehicle_info in main_index_data.items():
-        vehicle_dir = os.path.join(PAGES_DIR, plate)
-        vehicle_index_path = os.path.join(vehicle_dir, 'index.json')
+        vehicle_dir = archive.plate_dir(pages_dir, plate)
+        vehicle_index_path = archive.vehicle_index_path(pages_dir, plate)
 
         if not os.path.exists(vehicle_index_path):
             continue  # 如果車輛的索引檔不存在，則跳過
 
         try:
-            with open(vehicle_index_path, 'r', encoding='utf-8') as f:
-                vehicle_index_data = json.load(f)
+            with span("index.read"), open(vehicle_index_path, 'rb') as f:
+                raw_index = f.read()
+            # 先以位元組搜尋日期字串，沒有出現目標日期的索引檔就不需要解析 JSON
+            if target_date.encode('ascii') not in raw_index:
+                continue
+            vehicle_index_data = archive.parse_vehicle_index(raw_index)
         except json.JSONDecodeError:
             print(f"警告：'{plate}' 的索引檔格式錯誤，已跳過。")
             continue
 
         # 遍歷該車輛的所有圖片記錄
         for image_name, image_info in vehicle_index_data.items():
-            if image_info.get("date") == target_date:
-                # 日期相符，執行複製操作
+            if image_info.date == target_date:
+                # 日期相符，加入轉換工作
                 source_path = os.path.join(vehicle_dir, image_name)
-                dest_path = os.path.join(OUTPUT_DIR, image_name)
-
                 if os.path.exists(source_path):
-                    try:
-                        shutil.copy2(source_path, dest_path)
-                        print(f"  > 已複製: {image_name}")
-                        found_photos_count += 1
-                        
-                        # 如果這輛車是第一次被找到，就記錄它的資訊
-                        if plate not in vehicles_with_photos:
-                            vehicles_with_photos[plate] = vehicle_info
-                    except Exception as e:
-                        print(f"錯誤：複製檔案 '{image_name}' 時失敗: {e}")
+                    caption = format_vehicle_block(plate, vehicle_info, format_output_date(target_date))
+                    profile_jobs.append((source_path, image_name, caption))
+                    job_vehicles[source_path] = (plate, vehicle_info)
                 else:
                     print(f"警告：索引中存在 '{image_name}' 的記錄，但找不到實體檔案。")
 
+    if profile_jobs:
+        for source_path in export_profiles.export_photos(profile_jobs, output_dir, profile):
+            plate, vehicle_info = job_vehicles[source_path]
+            vehicles_with_photos.setdefault(plate, vehicle_info)
+            found_photos_count += 1
+
+    PROFILER.mark("搜尋並複製照片")
+
     # 步驟 7 & 8: 產生報告檔案並顯示總結
     if found_photos_count > 0:
-        output_info_file = os.path.join(OUTPUT_DIR, "out.txt")
+        output_info_file = os.path.join(output_dir, "out.txt")
 
         try:
-            with open(output_info_file, 'w', encoding='utf-8') as f:
-                # 為了讓輸出順序固定，對車牌號進行排序
-                sorted_plates = sorted(vehicles_with_photos.keys())
-                
-                # --- 主要變更點 ---
-                # 將日期中的 '-' 替換為 '/'
-                output_date_format = target_date.replace('-', '/')
-                
-                for i, plate in enumerate(sorted_plates):
-                    info = vehicles_with_photos[plate]
-                    
-                    # 組合文字區塊
-                    year = info.get("year", "年份不詳")
-                    manufacturer = info.get("manufacturer", "廠牌不詳")
-                    model = info.get("model", "型號不詳")
-                    company = info.get("company", "客運不詳")
-                    
-                    f.write(f"{plate}\n")
-                    f.write(f"{year} {manufacturer} {model}\n")
-                    # 使用新的日期格式寫入檔案
-                    f.write(f"{output_date_format}\n\n")
-                    f.write(f"#{company}\n")
-
-                    # 在每個車輛資訊塊之間插入兩行空行（最後一個除外）
-                    if i < len(sorted_plates) - 1:
-                        f.write("\n")
+            # 將日期中的 '-' 替換為 '/'
+            output_date_format = format_output_date(target_date)
+            write_info_file(output_info_file, [(plate, vehicles_with_photos[plate], output_date_format)
+                                               for plate in vehicles_with_photos])
 
             print("-" * 40)
             print("處理完成！")
-            print(f"總共複製了 {found_photos_count} 張照片至 '{os.path.abspath(OUTPUT_DIR)}' 資料夾。")
+            print(f"總共複製了 {found_photos_count} 張照片至 '{os.path.abspath(output_dir)}' 資料夾。")
             print(f"車輛資訊已寫入 '{os.path.abspath(output_info_file)}'。")
 
         except Exception as e:
@@ -146,5 +222,185 @@ def main():
         print("-" * 40)
         print(f"完成搜尋，但在 '{target_date}' 這天找不到任何照片。")
 
+    PROFILER.mark("產生報告")
+    return found_photos_count
+
+def load_publish_state(state_file=PUBLISH_STATE_FILE):
+    """讀取上次發布的水位線；從未發布過 (或檔案損毀) 時回傳 None。"""
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError:
+        print(f"警告：發布水位線 '{state_file}' 格式損毀，將視為從未發布。")
+        return None
+
+def scan_archive_state(pages_dir, previous_state=None):
+    """
+    以一次 stat 掃描建立目前圖庫的指紋：
+    {車牌: {"vehicle": 車輛資訊, "index": [mtime_ns, 大小], "photos": {檔名: [大小, mtime_ns, 日期, 說明]}}}。
+    車輛索引檔的 mtime 與大小和上次發布時相同時，沿用上次記錄的日期與說明，不需讀取與解析 JSON。
+    """
+    main_index_data = archive.read_main_index(pages_dir)
+    previous_plates = (previous_state or {}).get("plates", {})
+    state = {}
+    for plate, vehicle_info in main_index_data.items():
+        previous = previous_plates.get(plate, {})
+        try:
+            with span("os.stat"):
+                index_stat = os.stat(archive.vehicle_index_path(pages_dir, plate))
+        except FileNotFoundError:
+            state[plate] = {"vehicle": vehicle_info.to_dict(), "index": None, "photos": {}}
+            continue
+        index_key = [index_stat.st_mtime_ns, index_stat.st_size]
+
+        if previous.get("index") == index_key:
+            metadata = {name: (entry[2], entry[3]) for name, entry in previous.get("photos", {}).items()}
+        else:
+            metadata = {name: (photo.date, photo.description)
+                        for name, photo in archive.read_vehicle_index(pages_dir, plate).items()}
+
+        photos = {}
+        for name, (photo_date, description) in metadata.items():
+            try:
+                with span("os.stat"):
+                    st = os.stat(archive.image_path(pages_dir, plate, name))
+            except FileNotFoundError:
+                continue  # 索引中有記錄但檔案已不存在，視為已刪除
+            photos[name] = [st.st_size, st.st_mtime_ns, photo_date, description]
+        state[plate] = {"vehicle": vehicle_info.to_dict(), "index": index_key, "photos": photos}
+    return state
+
+def compute_delta(previous_plates, current_plates):
+    """
+    比較兩份指紋，回傳 (新增, 修改, 刪除, 資訊有變動的車牌)。
+    前三者為 (車牌, 檔名) 的列表；檔案大小、修改時間、日期或說明任一不同即視為修改。
+    """
+    added, changed, deleted, vehicle_changed = [], [], [], []
+    for plate in sorted(previous_plates.keys() | current_plates.keys()):
+        old = previous_plates.get(plate, {})
+        new = current_plates.get(plate, {})
+        old_photos, new_photos = old.get("photos", {}), new.get("photos", {})
+        for name in sorted(new_photos):
+            if name not in old_photos:
+                added.append((plate, name))
+            elif old_photos[name] != new_photos[name]:
+                changed.append((plate, name))
+        deleted.extend((plate, name) for name in sorted(old_photos) if name not in new_photos)
+        if plate in current_plates and plate in previous_plates and old.get("vehicle") != new.get("vehicle"):
+            vehicle_changed.append(plate)
+    return added, changed, deleted, vehicle_changed
+
+def save_publish_state(plates_state, state_file=PUBLISH_STATE_FILE):
+    state = {"published_at": datetime.datetime.now().isoformat(timespec='seconds'), "plates": plates_state}
+    archive.write_json_atomic(state_file, state)
+
+@traced("exporter.export_changes")
+def export_changes(pages_dir=PAGES_DIR, output_dir=OUTPUT_DIR, state_file=PUBLISH_STATE_FILE,
+                   dry_run=False, mark_only=False, profile=None):
+    """
+    匯出自上次發布以來的變更，回傳複製的照片數量：
+    1. 以一次 stat 掃描建立目前的指紋，並與水位線比較出新增、修改、刪除的照片與資訊有變動的車輛。
+    2. 將新增與修改的照片複製到 'out/changes_<時間>' 資料夾 (不會動到先前匯出的檔案)。
+    3. 'out.txt' 只包含受影響的車輛；已刪除的照片列於 'deleted.txt'。
+    4. 全部成功後才更新水位線，中途失敗時下次會重新匯出同樣的變更。
+    """
+    if not os.path.exists(archive.main_index_path(pages_dir)):
+        print(f"錯誤：找不到主索引檔 '{archive.main_index_path(pages_dir)}'。")
+        return 0
+
+    previous_state = load_publish_state(state_file)
+    try:
+        current_plates = scan_archive_state(pages_dir, previous_state)
+    except json.JSONDecodeError:
+        print(f"錯誤：主索引檔 '{archive.main_index_path(pages_dir)}' 格式損毀，無法解析。")
+        return 0
+    PROFILER.mark("掃描圖庫狀態")
+
+    if mark_only:
+        save_publish_state(current_plates, state_file)
+        print(f"已將目前的圖庫狀態記錄為已發布 ('{os.path.abspath(state_file)}')。")
+        return 0
+
+    if previous_state is None:
+        print("尚未有發布記錄，將匯出整個圖庫。(可先使用 --mark-published 建立基準)")
+    else:
+        print(f"\n正在搜尋自 {previous_state.get('published_at', '上次發布')} 以來的變更...")
+    added, changed, deleted, vehicle_changed = compute_delta(
+        (previous_state or {}).get("plates", {}), current_plates)
+    print(f"新增 {len(added)} 張、修改 {len(changed)} 張、刪除 {len(deleted)} 張照片；"
+          f"{len(vehicle_changed)} 輛車的資訊有變動。")
+
+    if dry_run:
+        for label, items in (("新增", added), ("修改", changed), ("刪除", deleted)):
+            for plate, name in items:
+                print(f"  {label}: {plate}/{name}")
+        for plate in vehicle_changed:
+            print(f"  資訊變動: {plate}")
+        return 0
+
+    if not (added or changed or deleted or vehicle_changed):
+        print("-" * 40)
+        print("沒有任何變更，不需要發布。")
+        return 0
+
+    changes_dir = os.path.join(output_dir, "changes_" + datetime.datetime.now().strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(changes_dir, exist_ok=True)
+
+    copied_count = 0
+    exported_dates = {}
+    if profile:
+        jobs = []
+        for plate, name in added + changed:
+            photo_date = current_plates[plate]["photos"][name][2]
+            vehicle_info = archive.Vehicle.from_dict(current_plates[plate]["vehicle"])
+            jobs.append((archive.image_path(pages_dir, plate, name), name,
+                         format_vehicle_block(plate, vehicle_info, format_output_date(photo_date))))
+            exported_dates.setdefault(plate, set()).add(photo_date)
+        copied_count = len(export_profiles.export_photos(jobs, changes_dir, profile))
+        if copied_count < len(jobs):
+            print("未更新發布水位線，修正問題後請重新執行。")
+            return copied_count
+    for plate, name in ([] if profile else added + changed):
+        try:
+            with span("shutil.copy2"):
+                shutil.copy2(archive.image_path(pages_dir, plate, name), os.path.join(changes_dir, name))
+        except Exception as e:
+            print(f"錯誤：複製檔案 '{name}' 時失敗: {e}")
+            print("未更新發布水位線，修正問題後請重新執行。")
+            return copied_count
+        print(f"  > 已複製: {name}")
+        copied_count += 1
+        exported_dates.setdefault(plate, set()).add(current_plates[plate]["photos"][name][2])
+
+    # 受影響的車輛：有照片被匯出，或車輛資訊有變動 (此時列出它所有照片中最新的日期)
+    blocks = []
+    for plate in sorted(set(exported_dates) | set(vehicle_changed)):
+        dates = exported_dates.get(plate) or {
+            max((entry[2] for entry in current_plates[plate]["photos"].values()), default="")}
+        date_text = " ".join(format_output_date(d) for d in sorted(dates) if d)
+        blocks.append((plate, archive.Vehicle.from_dict(current_plates[plate]["vehicle"]), date_text))
+
+    try:
+        write_info_file(os.path.join(changes_dir, "out.txt"), blocks)
+        if deleted:
+            with open(os.path.join(changes_dir, "deleted.txt"), 'w', encoding='utf-8') as f:
+                f.writelines(f"{plate}/{name}\n" for plate, name in deleted)
+        save_publish_state(current_plates, state_file)
+    except Exception as e:
+        print(f"錯誤：寫入資訊檔案或發布水位線時失敗: {e}")
+        return copied_count
+    PROFILER.mark("匯出變更")
+
+    print("-" * 40)
+    print("處理完成！")
+    print(f"總共複製了 {copied_count} 張照片至 '{os.path.abspath(changes_dir)}' 資料夾。")
+    print(f"{len(blocks)} 輛受影響車輛的資訊已寫入 '{os.path.abspath(os.path.join(changes_dir, 'out.txt'))}'。")
+    if deleted:
+        print(f"已刪除的 {len(deleted)} 張照片列於 'deleted.txt'。")
+    print(f"發布水位線已更新 ('{os.path.abspath(state_file)}')。")
+    return copied_count
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,14 +1,34 @@
 import os
 import re
 import sys
+from startup_profile import PROFILER  # 需在其他模組之前匯入，才能記錄匯入時間
 from tkinter import Tk, Label, Button, Entry, Canvas, Frame, filedialog, StringVar, messagebox
-from PIL import Image, ImageTk
 from datetime import date, datetime
-import piexif
+from concurrent.futures import ThreadPoolExecutor
+from tracing import TRACER, span, traced
+import archive
+import imaging
+import ingest
+from perceptual import BackgroundFingerprinter, same_burst
+from widgets import Filmstrip
 
-# --- 修復大圖警告 ---
-Image.MAX_IMAGE_PIXELS = None
-SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+SUPPORTED_FORMATS = archive.SUPPORTED_FORMATS
+STARTUP_BUDGET_MS = 300  # 從啟動到視窗可操作的時間預算
+TRACE_READOUT_INTERVAL_MS = 250
+BURST_LOOKAHEAD = 5  # 背景預先計算指紋的後續圖片數
+BURST_POLL_MS = 50  # 指紋尚未算好時，每隔多久再檢查一次
+BATCH_POLL_MS = 100  # 批次歸檔進行中，每隔多久檢查一次是否完成
+
+PROFILER.mark("匯入模組")
+
+
+def load_pil():
+    """延遲匯入 PIL：選擇資料夾、真正需要顯示圖片時才載入，加快視窗出現的速度。"""
+    Image = PROFILER.import_module('PIL.Image')
+    ImageTk = PROFILER.import_module('PIL.ImageTk')
+    # --- 修復大圖警告 ---
+    Image.MAX_IMAGE_PIXELS = None
+    return Image, ImageTk
 
 
 def get_script_dir():
@@ -22,6 +42,49 @@ def sanitize_foldername(name):
     return re.sub(r'[\\/*?:"<>|]', "", name)
 
 
+def load_thumbnail(path, size):
+    """解碼縮圖 (在背景執行緒中執行)：以 draft 讓 JPEG 直接以縮小比例解碼。"""
+    Image, _ = load_pil()
+    with Image.open(path) as img:
+        img.draft('RGB', size)
+        thumb = img.convert('RGB')
+    thumb.thumbnail(size, Image.Resampling.BILINEAR)
+    return thumb
+
+
+def to_photo(img):
+    _, ImageTk = load_pil()
+    return ImageTk.PhotoImage(img)
+
+
+def save_archived_copy(source_path, dest_path, shot_date):
+    """將原始圖片另存到圖庫，並寫入拍攝日期的 EXIF (原始檔不會被修改)。"""
+    Image, _ = load_pil()
+    piexif = PROFILER.import_module('piexif')
+    with span("Image.open"):
+        img_to_save = Image.open(source_path)
+
+    # 準備並寫入EXIF日期資訊
+    exif_date_str = shot_date.replace('-', ':') + " 00:00:00"
+    exif_date_bytes = exif_date_str.encode('utf-8')
+    exif_dict = {"Exif": {piexif.ExifIFD.DateTimeOriginal: exif_date_bytes,
+                          piexif.ExifIFD.DateTimeDigitized: exif_date_bytes}}
+    exif_bytes = piexif.dump(exif_dict)
+
+    with span("image.save"):
+        if dest_path.lower().endswith(('.jpg', '.jpeg')):
+            img_to_save.save(dest_path, "jpeg", exif=exif_bytes)
+        else:
+            img_to_save.save(dest_path)
+
+    img_to_save.close()
+
+
+def archived_filename(plate, shot_date, number, source_path):
+    _, file_ext = os.path.splitext(os.path.basename(source_path))
+    return f"{plate}_{shot_date}_{number:02d}{file_ext}"
+
+
 class ImageTaggerApp:
     def __init__(self, root):
         self.root = root
@@ -32,11 +95,20 @@ class ImageTaggerApp:
         self.image_folder = ""
         self.image_paths = []
         self.current_index = 0
-        # --- 修改：計數器現在同時基於車牌和日期 ---
-        self.plate_date_counters = {}
+        # 與 manager.py 共用的圖庫模型，用來決定新檔案的流水號
+        self.archive_model = archive.ArchiveModel(os.path.join(self.script_dir, "pages"))
+        # 記錄每張原始圖片歸檔成哪些檔案，重新開啟同一個資料夾時略過已歸檔的圖片 (選擇資料夾時才讀取)
+        self.ingest_ledger = ingest.IngestLedger(self.archive_model.pages_dir)
         self.last_used_date = None
         self.original_img = None
         self.displayed_img_info = {}
+        # --- 連拍辨識：背景計算指紋，與上一張屬於同一組連拍時預填車牌 ---
+        self.fingerprinter = None
+        self.last_saved = None  # (圖片索引, 車牌)
+        # --- 縮圖列與批次歸檔 ---
+        self.done_indices = set()
+        self.batch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-archive")
+        self.batch_future = None
 
         # --- 框選功能變數 ---
         self.selection_rect = None
@@ -89,6 +161,8 @@ class ImageTaggerApp:
 
         self.save_button = Button(bottom_frame, text="儲存並下一張", command=self.save_and_next, state='disabled')
         self.save_button.pack(side='left')
+        self.batch_button = Button(bottom_frame, text="套用至選取的圖片", command=self.batch_assign, state='disabled')
+        self.batch_button.pack(side='left', padx=10)
 
         # --- 移除：移除重新命名原始檔案的勾選框 ---
         # self.rename_var = BooleanVar(value=False)
@@ -96,12 +170,35 @@ class ImageTaggerApp:
 
         self.status_label = Label(bottom_frame, text="請選擇圖片資料夾以開始")
         self.status_label.pack(side='right')
+        if TRACER.enabled:
+            # 追蹤模式：即時顯示最近一次操作的耗時
+            self.trace_label = Label(bottom_frame, text="", fg="gray30")
+            self.trace_label.pack(side='right', padx=10)
+            self.root.after(TRACE_READOUT_INTERVAL_MS, self._refresh_trace_readout)
+
+        # --- 縮圖列：點擊跳到該圖片，Ctrl/Shift + 點擊選取多張以批次套用車牌與日期 ---
+        self.filmstrip = Filmstrip(root, load_thumbnail, to_photo)
+        self.filmstrip.pack(fill='x', padx=10, pady=(0, 10))
+        self.filmstrip.bind('<<FilmstripActivate>>', self._on_filmstrip_activate)
 
         # --- 綁定框選事件 ---
         self.canvas.bind("<ButtonPress-1>", self._on_mouse_press)
         self.canvas.bind("<B1-Motion>", self._on_mouse_drag)
         self.canvas.bind("<ButtonRelease-1>", self._on_mouse_release)
 
+        self.root.after_idle(self._on_first_idle)
+
+    def _refresh_trace_readout(self):
+        if TRACER.last_operation:
+            name, ms = TRACER.last_operation
+            self.trace_label.config(text=f"上次操作 {name}: {ms:.1f} ms")
+        self.root.after(TRACE_READOUT_INTERVAL_MS, self._refresh_trace_readout)
+
+    def _on_first_idle(self):
+        self.root.update_idletasks()
+        PROFILER.mark("首次繪製")
+        PROFILER.report("image_processor.py", "首次繪製", STARTUP_BUDGET_MS)
+
     def _on_mouse_press(self, event):
         """滑鼠左鍵按下，開始選取"""
         self.selection_start_x = event.x
@@ -120,6 +217,7 @@ class ImageTaggerApp:
         self.canvas.coords(self.selection_rect, self.selection_start_x,
                            self.selection_start_y, event.x, event.y)
 
+    @traced("tagger.zoom")
     def _on_mouse_release(self, event):
         """放開滑鼠，處理放大"""
         if not self.original_img or not self.selection_rect:
@@ -149,6 +247,7 @@ class ImageTaggerApp:
         if orig_left >= orig_right or orig_top >= orig_bottom:
             return
 
+        Image, ImageTk = load_pil()
         cropped_img = self.original_img.crop((orig_left, orig_top, orig_right, orig_bottom))
         zoom_canvas_width = self.zoom_canvas.winfo_width()
         zoom_canvas_height = self.zoom_canvas.winfo_height()
@@ -160,56 +259,229 @@ class ImageTaggerApp:
             zoom_canvas_width / 2, zoom_canvas_height / 2,
             anchor='center', image=self.zoom_photo)
 
+    @traced("tagger.select_folder")
     def select_folder(self):
+        if self.batch_future:
+            messagebox.showinfo("提示", "批次歸檔進行中，請稍候再切換資料夾。")
+            return
         folder = filedialog.askdirectory()
         if not folder: return
         self.image_folder = folder
         self.folder_label.config(text=f"目前資料夾: {self.image_folder}")
-        # --- 修改：清空新的計數器 ---
-        self.plate_date_counters.clear()
         self.last_used_date = None
-        self.image_paths = sorted([os.path.join(self.image_folder, f) for f in os.listdir(self.image_folder) if
-                                   f.lower().endswith(SUPPORTED_FORMATS)])
-        if not self.image_paths:
+        self.last_saved = None
+        if self.fingerprinter:
+            self.fingerprinter.close()
+        self.fingerprinter = BackgroundFingerprinter()
+        with span("os.listdir"):
+            all_paths = sorted([os.path.join(self.image_folder, f) for f in os.listdir(self.image_folder) if
+                                f.lower().endswith(SUPPORTED_FORMATS)])
+        self.image_paths = []
+        self.done_indices.clear()
+        self.filmstrip.set_items([])
+        if not all_paths:
             messagebox.showinfo("提示", "此資料夾中沒有找到任何支援的圖片檔案！")
             return
+
+        # 在背景一次比對整個資料夾與歸檔紀錄 (新的圖片需要計算雜湊)，完成後才開始標記
+        for widget in (self.save_button, self.batch_button):
+            widget.config(state='disabled')
+        self.status_label.config(text=f"正在比對 {len(all_paths)} 張圖片是否已歸檔...")
+        self.batch_future = self.batch_executor.submit(self.ingest_ledger.scan, all_paths)
+        self.root.after(BATCH_POLL_MS, self._finish_folder_scan, all_paths)
+
+    def _finish_folder_scan(self, all_paths):
+        if not self.batch_future.done():
+            self.root.after(BATCH_POLL_MS, self._finish_folder_scan, all_paths)
+            return
+        future, self.batch_future = self.batch_future, None
+        try:
+            archived = future.result()
+        except Exception as e:
+            archived = {}
+            messagebox.showwarning("無法比對歸檔紀錄", f"將從第一張圖片開始。\n錯誤：{e}")
+
+        self.image_paths = [path for path in all_paths if path not in archived]
+        # 縮圖列只解碼可見範圍內的縮圖，數千張的資料夾也不會卡住視窗
+        self.filmstrip.set_items(self.image_paths)
         self.current_index = 0
+        if not self.image_paths:
+            self.display_completion_message()
+            self.status_label.config(text=f"此資料夾的 {len(all_paths)} 張圖片先前皆已歸檔")
+            return
         self.load_image()
+        if archived:
+            self.status_label.config(text=f"{self.status_label.cget('text')} (已略過 {len(archived)} 張先前已歸檔的圖片)")
+
+    def _on_filmstrip_activate(self, event=None):
+        index = self.filmstrip.activated_index
+        if index is None or index == self.current_index or self.batch_future:
+            return
+        self.current_index = index
+        self.load_image()
+
+    def _next_pending_index(self, start):
+        """從 start 開始往後 (必要時再從頭) 尋找尚未歸檔的圖片，全部完成時回傳圖片總數。"""
+        for index in list(range(start, len(self.image_paths))) + list(range(0, start)):
+            if index not in self.done_indices:
+                return index
+        return len(self.image_paths)
 
+    def _read_plate_and_date(self):
+        """讀取並驗證車牌與日期欄位，有誤時顯示警告並回傳 None。"""
+        plate = self.plate_var.get().strip().upper()
+        shot_date = self.date_var.get().strip()
+
+        if not plate or not shot_date:
+            messagebox.showwarning("輸入錯誤", "車牌號碼和拍攝日期不能為空！")
+            return None
+        try:
+            datetime.strptime(shot_date, "%Y-%m-%d")
+        except ValueError:
+            messagebox.showwarning("格式錯誤", "拍攝日期格式不正確，請使用 YYYY-MM-DD 格式。")
+            return None
+        return plate, shot_date
+
+    @traced("tagger.batch_assign")
+    def batch_assign(self):
+        """
+        將目前的車牌與日期套用到縮圖列中選取的所有圖片：
+        流水號一次配置完成，再由背景工作依序另存到圖庫，不會卡住視窗。
+        """
+        if self.batch_future:
+            return
+        indices = [i for i in self.filmstrip.selected_indices() if i not in self.done_indices]
+        if not indices:
+            messagebox.showinfo("提示", "請先在下方縮圖列以 Ctrl 或 Shift + 點擊選取要套用的圖片。")
+            return
+        entry = self._read_plate_and_date()
+        if not entry:
+            return
+        plate, shot_date = entry
+        self.last_used_date = shot_date
+
+        safe_plate_name = sanitize_foldername(plate)
+        jobs = [(index, self.image_paths[index]) for index in indices]
+
+        for widget in (self.save_button, self.batch_button):
+            widget.config(state='disabled')
+        self.status_label.config(text=f"正在將 {len(jobs)} 張圖片歸檔至 '{safe_plate_name}'...")
+        self.batch_future = self.batch_executor.submit(self._run_batch, plate, safe_plate_name, jobs, shot_date)
+        self.root.after(BATCH_POLL_MS, self._finish_batch, plate)
+
+    def _run_batch(self, plate, safe_plate_name, jobs, shot_date):
+        """在背景執行緒中依序另存所有圖片，回傳 (成功的索引, [(檔名, 錯誤)])。"""
+        saved, errors = [], []
+        for index, source_path in jobs:
+            try:
+                self._archive_image(plate, safe_plate_name, source_path, shot_date)
+                saved.append(index)
+            except Exception as e:
+                errors.append((os.path.basename(source_path), e))
+        return saved, errors
+
+    def _archive_image(self, plate, safe_plate_name, source_path, shot_date):
+        """
+        將一張圖片歸檔到車牌資料夾。決定流水號到寫入完成期間持有該車牌的鎖定，
+        多台電腦同時歸檔到同一輛車時不會取得相同的檔名而互相覆寫。
+        """
+        pages_dir = self.archive_model.pages_dir
+        plate_dir = archive.plate_dir(pages_dir, safe_plate_name)
+        os.makedirs(plate_dir, exist_ok=True)
+        with archive.plate_lock(pages_dir, safe_plate_name):
+            # 流水號依 (車牌, 日期) 接續圖庫中已有的檔案，重新開啟程式也不會覆寫先前歸檔的圖片
+            count = self.archive_model.next_sequence(safe_plate_name, shot_date)
+            dest_path = os.path.join(plate_dir, archived_filename(plate, shot_date, count, source_path))
+            save_archived_copy(source_path, dest_path, shot_date)
+        try:
+            self.ingest_ledger.record(source_path, dest_path)
+        except Exception as e:
+            # 圖片已成功歸檔，紀錄失敗只會讓下次開啟資料夾時無法略過這張
+            print(f"警告：無法寫入歸檔紀錄: {e}")
+
+    def _finish_batch(self, plate):
+        if not self.batch_future.done():
+            self.root.after(BATCH_POLL_MS, self._finish_batch, plate)
+            return
+        future, self.batch_future = self.batch_future, None
+        try:
+            saved, errors = future.result()
+        except Exception as e:
+            saved, errors = [], [("", e)]
+        self.done_indices.update(saved)
+        self.filmstrip.mark_done(saved)
+        if saved:
+            self.last_saved = (max(saved), plate)
+        if errors:
+            messagebox.showerror("複製或處理檔案失敗",
+                                 "\n".join(f"{name}: {error}" for name, error in errors))
+        if self.current_index in self.done_indices:
+            self.current_index = self._next_pending_index(self.current_index + 1)
+            self.load_image()
+        else:
+            self.save_button.config(state='normal')
+            self.batch_button.config(state='normal')
+            self.status_label.config(text=f"已批次歸檔 {len(saved)} 張圖片。")
+
+    @traced("tagger.load_image")
     def load_image(self):
         if self.current_index >= len(self.image_paths):
             self.display_completion_message()
             return
 
         self.save_button.config(state='normal')
+        self.batch_button.config(state='normal')
         self.plate_entry.config(state='normal')
         self.date_entry.config(state='normal')
+        self.filmstrip.set_current(self.current_index)
         filepath = self.image_paths[self.current_index]
         self.canvas.delete("all")
         self.zoom_canvas.delete("all")
         self.selection_rect = None
+        # 解碼下一張之前先釋放上一張的緩衝區，避免兩張全尺寸圖片同時存在於記憶體中
+        self._release_image()
+        rss_is_per_image = imaging.reset_peak_rss()
+        decode_note = ""
 
         try:
-            self.original_img = Image.open(filepath)
-            img_for_display = self.original_img.copy()
-            self.root.update_idletasks()
+            Image, ImageTk = load_pil()
+            with span("image.decode"):
+                self.original_img, original_size = imaging.decode_within_budget(filepath)
+            if self.original_img.size != original_size:
+                decode_note = f"，超出像素預算，以 {self.original_img.width}x{self.original_img.height} 解碼"
+            with span("tk.update_idletasks"):
+                self.root.update_idletasks()
             canvas_width = self.canvas.winfo_width()
             canvas_height = self.canvas.winfo_height()
-            img_for_display.thumbnail((canvas_width, canvas_height), Image.Resampling.LANCZOS)
+            with span("image.resize"):
+                # 直接縮小成顯示尺寸，不再複製一份全尺寸的圖片
+                scale = min(canvas_width / self.original_img.width, canvas_height / self.original_img.height, 1)
+                display_size = (max(1, round(self.original_img.width * scale)),
+                                max(1, round(self.original_img.height * scale)))
+                img_for_display = self.original_img
+                if display_size != self.original_img.size:
+                    img_for_display = self.original_img.resize(display_size, Image.Resampling.LANCZOS,
+                                                               reducing_gap=3.0)
             self.displayed_img_info = {
                 'width': img_for_display.width,
                 'height': img_for_display.height,
                 'x_offset': (canvas_width - img_for_display.width) / 2,
                 'y_offset': (canvas_height - img_for_display.height) / 2
             }
-            self.photo = ImageTk.PhotoImage(img_for_display)
-            self.canvas.create_image(canvas_width / 2, canvas_height / 2, anchor='center', image=self.photo)
+            with span("tk.draw_image"):
+                self.photo = ImageTk.PhotoImage(img_for_display)
+                self.canvas.create_image(canvas_width / 2, canvas_height / 2, anchor='center', image=self.photo)
         except Exception as e:
             self.original_img = None
             self.canvas.create_text(400, 300, text=f"無法載入圖片:\n{os.path.basename(filepath)}\n{e}",
                                     font=("Arial", 16), fill="red")
 
-        self.status_label.config(text=f"進度：{self.current_index + 1} / {len(self.image_paths)}")
+        peak = imaging.peak_rss()
+        memory_note = ""
+        if peak is not None:
+            memory_note = f" | {'本張' if rss_is_per_image else '累計'}記憶體峰值 {peak / 1024 / 1024:.0f} MB"
+        self.status_label.config(
+            text=f"進度：{self.current_index + 1} / {len(self.image_paths)}{memory_note}{decode_note}")
         self.plate_var.set("")
         if self.last_used_date:
             self.date_var.set(self.last_used_date)
@@ -217,18 +489,39 @@ class ImageTaggerApp:
             self.date_var.set(date.today().strftime("%Y-%m-%d"))
         self.plate_entry.focus_set()
 
-    def save_and_next(self, event=None):
-        plate = self.plate_var.get().strip().upper()
-        shot_date = self.date_var.get().strip()
+        self.fingerprinter.request(self.image_paths[self.current_index:self.current_index + BURST_LOOKAHEAD + 1])
+        self._suggest_burst_plate(self.current_index)
 
-        if not plate or not shot_date:
-            messagebox.showwarning("輸入錯誤", "車牌號碼和拍攝日期不能為空！")
+    def _suggest_burst_plate(self, index):
+        """若目前圖片與剛儲存的上一張屬於同一組連拍，預填上一張的車牌 (全選，直接輸入即可覆蓋)。"""
+        if index != self.current_index or self.plate_var.get():
+            return  # 已換到其他圖片，或使用者已開始輸入
+        if not self.last_saved or self.last_saved[0] != index - 1:
             return
-        try:
-            datetime.strptime(shot_date, "%Y-%m-%d")
-        except ValueError:
-            messagebox.showwarning("格式錯誤", "拍攝日期格式不正確，請使用 YYYY-MM-DD 格式。")
+        previous_path, current_path = self.image_paths[index - 1], self.image_paths[index]
+        if not (self.fingerprinter.is_ready(previous_path) and self.fingerprinter.is_ready(current_path)):
+            self.root.after(BURST_POLL_MS, self._suggest_burst_plate, index)
             return
+        previous, current = self.fingerprinter.result(previous_path), self.fingerprinter.result(current_path)
+        if previous is None or current is None or not same_burst(previous, current):
+            return
+        self.plate_var.set(self.last_saved[1])
+        self.plate_entry.select_range(0, 'end')
+        self.plate_entry.icursor('end')
+        self.status_label.config(text=f"進度：{index + 1} / {len(self.image_paths)} (同一組連拍，已預填車牌)")
+
+    @traced("tagger.save_and_next")
+    def save_and_next(self, event=None):
+        if self.batch_future or self.current_index >= len(self.image_paths):
+            return
+        entry = self._read_plate_and_date()
+        if not entry:
+            return
+        # 從縮圖列回到已歸檔的圖片時，再次儲存會在圖庫中多出一份重複的照片
+        if self.current_index in self.done_indices and not messagebox.askyesno(
+                "圖片已歸檔", "這張圖片已經歸檔過，再次儲存會在圖庫中建立重複的照片。\n確定要再儲存一次嗎？"):
+            return
+        plate, shot_date = entry
         self.last_used_date = shot_date
 
         original_filepath = self.image_paths[self.current_index]
@@ -236,55 +529,35 @@ class ImageTaggerApp:
         # --- 移除：移除所有與重新命名原始檔案相關的邏輯 ---
         
         try:
-            pages_dir = os.path.join(self.script_dir, "pages")
-            safe_plate_name = sanitize_foldername(plate)
-            plate_dir = os.path.join(pages_dir, safe_plate_name)
-            os.makedirs(plate_dir, exist_ok=True)
-
-            # --- 修改：使用 (車牌, 日期) 作為鍵來取得計數 ---
-            counter_key = (safe_plate_name, shot_date)
-            count = self.plate_date_counters.get(counter_key, 0) + 1
-            
-            _ , file_ext = os.path.splitext(os.path.basename(original_filepath))
-            new_copy_filename = f"{plate}_{shot_date}_{count:02d}{file_ext}"
-            dest_path = os.path.join(plate_dir, new_copy_filename)
-
             # 每次都重新開啟原始圖片以進行儲存
-            img_to_save = Image.open(original_filepath)
-
-            # 準備並寫入EXIF日期資訊
-            exif_date_str = shot_date.replace('-', ':') + " 00:00:00"
-            exif_date_bytes = exif_date_str.encode('utf-8')
-            exif_dict = {"Exif": {piexif.ExifIFD.DateTimeOriginal: exif_date_bytes,
-                                  piexif.ExifIFD.DateTimeDigitized: exif_date_bytes}}
-            exif_bytes = piexif.dump(exif_dict)
-
-            if dest_path.lower().endswith(('.jpg', '.jpeg')):
-                img_to_save.save(dest_path, "jpeg", exif=exif_bytes)
-            else:
-                img_to_save.save(dest_path)
-
-            img_to_save.close()
-            
-            # --- 修改：更新新的計數器 ---
-            self.plate_date_counters[counter_key] = count
-            
+            self._archive_image(plate, sanitize_foldername(plate), original_filepath, shot_date)
+            self.last_saved = (self.current_index, plate)
+            self.done_indices.add(self.current_index)
+            self.filmstrip.mark_done([self.current_index])
+
         except Exception as e:
             messagebox.showerror("複製或處理檔案失敗", f"發生錯誤：\n{e}")
             # 如果出錯，不要跳到下一張，讓使用者可以重試
             return
 
-        self.current_index += 1
+        self.current_index = self._next_pending_index(self.current_index + 1)
         self.load_image()
 
-    def display_completion_message(self):
+    def _release_image(self):
+        """釋放目前圖片及其顯示用的 PhotoImage。"""
         if self.original_img:
             self.original_img.close()
             self.original_img = None
+        self.photo = None
+        self.zoom_photo = None
+
+    def display_completion_message(self):
+        self._release_image()
         self.canvas.delete("all")
         self.zoom_canvas.delete("all")
         self.canvas.create_text(400, 300, text="所有圖片皆已處理完畢！", font=("Arial", 24), justify='center')
         self.save_button.config(state='disabled')
+        self.batch_button.config(state='disabled')
         self.plate_entry.config(state='disabled')
         self.date_entry.config(state='disabled')
         self.status_label.config(text=f"完成！共處理 {len(self.image_paths)} 張圖片")
@@ -292,11 +565,17 @@ class ImageTaggerApp:
     def on_closing(self):
         if self.original_img:
             self.original_img.close()
+        if self.fingerprinter:
+            self.fingerprinter.close()
+        self.filmstrip.close()
+        self.batch_executor.shutdown(wait=True)  # 等待進行中的批次歸檔寫完，避免留下寫到一半的檔案
         self.root.destroy()
 
 
 if __name__ == "__main__":
     root = Tk()
+    PROFILER.mark("建立 Tk 視窗")
     app = ImageTaggerApp(root)
+    PROFILER.mark("建立介面元件")
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,92 @@
+# imaging.py
+# 有記憶體上限的圖片解碼：超過像素預算的圖片 (全景照、誤匯出的超大檔案) 以縮小的比例解碼，
+# 讓標記工具在任何輸入下都維持固定的記憶體用量。
+import os
+import sys
+import math
+from startup_profile import PROFILER
+
+# 以環境變數 BUS_GALLERY_PIXEL_BUDGET=<百萬像素> 調整；預設 24 MP (RGB 約 72 MB)
+PIXEL_BUDGET_ENV = "BUS_GALLERY_PIXEL_BUDGET"
+DEFAULT_PIXEL_BUDGET = 24_000_000
+# 無法以 draft 縮小解碼的格式 (PNG、BMP、GIF...) 必須先以全尺寸解碼，超過預算的這個倍數時拒絕開啟
+FULL_DECODE_LIMIT_FACTOR = 8
+
+
+def pixel_budget():
+    try:
+        return max(1, int(float(os.environ[PIXEL_BUDGET_ENV]) * 1_000_000))
+    except (KeyError, ValueError):
+        return DEFAULT_PIXEL_BUDGET
+
+
+def fit_size(width, height, max_pixels):
+    """等比例縮小到像素數不超過 max_pixels 的最大尺寸；原本就在預算內時回傳原尺寸。"""
+    if width * height <= max_pixels:
+        return width, height
+    scale = math.sqrt(max_pixels / (width * height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def decode_within_budget(path, max_pixels=None):
+    """
+    解碼圖片並回傳 (圖片, 原始尺寸)，解碼結果的像素數不超過 max_pixels：
+    1. JPEG 以 draft 讓解碼器直接以 1/2、1/4 或 1/8 的比例解碼，不會配置全尺寸的緩衝區。
+    2. draft 縮小後仍超出預算時，才縮小到剛好符合預算的尺寸 (不會因為整數倍率而多縮一半)，並釋放解碼用的圖片。
+    其他格式無法縮小解碼，解碼期間仍會配置全尺寸的緩衝區 (之後同樣縮小到預算內)；
+    超過預算 FULL_DECODE_LIMIT_FACTOR 倍的這類圖片在解碼前就拋出 ValueError。
+    回傳的圖片已完整載入，原始檔案已關閉 (多格的 GIF 除外)。
+    """
+    Image = PROFILER.import_module('PIL.Image')
+    Image.MAX_IMAGE_PIXELS = None
+    max_pixels = max_pixels or pixel_budget()
+    img = Image.open(path)
+    original_size = img.size
+    try:
+        width, height = img.size
+        if width * height > max_pixels:
+            # draft 選擇的比例會讓解碼結果不小於要求的尺寸，多出的部分由下面的縮小處理
+            drafted = img.draft(img.mode, fit_size(width, height, max_pixels))
+            if drafted is None and width * height > max_pixels * FULL_DECODE_LIMIT_FACTOR:
+                raise ValueError(f"圖片過大 ({width}x{height})，此格式無法縮小解碼，"
+                                 f"超過像素預算的 {FULL_DECODE_LIMIT_FACTOR} 倍 (可設定 {PIXEL_BUDGET_ENV})。")
+        img.load()
+    except BaseException:
+        img.close()
+        raise
+
+    target_size = fit_size(*img.size, max_pixels)
+    if target_size != img.size:
+        # reducing_gap 讓 Pillow 先以整數倍率快速縮小，再以 LANCZOS 縮到精確的尺寸
+        resized = img.resize(target_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        img.close()
+        img = resized
+    return img, original_size
+
+
+def reset_peak_rss():
+    """重設本行程的記憶體峰值 (僅 Linux 支援)，回傳是否成功；不支援時 peak_rss() 為整個行程期間的峰值。"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """回傳本行程的記憶體 (RSS) 峰值 (位元組)，無法取得時回傳 None。"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以位元組為單位，其他平台為 KB
+    return peak if sys.platform == 'darwin' else peak * 1024
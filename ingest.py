@@ -0,0 +1,153 @@
+# ingest.py
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import archive
+from tracing import span
+
+# --- 常數設定 ---
+# 假設此腳本與 manager.py 在同一個目錄下
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# 只會附加的 JSON Lines 紀錄：原始圖片的雜湊快取，以及每張原始圖片歸檔成哪些圖庫檔案
+INGEST_LEDGER_FILE = os.path.join(SCRIPT_DIR, "ingest_ledger.jsonl")
+HASH_WORKERS = 4
+# 紀錄的行數超過有效項目數的這個倍數時重寫 (合併重複的行)
+COMPACT_RATIO = 2
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class IngestLedger:
+    """
+    記錄每張原始圖片 (以內容的 SHA-256 識別) 歸檔成了哪些圖庫檔案，重新開啟同一個相機資料夾時
+    可以略過已歸檔的圖片。歸檔到圖庫的檔案會重新編碼並寫入 EXIF，無法由圖庫檔案反推原始圖片，只能靠這份紀錄。
+    每次歸檔立即附加一行，程式當機也不會遺失；多個程式同時附加時以 archive.index_lock 鎖定。
+    """
+
+    def __init__(self, pages_dir, ledger_file=INGEST_LEDGER_FILE):
+        self.pages_dir = pages_dir
+        self.ledger_file = ledger_file
+        self.hashes = {}  # 原始檔絕對路徑 -> (大小, mtime_ns, SHA-256)
+        self.archived = {}  # SHA-256 -> [圖庫中的相對路徑 ('車牌/檔名')]
+        self._line_count = 0
+
+    def _apply(self, record):
+        if "path" in record:
+            self.hashes[record["path"]] = (record["size"], record["mtime_ns"], record["sha256"])
+        else:
+            copies = self.archived.setdefault(record["sha256"], [])
+            if record["archived"] not in copies:
+                copies.append(record["archived"])
+
+    def load(self):
+        """重新讀取紀錄 (包含其他程式附加的部分)；檔案不存在時從空白開始。"""
+        self.hashes, self.archived = {}, {}
+        self._line_count = 0
+        try:
+            with open(self.ledger_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._line_count += 1
+                    try:
+                        self._apply(json.loads(line))
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        continue  # 當機時寫到一半的最後一行
+        except FileNotFoundError:
+            pass
+
+    def _records(self):
+        for path, (size, mtime_ns, digest) in sorted(self.hashes.items()):
+            yield {"path": path, "size": size, "mtime_ns": mtime_ns, "sha256": digest}
+        for digest, copies in self.archived.items():
+            for rel_path in copies:
+                yield {"sha256": digest, "archived": rel_path}
+
+    def _append(self, records):
+        if not records:
+            return
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with archive.index_lock(self.ledger_file), open(self.ledger_file, 'a', encoding='utf-8') as f:
+            f.write(data)
+        self._line_count += len(records)
+
+    def _compact_if_needed(self):
+        entries = len(self.hashes) + sum(len(copies) for copies in self.archived.values())
+        if self._line_count <= COMPACT_RATIO * entries + 100:
+            return
+        with archive.index_lock(self.ledger_file):
+            # 先重新讀取，以免覆蓋掉其他程式剛附加的紀錄
+            self.load()
+            tmp_path = os.path.join(os.path.dirname(self.ledger_file), f".{os.path.basename(self.ledger_file)}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in self._records():
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.ledger_file)
+            self._line_count = len(self.hashes) + sum(len(copies) for copies in self.archived.values())
+
+    def existing_copies(self, digest):
+        """回傳該原始圖片目前仍存在於圖庫中的歸檔檔案 (已從圖庫刪除的不算)。"""
+        return [rel_path for rel_path in self.archived.get(digest, [])
+                if os.path.exists(archive.image_path(self.pages_dir, *rel_path.split('/', 1)))]
+
+    def scan(self, paths, workers=HASH_WORKERS):
+        """
+        一次批次比對一個資料夾的原始圖片，回傳 {原始檔路徑: [圖庫中的歸檔檔案]} (只包含已歸檔的圖片)：
+        1. 重新讀取紀錄，納入其他程式的歸檔結果。
+        2. 大小與修改時間和紀錄相同的檔案直接沿用紀錄中的雜湊，其餘以多執行緒平行計算並附加到紀錄。
+        """
+        self.load()
+        digests, pending = {}, []
+        for path in paths:
+            key = os.path.abspath(path)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            cached = self.hashes.get(key)
+            if cached and cached[:2] == (st.st_size, st.st_mtime_ns):
+                digests[path] = cached[2]
+            else:
+                pending.append((path, key, st))
+
+        if pending:
+            with span("ingest.hash"), ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(lambda item: file_sha256(item[0]), pending))
+            records = []
+            for (path, key, st), digest in zip(pending, results):
+                self.hashes[key] = (st.st_size, st.st_mtime_ns, digest)
+                digests[path] = digest
+                records.append({"path": key, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest})
+            self._append(records)
+        self._compact_if_needed()
+
+        archived = {}
+        for path, digest in digests.items():
+            copies = self.existing_copies(digest)
+            if copies:
+                archived[path] = copies
+        return archived
+
+    def record(self, source_path, archived_path):
+        """歸檔完成後呼叫：記錄原始圖片產生了哪個圖庫檔案，立即附加到紀錄中。"""
+        key = os.path.abspath(source_path)
+        st = os.stat(source_path)
+        records = []
+        cached = self.hashes.get(key)
+        if cached and cached[:2] == (st.st_size, st.st_mtime_ns):
+            digest = cached[2]
+        else:
+            digest = file_sha256(source_path)
+            self.hashes[key] = (st.st_size, st.st_mtime_ns, digest)
+            records.append({"path": key, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest})
+        # 以 '車牌/檔名' 記錄，與資料夾配置無關
+        rel_path = f"{os.path.basename(os.path.dirname(archived_path))}/{os.path.basename(archived_path)}"
+        record = {"sha256": digest, "archived": rel_path}
+        self._apply(record)
+        records.append(record)
+        self._append(records)
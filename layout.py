@@ -0,0 +1,89 @@
+# layout.py
+import os
+import sys
+import argparse
+import archive
+
+# --- 常數設定 ---
+# 假設此腳本與 manager.py 在同一個目錄下
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(SCRIPT_DIR, "pages")
+
+
+def plan_migration(pages_dir, target):
+    """回傳將圖庫遷移到目標配置需要搬移的 [(車牌, 目前路徑, 目標路徑)]。"""
+    moves = []
+    for plate, path in sorted(archive.list_plate_dirs(pages_dir).items()):
+        destination = archive.plate_dir(pages_dir, plate, layout=target)
+        if os.path.normpath(path) != os.path.normpath(destination):
+            moves.append((plate, path, destination))
+    return moves
+
+
+def migrate(pages_dir, target, dry_run=False):
+    """
+    將車牌資料夾搬移到目標配置 (LAYOUT_FLAT 或 LAYOUT_SHARDED)，回傳搬移的資料夾數：
+    1. 先切換到相容模式，之後任何時間中斷 (或當機) 都能同時讀取兩種配置，重新執行即可從中斷處繼續。
+    2. 每個車牌資料夾以 os.rename 整個搬移，圖片與索引不會被複製或修改；搬移期間持有該車牌的鎖定
+       (鎖定檔在 pages/.locks 中，不會隨資料夾移動)。
+    3. 全部搬移完成後才切換到目標配置。
+    """
+    if target not in (archive.LAYOUT_FLAT, archive.LAYOUT_SHARDED):
+        raise ValueError(f"只能遷移到 '{archive.LAYOUT_FLAT}' 或 '{archive.LAYOUT_SHARDED}' 配置")
+    if not dry_run:
+        archive.write_layout(pages_dir, archive.LAYOUT_COMPAT)
+    moves = plan_migration(pages_dir, target)
+    for plate, path, destination in moves:
+        print(f"  > {os.path.relpath(path, pages_dir)} -> {os.path.relpath(destination, pages_dir)}")
+        if dry_run:
+            continue
+        if os.path.exists(destination):
+            raise FileExistsError(f"目標資料夾 '{destination}' 已存在，請先手動合併 '{plate}'。")
+        # 鎖定檔在 pages/.locks 中，持有鎖定時資料夾內沒有已開啟的檔案，可以直接搬移
+        with archive.plate_lock(pages_dir, plate):
+            if not os.path.isdir(path):
+                continue  # 等待鎖定期間已被其他程式重命名或刪除
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            os.rename(path, destination)
+        if target == archive.LAYOUT_FLAT:
+            shard_path = os.path.dirname(path)
+            if not os.listdir(shard_path):
+                os.rmdir(shard_path)
+    if not dry_run:
+        archive.write_layout(pages_dir, target)
+    return len(moves)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="顯示或切換 pages 資料夾的配置：平面 (pages/EAL-3100/) 或依車牌字首分片 (pages/EAL/EAL-3100/)。")
+    parser.add_argument("--migrate", choices=(archive.LAYOUT_FLAT, archive.LAYOUT_SHARDED),
+                        help="將所有車牌資料夾搬移到指定的配置")
+    parser.add_argument("--compat", action="store_true",
+                        help="只切換到相容模式 (同時讀取兩種配置，新的車牌建立在分片中)，不搬移任何資料夾")
+    parser.add_argument("--dry-run", action="store_true", help="只列出會搬移的資料夾，不實際搬移")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(PAGES_DIR):
+        print(f"錯誤：找不到 'pages' 資料夾 '{PAGES_DIR}'。")
+        return 1
+
+    if args.migrate or args.compat:
+        print("請先關閉 manager.py、image_processor.py 等其他工具，它們在啟動時才會讀取資料夾配置。")
+    if args.compat and not args.dry_run:
+        archive.write_layout(PAGES_DIR, archive.LAYOUT_COMPAT)
+    if args.migrate:
+        try:
+            moved = migrate(PAGES_DIR, args.migrate, dry_run=args.dry_run)
+        except OSError as e:
+            print(f"錯誤：遷移時發生錯誤，圖庫維持在相容模式，修正後請重新執行: {e}")
+            return 1
+        print(f"{'將會' if args.dry_run else '已'}搬移 {moved} 個車牌資料夾。")
+
+    plates, shards = archive.scan_layout(PAGES_DIR)
+    print(f"目前配置: {archive.read_layout(PAGES_DIR)}，共 {len(plates)} 個車牌資料夾、{len(shards)} 個分片。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,27 @@
 import os
 import json
-import re
 import sys  # 用於判斷作業系統
 import subprocess  # 用於在 macOS/Linux 開啟檔案
-import shutil # 用於安全地刪除資料夾
+from concurrent.futures import ThreadPoolExecutor
+from startup_profile import PROFILER  # 需在其他模組之前匯入，才能記錄匯入時間
 # 匯入 simpledialog 來建立簡單的輸入對話框
-from tkinter import Tk, Frame, Listbox, Label, Entry, Button, Scrollbar, messagebox, StringVar, PanedWindow, simpledialog
-from PIL import Image
+from tkinter import Tk, Frame, Listbox, Label, Entry, Button, Scrollbar, messagebox, StringVar, PanedWindow, simpledialog, \
+    BooleanVar, Checkbutton, Toplevel, ttk
+import archive
+import similarity
+import stats
+import timeline
+from tracing import TRACER, span, traced
+from watcher import PagesWatcher, RESCAN_ALL
+from widgets import VirtualListbox
 
-Image.MAX_IMAGE_PIXELS = None
-SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+WATCH_APPLY_INTERVAL_MS = 500
+SCAN_BATCH_SIZE = 50  # 啟動時每批同步的車輛數，批次之間讓出主執行緒處理介面事件
+STARTUP_BUDGET_MS = 800  # 從啟動到車牌列表可操作的時間預算
+TRACE_READOUT_INTERVAL_MS = 250
+SIMILARITY_POLL_INTERVAL_MS = 100
+
+PROFILER.mark("匯入模組")
 
 
 class IndexManagerApp:
@@ -20,10 +32,28 @@ class IndexManagerApp:
         # --- 資料變數 (無變動) ---
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         self.pages_dir = os.path.join(self.script_dir, "pages")
-        self.main_index_data = {}
+        # 主索引與各車輛圖片索引的共用模型；圖片索引有快取，重複選取同一車牌不需重新讀檔
+        self.archive_model = archive.ArchiveModel(self.pages_dir)
         self.vehicle_index_data = {}
+        # 各客運、廠牌、型號、月份的統計，隨每次寫入增量更新 (第一次使用時才讀取快取)
+        self.stats = stats.ArchiveStats(self.pages_dir)
+        self.stats_window = None
+        # 所有圖片的 dHash 與 BK 樹，在背景執行緒中更新；圖片有變動的車牌先記下，下次查詢前才重新比對
+        self.similarity = similarity.SimilarityIndex(self.pages_dir)
+        self._similarity_dirty = set()
+        self._similarity_executor = None
+        self._similarity_future = None
+        self.similarity_window = None
+        # 跨車牌的日期索引，隨啟動掃描建立，之後隨每次圖片索引寫入增量更新
+        self.timeline = timeline.DateIndex()
+        self.timeline_window = None
+        self._timeline_rows = {}
         self.current_plate = None
+        # 選取車牌時欄位顯示的內容；批次套用只套用之後被修改過的欄位
+        self.loaded_plate_info = archive.empty_vehicle_info()
         self.current_image = None
+        self.watcher = None
+        self._scan_generation = 0
 
         # --- GUI 元件 ---
         main_pane = PanedWindow(root, orient='horizontal', sashrelief='raised', bg="gray90")
@@ -46,11 +76,9 @@ class IndexManagerApp:
         search_entry.bind("<KeyRelease>", self.filter_plates)
         plate_list_frame = Frame(left_pane)
         plate_list_frame.pack(fill='both', expand=True, padx=5, pady=5)
-        plate_scrollbar = Scrollbar(plate_list_frame)
-        plate_scrollbar.pack(side='right', fill='y')
-        self.plates_listbox = Listbox(plate_list_frame, yscrollcommand=plate_scrollbar.set, exportselection=False)
-        self.plates_listbox.pack(side='left', fill='both', expand=True)
-        plate_scrollbar.config(command=self.plates_listbox.yview)
+        # 車牌列表使用虛擬化列表，只繪製可見的列；Ctrl/Shift + 點擊可選取多個車牌以批次編輯
+        self.plates_listbox = VirtualListbox(plate_list_frame, multiple=True)
+        self.plates_listbox.pack(fill='both', expand=True)
         self.plates_listbox.bind('<<ListboxSelect>>', self.on_plate_select)
         plate_info_frame = Frame(left_pane)
         plate_info_frame.pack(fill='x', padx=5, pady=10)
@@ -78,9 +106,16 @@ class IndexManagerApp:
         paste_button.pack(side='left', expand=True, fill='x', padx=2)
         self.rebuild_index_button = Button(plate_actions_frame, text="重建索引", command=self.rebuild_selected_vehicle_index, state='disabled')
         self.rebuild_index_button.pack(side='left', expand=True, fill='x', padx=2)
+        self.find_similar_button = Button(plate_actions_frame, text="相似車輛", command=self.find_similar_plates, state='disabled')
+        self.find_similar_button.pack(side='left', expand=True, fill='x', padx=2)
+
+        # 批次編輯：將上方修改過的欄位一次套用到所有選取的車牌
+        self.bulk_apply_button = Button(left_pane, text="套用至所有選取的車牌", command=self.bulk_apply_plate_info, state='disabled')
+        self.bulk_apply_button.pack(fill='x', padx=7, pady=(0, 5))
 
         # 將車牌操作按鈕分組
-        self.plate_action_buttons = [copy_button, paste_button, self.rebuild_index_button, self.rename_plate_button]
+        self.plate_action_buttons = [copy_button, paste_button, self.rebuild_index_button, self.rename_plate_button,
+                                     self.find_similar_button, self.bulk_apply_button]
 
         # --- 右側：圖片管理 ---
         Label(right_pane, text="圖片 (檔案)", font=("Arial", 12, "bold")).pack(pady=5)
@@ -140,23 +175,46 @@ class IndexManagerApp:
         bottom_frame = Frame(root, padx=5, pady=2)
         bottom_frame.pack(side='bottom', fill='x')
         Button(bottom_frame, text="資料夾健康檢查", command=self.perform_health_check).pack(side='left')
+        Button(bottom_frame, text="統計", command=self.show_stats_panel).pack(side='left', padx=(5, 0))
+        Button(bottom_frame, text="時間軸", command=self.show_timeline_panel).pack(side='left', padx=(5, 0))
+        self.watch_var = BooleanVar(value=False)
+        Checkbutton(bottom_frame, text="即時同步", variable=self.watch_var, command=self.toggle_watch_mode).pack(side='left', padx=5)
+        if TRACER.enabled:
+            # 追蹤模式：在狀態列右側即時顯示最近一次操作的耗時
+            self.trace_label = Label(bottom_frame, text="", fg="gray30", bd=1, relief='sunken', anchor='e')
+            self.trace_label.pack(side='right', padx=(5, 0))
+            self.root.after(TRACE_READOUT_INTERVAL_MS, self._refresh_trace_readout)
         self.status_label = Label(bottom_frame, text="正在初始化...", bd=1, relief='sunken', anchor='w')
         self.status_label.pack(side='right', fill='x', expand=True)
 
-        self.root.after(100, self.initialize_and_scan_all)
+        # 先讓視窗完成繪製，再開始掃描
+        self.root.after_idle(self._on_first_idle)
 
-    def rename_or_merge_plate(self):
-        """重命名選定的車牌，或在名稱衝突時將其與現有車牌合併。"""
+    def _refresh_trace_readout(self):
+        if TRACER.last_operation:
+            name, ms = TRACER.last_operation
+            self.trace_label.config(text=f"上次操作 {name}: {ms:.1f} ms")
+        self.root.after(TRACE_READOUT_INTERVAL_MS, self._refresh_trace_readout)
+
+    def _on_first_idle(self):
+        self.root.update_idletasks()
+        PROFILER.mark("首次繪製")
+        self.initialize_and_scan_all()
+
+    @traced("manager.rename_or_merge_plate")
+    def rename_or_merge_plate(self, new_name=None):
+        """重命名選定的車牌，或在名稱衝突時將其與現有車牌合併；未指定 new_name 時詢問使用者。"""
         if not self.current_plate:
             messagebox.showinfo("提示", "請先選擇一個要重命名的車牌。")
             return
 
         old_name = self.current_plate
-        new_name = simpledialog.askstring(
-            "重命名或合併車牌",
-            f"請為 '{old_name}' 輸入新的車牌號碼:",
-            initialvalue=old_name
-        )
+        if new_name is None:
+            new_name = simpledialog.askstring(
+                "重命名或合併車牌",
+                f"請為 '{old_name}' 輸入新的車牌號碼:",
+                initialvalue=old_name
+            )
 
         if not new_name:
             return  # 使用者取消
@@ -165,25 +223,23 @@ class IndexManagerApp:
         if not new_name or new_name == old_name:
             return  # 沒有變更或輸入為空
 
-        old_path = os.path.join(self.pages_dir, old_name)
-        new_path = os.path.join(self.pages_dir, new_name)
+        new_path = archive.plate_dir(self.pages_dir, new_name)
 
         try:
             # 情況 1: 簡單重命名 (新名稱不存在)
             if not os.path.isdir(new_path):
-                # 1. 重命名實體資料夾
-                os.rename(old_path, new_path)
-
-                # 2. 重命名資料夾內的所有圖片
-                images_to_rename = [f for f in os.listdir(new_path) if f.lower().endswith(SUPPORTED_FORMATS)]
-                for filename in images_to_rename:
-                    # 檔名格式為 PLATE_YYYY-MM-DD_NN.ext
-                    if filename.startswith(old_name + '_'):
-                        new_filename = new_name + filename[len(old_name):]
-                        os.rename(os.path.join(new_path, filename), os.path.join(new_path, new_filename))
-
-                # 3. 在記憶體中更新主索引資料
-                self.main_index_data[new_name] = self.main_index_data.pop(old_name)
+                # 1 & 2. 重命名實體資料夾及資料夾內的所有圖片
+                archive.rename_plate_folder(self.pages_dir, old_name, new_name)
+                self.archive_model.invalidate(old_name)
+                self.archive_model.invalidate(new_name)
+
+                # 3. 在記憶體中更新主索引資料與車牌列表
+                self.archive_model.vehicles[new_name] = self.archive_model.vehicles.pop(old_name)
+                self.stats.rename_plate(old_name, new_name)
+                self._similarity_dirty.add(old_name)
+                self.timeline.remove_plate(old_name)
+                self.plates_listbox.remove_item(old_name)
+                self.plates_listbox.insert_item(new_name)
 
                 # 4. 將更新後的主索引寫入檔案
                 self._write_main_index()
@@ -208,8 +264,12 @@ class IndexManagerApp:
                 # 執行合併操作
                 self._perform_merge(old_name, new_name)
                 
-                # 更新主索引：移除舊項目
-                del self.main_index_data[old_name]
+                # 更新主索引與車牌列表：移除舊項目
+                del self.archive_model.vehicles[old_name]
+                self.stats.remove_plate(old_name)
+                self._similarity_dirty.add(old_name)
+                self.timeline.remove_plate(old_name)
+                self.plates_listbox.remove_item(old_name)
                 self._write_main_index()
 
                 self.show_timed_status(f"已成功將 '{old_name}' 合併入 '{new_name}'。")
@@ -224,58 +284,10 @@ class IndexManagerApp:
 
     def _perform_merge(self, old_name, new_name):
         """執行將一個車牌的圖片合併到另一個車牌並重新編號的後端邏輯。"""
-        old_path = os.path.join(self.pages_dir, old_name)
-        new_path = os.path.join(self.pages_dir, new_name)
-
-        # 1. 將所有圖片檔案從舊資料夾移動到新資料夾
-        for filename in os.listdir(old_path):
-            if filename.lower().endswith(SUPPORTED_FORMATS):
-                shutil.move(os.path.join(old_path, filename), os.path.join(new_path, filename))
-
-        # 2. 刪除舊資料夾
-        shutil.rmtree(old_path)
-
-        # 3. 重新編號目標資料夾中的所有圖片
-        all_images = [f for f in os.listdir(new_path) if f.lower().endswith(SUPPORTED_FORMATS)]
-        
-        # 為了避免在重新命名時發生衝突 (例如 A->B, B->C)，我們先將所有檔案重命名為暫存名稱
-        temp_suffix = "_TEMP_RENAME_"
-        for filename in all_images:
-            try:
-                os.rename(os.path.join(new_path, filename), os.path.join(new_path, filename + temp_suffix))
-            except FileExistsError: # 如果暫存檔已存在，則使用更獨特的名稱
-                os.rename(os.path.join(new_path, filename), os.path.join(new_path, filename + temp_suffix + os.urandom(4).hex()))
-
-
-        temp_images = [f for f in os.listdir(new_path) if temp_suffix in f]
-        date_groups = {}
-        
-        # 根據原始檔名中的日期對暫存檔案進行分組
-        for temp_filename in temp_images:
-            original_name = temp_filename.split(temp_suffix)[0]
-            match = re.match(r".*?_(\d{4}-\d{2}-\d{2})", original_name)
-            date_key = match.group(1) if match else "unknown_date"
-            if date_key not in date_groups:
-                date_groups[date_key] = []
-            date_groups[date_key].append(temp_filename)
-
-        # 在每個日期組內對檔案進行排序並重命名
-        for date, files in date_groups.items():
-            # 對於無法解析日期的檔案，為安全起見僅還原其原始名稱
-            if date == "unknown_date":
-                print(f"警告：在 '{new_name}' 中發現無法解析日期的檔案，將跳過重新編號：{[f.split(temp_suffix)[0] for f in files]}")
-                for temp_filename in files:
-                    original_name = temp_filename.split(temp_suffix)[0]
-                    os.rename(os.path.join(new_path, temp_filename), os.path.join(new_path, original_name))
-                continue
-            
-            # 排序以確保重新編號順序的一致性
-            for i, temp_filename in enumerate(sorted(files), 1):
-                original_name = temp_filename.split(temp_suffix)[0]
-                _, ext = os.path.splitext(original_name)
-                # 建立新的標準化檔名
-                new_filename = f"{new_name}_{date}_{i:02d}{ext.lower()}"
-                os.rename(os.path.join(new_path, temp_filename), os.path.join(new_path, new_filename))
+        # 1-3. 移動圖片、刪除舊資料夾並重新編號
+        archive.merge_plate_folders(self.pages_dir, old_name, new_name)
+        self.archive_model.invalidate(old_name)
+        self.archive_model.invalidate(new_name)
 
         # 4. 強制為合併後的資料夾重建索引
         self._sync_vehicle_index(new_name)
@@ -289,18 +301,11 @@ class IndexManagerApp:
         self.search_var.set("")
         self.filter_plates()
 
-        # 嘗試找到並選中新的/合併後的項目
-        try:
-            all_items = self.plates_listbox.get(0, 'end')
-            if select_plate_name in all_items:
-                new_index = all_items.index(select_plate_name)
-                self.plates_listbox.selection_set(new_index)
-                self.plates_listbox.see(new_index)
-                self.on_plate_select(None) # 手動觸發選擇事件
-        except ValueError:
-            # 項目未找到，不執行任何操作
-            pass
+        # 嘗試找到並選中新的/合併後的項目 (找不到時不執行任何操作)
+        if self.plates_listbox.select_item(select_plate_name, notify=False):
+            self.on_plate_select(None) # 手動觸發選擇事件
 
+    @traced("manager.rebuild_selected_vehicle_index")
     def rebuild_selected_vehicle_index(self):
         """為當前選擇的車牌重建索引"""
         if not self.current_plate:
@@ -329,6 +334,7 @@ class IndexManagerApp:
             messagebox.showerror("重建失敗", f"重建索引時發生錯誤：\n{e}")
             self.update_status_progress()
 
+    @traced("manager.rename_image")
     def rename_image(self):
         """重命名所選的圖片檔案及其索引項目"""
         if not self.current_plate or not self.current_image:
@@ -353,13 +359,13 @@ class IndexManagerApp:
             new_name += old_ext
         
         # 檢查新檔名是否已存在
-        new_path = os.path.join(self.pages_dir, self.current_plate, new_name)
+        new_path = archive.image_path(self.pages_dir, self.current_plate, new_name)
         if os.path.exists(new_path):
             messagebox.showerror("重命名失敗", f"檔案 '{new_name}' 已存在於此資料夾中。")
             return
 
         try:
-            old_path = os.path.join(self.pages_dir, self.current_plate, old_name)
+            old_path = archive.image_path(self.pages_dir, self.current_plate, old_name)
             
             # 1. 重命名實體檔案
             os.rename(old_path, new_path)
@@ -410,6 +416,7 @@ class IndexManagerApp:
         except Exception as e:
             messagebox.showerror("複製失敗", f"無法將資訊複製到剪貼簿。\n錯誤: {e}")
 
+    @traced("manager.paste_plate_info")
     def paste_plate_info(self):
         if not self.current_plate:
             messagebox.showinfo("提示", "請先選擇一個要貼上資訊的車牌。")
@@ -428,6 +435,11 @@ class IndexManagerApp:
             self.year_var.set(data_to_paste.get("year", "").strip())
             self.manufacturer_var.set(data_to_paste.get("manufacturer", "").strip())
             self.model_var.set(data_to_paste.get("model", "").strip())
+            if len(self.plates_listbox.selected_items()) > 1:
+                # 貼上的所有非空白欄位都要套用，即使與目前車牌的值相同
+                self.bulk_apply_plate_info({key: data_to_paste[key].strip() for key in required_keys
+                                            if data_to_paste[key].strip()})
+                return
             self.auto_save_main_index_from_ui()
             self.show_timed_status(f"已將資訊貼上至 '{self.current_plate}'。")
         except json.JSONDecodeError:
@@ -435,15 +447,54 @@ class IndexManagerApp:
         except Exception as e:
             messagebox.showerror("貼上失敗", f"處理剪貼簿內容時發生錯誤。\n錯誤: {e}")
 
+    @traced("manager.bulk_apply_plate_info")
+    def bulk_apply_plate_info(self, fields=None):
+        """
+        將選取車牌後修改過的欄位套用到所有選取的車牌，只寫入一次主索引。
+        欄位在選取時顯示的是其中一個車牌的資訊，未修改的欄位不會被複製到其他車牌；
+        修改為空白的欄位會清除所有選取車牌的該欄位。fields 可直接指定要套用的 {欄位: 值}。
+        """
+        plates = self.plates_listbox.selected_items()
+        if len(plates) < 2:
+            messagebox.showinfo("提示", "請先以 Ctrl 或 Shift + 點擊選取多個車牌。")
+            return
+        if fields is None:
+            variables = [self.company_var, self.year_var, self.manufacturer_var, self.model_var]
+            loaded = self.loaded_plate_info.to_dict()
+            fields = {key: var.get().strip() for key, var in zip(archive.VEHICLE_INFO_KEYS, variables)
+                      if var.get().strip() != loaded.get(key, "")}
+        if not fields:
+            messagebox.showinfo("提示", "請先修改要套用的欄位 (未修改的欄位不會變更)。")
+            return
+        labels = {"company": "客運", "year": "年份", "manufacturer": "廠牌", "model": "型號"}
+        summary = "\n".join(f"{labels[key]}: {value or '(清除)'}" for key, value in fields.items())
+        confirm = messagebox.askyesno(
+            "確認批次套用", f"將以下資訊套用到 {len(plates)} 個選取的車牌？\n\n{summary}"
+        )
+        if not confirm:
+            return
+        try:
+            changed = self.archive_model.update_vehicles(plates, fields)
+        except Exception as e:
+            messagebox.showerror("寫入失敗", f"無法寫入主索引檔案：\n{e}")
+            return
+        for plate in changed:
+            self.stats.update_vehicle(plate, self.archive_model.vehicles[plate])
+        if self.current_plate in self.archive_model.vehicles:
+            self.loaded_plate_info = self.archive_model.vehicles[self.current_plate]
+        self.show_timed_status(f"已更新 {len(changed)} / {len(plates)} 個車牌的資訊。")
+
+    @traced("manager.on_plate_select")
     def on_plate_select(self, event):
-        selection_indices = self.plates_listbox.curselection()
-        if not selection_indices: return
-        self.current_plate = self.plates_listbox.get(selection_indices[0])
-        plate_data = self.main_index_data.get(self.current_plate, {})
-        self.company_var.set(plate_data.get("company", ""))
-        self.year_var.set(plate_data.get("year", ""))
-        self.manufacturer_var.set(plate_data.get("manufacturer", ""))
-        self.model_var.set(plate_data.get("model", ""))
+        selected_plate = self.plates_listbox.selected_item()
+        if not selected_plate: return
+        self.current_plate = selected_plate
+        plate_data = self.archive_model.vehicles.get(self.current_plate) or archive.empty_vehicle_info()
+        self.loaded_plate_info = plate_data
+        self.company_var.set(plate_data.company)
+        self.year_var.set(plate_data.year)
+        self.manufacturer_var.set(plate_data.manufacturer)
+        self.model_var.set(plate_data.model)
         
         # 啟用車牌操作按鈕
         for button in self.plate_action_buttons:
@@ -451,6 +502,7 @@ class IndexManagerApp:
             
         self.load_and_display_images()
 
+    @traced("manager.on_image_select")
     def on_image_select(self, event):
         selection_indices = self.images_listbox.curselection()
         if not selection_indices:
@@ -459,9 +511,9 @@ class IndexManagerApp:
             return
             
         self.current_image = self.images_listbox.get(selection_indices[0])
-        image_data = self.vehicle_index_data.get(self.current_image, {})
-        self.image_date_var.set(image_data.get("date", ""))
-        self.image_desc_var.set(image_data.get("description", ""))
+        image_data = self.vehicle_index_data.get(self.current_image)
+        self.image_date_var.set(image_data.date if image_data else "")
+        self.image_desc_var.set(image_data.description if image_data else "")
         
         for button in self.image_action_buttons:
             button.config(state='normal')
@@ -476,7 +528,7 @@ class IndexManagerApp:
 
     def open_image_externally(self):
         if not self.current_plate or not self.current_image: return
-        image_path = os.path.join(self.pages_dir, self.current_plate, self.current_image)
+        image_path = archive.image_path(self.pages_dir, self.current_plate, self.current_image)
         if not os.path.exists(image_path):
             messagebox.showerror("錯誤", f"找不到圖片檔案：\n{image_path}")
             return
@@ -492,7 +544,7 @@ class IndexManagerApp:
 
     def show_in_explorer(self):
         if not self.current_plate or not self.current_image: return
-        image_path = os.path.join(self.pages_dir, self.current_plate, self.current_image)
+        image_path = archive.image_path(self.pages_dir, self.current_plate, self.current_image)
         if not os.path.exists(image_path):
             messagebox.showerror("錯誤", f"找不到圖片檔案：\n{image_path}")
             return
@@ -507,13 +559,14 @@ class IndexManagerApp:
         except Exception as e:
             messagebox.showerror("開啟失敗", f"無法在檔案總管中顯示圖片。\n錯誤訊息: {e}")
 
+    @traced("manager.delete_image")
     def delete_image(self):
         if not self.current_plate or not self.current_image: return
         confirm = messagebox.askyesno(
             "確認刪除", f"您確定要永久刪除以下檔案嗎？\n\n{self.current_image}\n\n此操作無法復原！"
         )
         if not confirm: return
-        image_path = os.path.join(self.pages_dir, self.current_plate, self.current_image)
+        image_path = archive.image_path(self.pages_dir, self.current_plate, self.current_image)
         try:
             if os.path.exists(image_path): os.remove(image_path)
             if self.current_image in self.vehicle_index_data: del self.vehicle_index_data[self.current_image]
@@ -523,6 +576,7 @@ class IndexManagerApp:
         except Exception as e:
             messagebox.showerror("刪除失敗", f"刪除圖片時發生錯誤。\n錯誤: {e}")
 
+    @traced("manager.move_image")
     def _move_image(self, direction):
         selection_indices = self.images_listbox.curselection()
         if not selection_indices: return
@@ -565,108 +619,150 @@ class IndexManagerApp:
         for button in self.image_action_buttons:
             button.config(state='disabled')
 
+    @traced("manager.initialize_and_scan_all")
     def initialize_and_scan_all(self):
         self._sync_main_index()
-        self.status_label.config(text="正在掃描並生成所有索引...")
-        self.root.update_idletasks()
-        for plate in sorted(self.main_index_data.keys()):
-            self._sync_vehicle_index(plate)
-        self.status_label.config(text="所有索引已同步完成。")
+        PROFILER.mark("同步主索引")
+        for plate in [plate for plate in self.timeline.by_plate if plate not in self.archive_model.vehicles]:
+            self.timeline.remove_plate(plate)
+        # 先顯示車牌列表讓使用者可以操作，各車輛的索引再分批同步
         self.populate_plates_listbox()
+        PROFILER.mark("首次可互動")
+        self._scan_generation += 1
+        self._scan_vehicle_indexes(sorted(self.archive_model.vehicles.keys()), 0, self._scan_generation)
+
+    @traced("manager.scan_vehicle_indexes")
+    def _scan_vehicle_indexes(self, plates, start, generation):
+        """分批同步車輛索引；若期間又開始了新的完整掃描，舊的掃描會自行停止。"""
+        if generation != self._scan_generation:
+            return
+        end = min(start + SCAN_BATCH_SIZE, len(plates))
+        for plate in plates[start:end]:
+            if plate not in self.archive_model.vehicles or not os.path.isdir(archive.plate_dir(self.pages_dir, plate)):
+                continue
+            self._sync_vehicle_index(plate)
+            if plate == self.current_plate:
+                self._reload_current_images()
 
-    def _sync_vehicle_index(self, plate_folder):
-        vehicle_dir = os.path.join(self.pages_dir, plate_folder)
-        vehicle_index_path = os.path.join(vehicle_dir, 'index.json')
-        is_dirty, vehicle_data = False, {}
+        if end < len(plates):
+            self.status_label.config(text=f"正在掃描並生成所有索引... ({end} / {len(plates)})")
+            self.root.after(1, self._scan_vehicle_indexes, plates, end, generation)
+            return
+
+        self.show_timed_status("所有索引已同步完成。")
+        PROFILER.mark("背景掃描完成")
+        PROFILER.report("manager.py", "首次可互動", STARTUP_BUDGET_MS)
+
+    def toggle_watch_mode(self):
+        """開啟或關閉即時同步：監看 pages 資料夾，只同步有變動的車牌，不需完整重新掃描。"""
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+        if self.watch_var.get():
+            self.watcher = PagesWatcher(self.pages_dir)
+            self.watcher.start()
+            self.root.after(WATCH_APPLY_INTERVAL_MS, self._apply_watch_changes, self.watcher)
+            self.show_timed_status(f"已開啟即時同步 ({self.watcher.backend})。")
+        else:
+            self.show_timed_status("已關閉即時同步。")
+
+    @traced("manager.apply_watch_changes")
+    def _apply_watch_changes(self, watcher):
+        """定期在主執行緒中套用 watcher 收集到的變動。"""
+        if watcher is not self.watcher:
+            return  # 即時同步已關閉或已重新開啟，停止這個舊的輪詢循環
+        changed_plates = watcher.drain()
         try:
-            with open(vehicle_index_path, 'r', encoding='utf-8') as f:
-                vehicle_data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            is_dirty = True
-        
-        found_images_set = {f for f in os.listdir(vehicle_dir) if f.lower().endswith(SUPPORTED_FORMATS)}
-        
-        images_to_remove = [img for img in vehicle_data if img not in found_images_set]
-        if images_to_remove:
-            for img in images_to_remove:
-                del vehicle_data[img]
-            is_dirty = True
-
-        for img_filename in sorted(list(found_images_set)):
-            entry = vehicle_data.get(img_filename)
-            if not entry:
-                match = re.match(r".*?_(\d{4}-\d{2}-\d{2})", img_filename)
-                date_guess = match.group(1) if match else "YYYY-MM-DD"
-                entry = {"date": date_guess, "description": ""}
-                vehicle_data[img_filename] = entry
-                is_dirty = True
-            
-            if "width" not in entry or "height" not in entry:
-                try:
-                    with Image.open(os.path.join(vehicle_dir, img_filename)) as img:
-                        width, height = img.size
-                        entry["width"], entry["height"] = width, height
-                        is_dirty = True
-                except Exception as e:
-                    print(f"警告：無法讀取圖片 '{img_filename}' 的解析度。錯誤: {e}")
-                    entry["width"], entry["height"] = 0, 0
-        
+            if RESCAN_ALL in changed_plates:
+                self.initialize_and_scan_all()
+            else:
+                for plate in sorted(changed_plates):
+                    self._sync_single_plate(plate)
+        except Exception as e:
+            print(f"警告：即時同步時發生錯誤: {e}")
+        self.root.after(WATCH_APPLY_INTERVAL_MS, self._apply_watch_changes, watcher)
+
+    def _sync_single_plate(self, plate):
+        """只同步單一車牌：更新主索引中的該項目、其圖片索引，以及車牌列表中對應的那一列。"""
+        plate_exists = os.path.isdir(archive.plate_dir(self.pages_dir, plate))
+
+        if plate_exists and plate not in self.archive_model.vehicles:
+            self.archive_model.vehicles[plate] = archive.empty_vehicle_info()
+            self._write_main_index()
+            self.stats.update_vehicle(plate, self.archive_model.vehicles[plate])
+            self.plates_listbox.insert_item(plate)
+        elif not plate_exists and plate in self.archive_model.vehicles:
+            del self.archive_model.vehicles[plate]
+            self._write_main_index()
+            self.stats.remove_plate(plate)
+            self._similarity_dirty.add(plate)
+            self.timeline.remove_plate(plate)
+            self.plates_listbox.remove_item(plate)
+
+        if plate_exists:
+            self._sync_vehicle_index(plate)
+            if plate == self.current_plate:
+                self._reload_current_images()
+        elif plate == self.current_plate:
+            self.current_plate = None
+            self.clear_right_panels()
+        self.update_status_progress()
+
+    def _reload_current_images(self):
+        """重新載入目前車牌的圖片列表，並盡量保留原本選取的圖片。"""
+        selected_image = self.current_image
+        self.load_and_display_images()
+        image_names = list(self.vehicle_index_data.keys())
+        if selected_image in image_names:
+            index = image_names.index(selected_image)
+            self.images_listbox.selection_set(index)
+            self.images_listbox.see(index)
+            self.on_image_select(None)
+        else:
+            self.current_image = None
+
+    def _sync_vehicle_index(self, plate_folder):
+        vehicle_data, is_dirty = self.archive_model.scan_photos(plate_folder)
         if is_dirty:
             self._write_vehicle_index(plate_folder, vehicle_data)
+        else:
+            self.timeline.set_plate(plate_folder, vehicle_data)
 
+    @traced("manager.filter_plates")
     def filter_plates(self, event=None):
         search_term = self.search_var.get().upper().strip()
-        self.plates_listbox.delete(0, 'end')
-        all_plates = sorted(self.main_index_data.keys())
-        filtered_plates = [plate for plate in all_plates if search_term in plate.upper()]
-        for plate in filtered_plates: self.plates_listbox.insert('end', plate)
+        # 篩選只更新記憶體中的模型，列表只重繪可見的列
+        self.plates_listbox.set_filter(search_term)
         if not search_term:
+             self.plates_listbox.clear_selection()
              self.clear_right_panels()
 
     def _sync_main_index(self):
-        if not os.path.isdir(self.pages_dir): os.makedirs(self.pages_dir, exist_ok=True)
-        main_index_path = os.path.join(self.pages_dir, 'index.json')
-        is_dirty = False
-        try:
-            with open(main_index_path, 'r', encoding='utf-8') as f:
-                self.main_index_data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.main_index_data = {}
-            is_dirty = True
-        
-        found_plates = {d for d in os.listdir(self.pages_dir) if os.path.isdir(os.path.join(self.pages_dir, d))}
-        
-        for plate in found_plates:
-            if plate not in self.main_index_data:
-                self.main_index_data[plate] = {"company": "", "year": "", "manufacturer": "", "model": ""}
-                is_dirty = True
-
-        plates_to_remove = [plate for plate in self.main_index_data if plate not in found_plates]
-        if plates_to_remove:
-            for plate in plates_to_remove:
-                del self.main_index_data[plate]
-            is_dirty = True
-        
-        if is_dirty:
+        if self.archive_model.scan_vehicles():
             self._write_main_index()
 
+    @traced("manager.auto_save_main_index_from_ui")
     def auto_save_main_index_from_ui(self, event=None):
         if not self.current_plate: return
-        current_data = self.main_index_data[self.current_plate]
-        new_data = {
-            "company": self.company_var.get().strip(), "year": self.year_var.get().strip(),
-            "manufacturer": self.manufacturer_var.get().strip(), "model": self.model_var.get().strip()
-        }
+        # 多選時欄位作為批次套用的內容，只在按下「套用至所有選取的車牌」時才寫入
+        if len(self.plates_listbox.selected_items()) > 1: return
+        current_data = self.archive_model.vehicles[self.current_plate]
+        new_data = archive.Vehicle(
+            self.company_var.get().strip(), self.year_var.get().strip(),
+            self.manufacturer_var.get().strip(), self.model_var.get().strip()
+        )
         if current_data != new_data:
-            self.company_var.set(new_data["company"])
-            self.year_var.set(new_data["year"])
-            self.manufacturer_var.set(new_data["manufacturer"])
-            self.model_var.set(new_data["model"])
+            self.company_var.set(new_data.company)
+            self.year_var.set(new_data.year)
+            self.manufacturer_var.set(new_data.manufacturer)
+            self.model_var.set(new_data.model)
             
-            self.main_index_data[self.current_plate] = new_data
+            self.archive_model.vehicles[self.current_plate] = new_data
             if self._write_main_index():
+                self.stats.update_vehicle(self.current_plate, new_data)
                 self.show_timed_status("主索引已自動儲存。")
 
+    @traced("manager.perform_health_check")
     def perform_health_check(self):
         if not os.path.isdir(self.pages_dir):
             messagebox.showinfo("健康檢查結果", "找不到 'pages' 資料夾。")
@@ -674,23 +770,22 @@ class IndexManagerApp:
 
         # 檢查 1：空的車牌資料夾
         empty_folders = []
-        all_folders = [d for d in os.listdir(self.pages_dir) if os.path.isdir(os.path.join(self.pages_dir, d))]
-        for folder_name in all_folders:
-            folder_path = os.path.join(self.pages_dir, folder_name)
-            has_images = any(f.lower().endswith(SUPPORTED_FORMATS) for f in os.listdir(folder_path))
+        for folder_name, folder_path in archive.list_plate_dirs(self.pages_dir).items():
+            has_images = any(f.lower().endswith(archive.SUPPORTED_FORMATS) for f in os.listdir(folder_path))
             if not has_images:
                 empty_folders.append(folder_name)
 
         # 檢查 2：缺少資訊的車輛項目
         folders_with_missing_info = []
-        for plate, info in self.main_index_data.items():
+        for plate, info in self.archive_model.vehicles.items():
             # 檢查是否有任何一個欄位是空的或只包含空白字元
-            if not info.get("company", "").strip() or \
-               not info.get("year", "").strip() or \
-               not info.get("manufacturer", "").strip() or \
-               not info.get("model", "").strip():
+            if not info.is_complete():
                 folders_with_missing_info.append(plate)
 
+        # 檢查 3：上次執行 verify.py 時發現損毀的圖片 (完整性檢查需另外執行 verify.py)
+        import verify
+        corrupted_files = verify.failed_files()
+
         # 組合報告訊息
         message_parts = []
         if folders_with_missing_info:
@@ -705,6 +800,12 @@ class IndexManagerApp:
                 "\n".join(sorted(empty_folders))
             )
 
+        if corrupted_files:
+            message_parts.append(
+                "警告：上次完整性檢查 (verify.py) 發現以下圖片損毀：\n\n" +
+                "\n".join(f"{path}: {error}" for path, error in sorted(corrupted_files.items()))
+            )
+
         # 顯示最終結果
         if message_parts:
             final_message = "\n\n".join(message_parts)
@@ -715,72 +816,291 @@ class IndexManagerApp:
 
 
     def populate_plates_listbox(self):
+        self.plates_listbox.set_items(self.archive_model.vehicles.keys())
         self.filter_plates()
         self.update_status_progress()
 
     def load_and_display_images(self):
         if not self.current_plate: return
-        vehicle_index_path = os.path.join(self.pages_dir, self.current_plate, 'index.json')
-        try:
-            with open(vehicle_index_path, 'r', encoding='utf-8') as f:
-                self.vehicle_index_data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.vehicle_index_data = {}
+        # 索引檔未變動時直接使用模型中的快取，不會重新讀取與解析 JSON
+        self.vehicle_index_data = self.archive_model.photos(self.current_plate)
         
-        self.images_listbox.delete(0, 'end')
-        for img in self.vehicle_index_data.keys():
-            self.images_listbox.insert('end', img)
+        with span("tk.images_listbox"):
+            self.images_listbox.delete(0, 'end')
+            for img in self.vehicle_index_data.keys():
+                self.images_listbox.insert('end', img)
         
         self.clear_image_fields()
         self.update_status_progress()
 
     def _write_main_index(self):
-        main_index_path = os.path.join(self.pages_dir, 'index.json')
-        sorted_main_index_data = {key: self.main_index_data[key] for key in sorted(self.main_index_data.keys())}
         try:
-            with open(main_index_path, 'w', encoding='utf-8') as f:
-                json.dump(sorted_main_index_data, f, indent=4, ensure_ascii=False)
-            self.main_index_data = sorted_main_index_data
+            self.archive_model.write_vehicles()
             return True
         except Exception as e:
             messagebox.showerror("寫入失敗", f"無法寫入主索引檔案：\n{e}")
             return False
 
-    def _write_vehicle_index(self, plate_folder, data):
-        vehicle_index_path = os.path.join(self.pages_dir, plate_folder, 'index.json')
+    def _write_vehicle_index(self, plate_folder, data, changed_image=None):
+        """寫入車輛的圖片索引並更新統計與日期索引；只修改了一張圖片時以 changed_image 指定，日期索引只需移動該圖片。"""
         try:
-            with open(vehicle_index_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+            self.archive_model.write_photos(plate_folder, data)
+            self.stats.update_photos(plate_folder, data)
+            self._similarity_dirty.add(plate_folder)
+            if changed_image is not None and changed_image in data:
+                self.timeline.update_photo(plate_folder, changed_image, data[changed_image].date)
+            else:
+                self.timeline.set_plate(plate_folder, data)
             return True
         except Exception as e:
             messagebox.showerror("寫入失敗", f"無法寫入 '{plate_folder}' 的索引檔案：\n{e}")
             return False
 
+    @traced("manager.auto_save_vehicle_index_from_ui")
     def auto_save_vehicle_index_from_ui(self, event=None):
         if not self.current_plate or not self.current_image: return
         current_data = self.vehicle_index_data[self.current_image]
         new_date, new_desc = self.image_date_var.get(), self.image_desc_var.get()
-        if current_data["date"] != new_date or current_data["description"] != new_desc:
-            current_data["date"], current_data["description"] = new_date, new_desc
-            if self._write_vehicle_index(self.current_plate, self.vehicle_index_data): self.show_timed_status(
+        if current_data.date != new_date or current_data.description != new_desc:
+            current_data.date, current_data.description = new_date, new_desc
+            if self._write_vehicle_index(self.current_plate, self.vehicle_index_data,
+                                         changed_image=self.current_image): self.show_timed_status(
                 f"'{self.current_plate}' 的索引已自動儲存。")
 
+    @traced("manager.show_stats_panel")
+    def show_stats_panel(self):
+        """顯示統計面板：只重新讀取自上次統計後有變動的車輛索引，其餘使用增量維護的結果。"""
+        try:
+            reread = self.stats.refresh(self.archive_model.vehicles)
+            self.stats.save()
+        except Exception as e:
+            messagebox.showerror("統計失敗", f"無法更新統計資料：\n{e}")
+            return
+        summary = self.stats.to_dict()
+
+        if self.stats_window is None or not self.stats_window.winfo_exists():
+            self.stats_window = Toplevel(self.root)
+            self.stats_window.title("圖庫統計")
+            self.stats_window.geometry("520x600")
+            self.stats_tree = ttk.Treeview(self.stats_window, columns=("vehicles", "photos"))
+            self.stats_tree.heading("#0", text="項目")
+            self.stats_tree.heading("vehicles", text="車輛數")
+            self.stats_tree.heading("photos", text="照片數")
+            self.stats_tree.column("vehicles", width=80, anchor='e')
+            self.stats_tree.column("photos", width=80, anchor='e')
+            self.stats_tree.pack(fill='both', expand=True, padx=5, pady=5)
+            stats_buttons = Frame(self.stats_window)
+            stats_buttons.pack(fill='x', padx=5, pady=(0, 5))
+            Button(stats_buttons, text="重新整理", command=self.show_stats_panel).pack(side='left')
+            Button(stats_buttons, text="匯出 JSON (給網站使用)", command=self.export_stats_json).pack(side='left', padx=5)
+            self.stats_status_label = Label(stats_buttons, text="", anchor='e')
+            self.stats_status_label.pack(side='right')
+        self.stats_window.lift()
+
+        tree = self.stats_tree
+        tree.delete(*tree.get_children())
+        sections = [("客運", "by_company"), ("廠牌", "by_manufacturer"), ("型號", "by_model"), ("月份", "by_month")]
+        for title, key in sections:
+            rows = summary[key]
+            parent = tree.insert('', 'end', text=f"{title} ({len(rows)})", open=(key == "by_company"))
+            for name, counts in sorted(rows.items(), key=lambda item: (-item[1]["photos"], item[0])):
+                node = tree.insert(parent, 'end', text=name, values=(counts["vehicles"], counts["photos"]))
+                # 客運底下再依月份展開
+                if key == "by_company":
+                    for month, month_counts in sorted(summary["by_company_month"].get(name, {}).items()):
+                        tree.insert(node, 'end', text=month, values=(month_counts["vehicles"], month_counts["photos"]))
+        self.stats_status_label.config(
+            text=f"共 {summary['total']['vehicles']} 輛車，{summary['total']['photos']} 張照片 (重新讀取 {reread} 個索引)")
+
+    def show_timeline_panel(self):
+        """顯示時間軸：列出每天的照片數，展開後才填入當天所有車牌的照片 (直接查詢記憶體中的日期索引)。"""
+        if self.timeline_window is None or not self.timeline_window.winfo_exists():
+            self.timeline_window = Toplevel(self.root)
+            self.timeline_window.title("時間軸")
+            self.timeline_window.geometry("480x600")
+            self.timeline_tree = ttk.Treeview(self.timeline_window, columns=("photos",))
+            self.timeline_tree.heading("#0", text="日期 / 照片")
+            self.timeline_tree.heading("photos", text="照片數")
+            self.timeline_tree.column("photos", width=80, anchor='e')
+            scrollbar = Scrollbar(self.timeline_window, orient='vertical', command=self.timeline_tree.yview)
+            self.timeline_tree.config(yscrollcommand=scrollbar.set)
+            timeline_buttons = Frame(self.timeline_window)
+            timeline_buttons.pack(side='bottom', fill='x', padx=5, pady=(0, 5))
+            scrollbar.pack(side='right', fill='y', pady=5)
+            self.timeline_tree.pack(fill='both', expand=True, padx=(5, 0), pady=5)
+            self.timeline_tree.bind("<<TreeviewOpen>>", self._expand_timeline_day)
+            self.timeline_tree.bind("<Double-Button-1>", self._open_timeline_photo)
+            Button(timeline_buttons, text="重新整理", command=self.show_timeline_panel).pack(side='left')
+            self.timeline_status_label = Label(timeline_buttons, text="", anchor='e')
+            self.timeline_status_label.pack(side='right')
+        self.timeline_window.lift()
+
+        tree = self.timeline_tree
+        tree.delete(*tree.get_children())
+        self._timeline_rows = {}
+        days = self.timeline.days()
+        for day, count in days:
+            node = tree.insert('', 'end', text=day or timeline.UNKNOWN_DATE_LABEL, values=(count,))
+            self._timeline_rows[node] = day
+            tree.insert(node, 'end', text="...")  # 展開時才填入當天的照片
+        self.timeline_status_label.config(
+            text=f"{len(days)} 天，{self.timeline.photo_count()} 張照片 (已掃描 {len(self.timeline.by_plate)} 個車牌)")
+
+    def _expand_timeline_day(self, event=None):
+        tree = self.timeline_tree
+        node = tree.focus()
+        day = self._timeline_rows.get(node)
+        if not isinstance(day, str):
+            return
+        tree.delete(*tree.get_children(node))
+        for plate, image in self.timeline.photos_on(day):
+            self._timeline_rows[tree.insert(node, 'end', text=f"{plate} / {image}")] = (plate, image)
+
+    def _open_timeline_photo(self, event=None):
+        row = self._timeline_rows.get(self.timeline_tree.focus())
+        if isinstance(row, tuple):
+            self._select_photo(*row)
+
+    def _select_photo(self, plate, image):
+        """在主視窗中選取指定車牌的指定圖片。"""
+        self.search_var.set("")
+        self.filter_plates()
+        if not self.plates_listbox.select_item(plate, notify=False):
+            return
+        self.on_plate_select(None)
+        image_names = list(self.vehicle_index_data.keys())
+        if image in image_names:
+            index = image_names.index(image)
+            self.images_listbox.selection_set(index)
+            self.images_listbox.see(index)
+            self.on_image_select(None)
+
+    def find_similar_plates(self):
+        """在背景執行緒中更新相似度索引 (第一次查詢時比對整個圖庫，之後只比對圖片有變動的車牌)，再列出候選車牌。"""
+        if not self.current_plate:
+            messagebox.showinfo("提示", "請先選擇一個車牌。")
+            return
+        if self._similarity_future and not self._similarity_future.done():
+            self.show_timed_status("仍在比對相似照片，請稍候...")
+            return
+        if self._similarity_executor is None:
+            self._similarity_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="similarity")
+        plate, dirty = self.current_plate, self._similarity_dirty
+        self._similarity_dirty = set()
+        self._similarity_future = self._similarity_executor.submit(self._similarity_job, plate, sorted(dirty))
+        self.status_label.config(text=f"正在比對與 '{plate}' 相似的照片...")
+        self.root.after(SIMILARITY_POLL_INTERVAL_MS, self._poll_similarity, plate, dirty)
+
+    def _similarity_job(self, plate, dirty_plates):
+        hashed = self.similarity.refresh(dirty_plates)
+        return hashed, self.similarity.find_similar_plates(plate)
+
+    def _poll_similarity(self, plate, dirty):
+        future = self._similarity_future
+        if not future.done():
+            self.root.after(SIMILARITY_POLL_INTERVAL_MS, self._poll_similarity, plate, dirty)
+            return
+        try:
+            hashed, candidates = future.result()
+        except Exception as e:
+            self._similarity_dirty |= dirty
+            messagebox.showerror("比對失敗", f"無法更新相似度索引：\n{e}")
+            self.update_status_progress()
+            return
+        # 查詢期間被刪除或重命名的車牌不列出
+        candidates = [candidate for candidate in candidates if candidate[0] in self.archive_model.vehicles]
+        self.show_timed_status(f"相似度索引已更新 (計算 {hashed} 張圖片)，找到 {len(candidates)} 個相似的車牌。")
+        self.show_similar_plates(plate, candidates)
+
+    def show_similar_plates(self, plate, candidates):
+        """列出與指定車牌有相似照片的其他車牌，可選取該車牌或將指定車牌合併過去 (例如車輛改號)。"""
+        if self.similarity_window is not None and self.similarity_window.winfo_exists():
+            self.similarity_window.destroy()
+        window = self.similarity_window = Toplevel(self.root)
+        window.title(f"與 '{plate}' 相似的車輛")
+        window.geometry("560x400")
+        listbox = Listbox(window, exportselection=False)
+        listbox.pack(fill='both', expand=True, padx=5, pady=5)
+        if not candidates:
+            listbox.insert('end', f"沒有找到相似的車牌 (漢明距離上限 {similarity.SIMILAR_MAX_DISTANCE})。")
+        for other_plate, best, matches in candidates:
+            info = self.archive_model.vehicles[other_plate]
+            details = " ".join(filter(None, (info.company, info.manufacturer, info.model)))
+            listbox.insert('end', f"{other_plate}  距離 {best}，{len(matches)} 組相似照片  {details}  "
+                                  f"(例：{matches[0][1]} ~ {matches[0][2]})")
+
+        def selected_plate():
+            selection = listbox.curselection()
+            if not candidates or not selection:
+                messagebox.showinfo("提示", "請先選擇一個候選車牌。", parent=window)
+                return None
+            return candidates[selection[0]][0]
+
+        def select_candidate(event=None):
+            other_plate = selected_plate()
+            if other_plate:
+                self.search_var.set("")
+                self.filter_plates()
+                if self.plates_listbox.select_item(other_plate, notify=False):
+                    self.on_plate_select(None)
+
+        def merge_into_candidate():
+            other_plate = selected_plate()
+            if not other_plate:
+                return
+            if self.current_plate != plate:
+                messagebox.showinfo("提示", f"請重新選擇 '{plate}' 後再合併。", parent=window)
+                return
+            window.destroy()
+            self.rename_or_merge_plate(new_name=other_plate)
+
+        listbox.bind("<Double-Button-1>", select_candidate)
+        buttons = Frame(window)
+        buttons.pack(fill='x', padx=5, pady=(0, 5))
+        Button(buttons, text="選取此車牌", command=select_candidate).pack(side='left')
+        Button(buttons, text=f"將 '{plate}' 合併至此車牌", command=merge_into_candidate).pack(side='left', padx=5)
+
+    def export_stats_json(self):
+        try:
+            path = self.stats.write_output()
+        except Exception as e:
+            messagebox.showerror("寫入失敗", f"無法寫入統計檔案：\n{e}")
+            return
+        self.show_timed_status(f"統計資料已匯出至 '{os.path.relpath(path, self.script_dir)}'。")
+
+    def on_closing(self):
+        if self.watcher:
+            self.watcher.stop()
+        if self._similarity_executor:
+            self._similarity_executor.shutdown(wait=False, cancel_futures=True)
+        try:
+            self.stats.save()
+        except Exception as e:
+            print(f"警告：無法寫入統計快取: {e}")
+        self.root.destroy()
+
     def show_timed_status(self, message):
         self.status_label.config(text=message)
         self.root.after(3000, self.update_status_progress)
 
     def update_status_progress(self):
-        if self.current_plate and self.current_image:
+        selected_count = len(self.plates_listbox.selected_items())
+        if selected_count > 1:
+            status_text = f"已選取 {selected_count} 個車牌 (欄位內容可批次套用)"
+        elif self.current_plate and self.current_image:
             status_text = f"正在編輯 車輛: {self.current_plate}, 圖片: {self.current_image}"
         elif self.current_plate:
             status_text = f"正在編輯 車輛: {self.current_plate}"
         else:
-            status_text = f"顯示 {self.plates_listbox.size()} / {len(self.main_index_data)} 個項目"
+            status_text = f"顯示 {self.plates_listbox.size()} / {len(self.archive_model.vehicles)} 個項目"
         self.status_label.config(text=status_text)
 
 
 if __name__ == "__main__":
     root = Tk()
     root.geometry("1024x768")
+    PROFILER.mark("建立 Tk 視窗")
     app = IndexManagerApp(root)
+    PROFILER.mark("建立介面元件")
+    root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,216 @@
+# manifest.py
+import os
+import re
+import json
+import hashlib
+import argparse
+import datetime
+import archive
+
+# --- 常數設定 ---
+# 假設此腳本與 manager.py 在同一個目錄下
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(SCRIPT_DIR, "pages")
+MANIFEST_DIR = os.path.join(SCRIPT_DIR, "manifest")
+MAIN_INDEX_FILE = os.path.join(PAGES_DIR, 'index.json')
+ROOT_MANIFEST_NAME = "manifest.json"
+SHARDS_DIR_NAME = "shards"
+UNKNOWN_COMPANY = "客運不詳"
+UNKNOWN_MONTH = "unknown"
+
+
+def sanitize_filename(name):
+    """移除檔名中不合法的字元，用於產生分片檔名。"""
+    return re.sub(r'[\\/*?:"<>|]', "", name).strip() or "_"
+
+
+def load_archive():
+    """
+    讀取主索引與所有車輛的圖片索引。
+    回傳 (main_index_data, vehicle_indexes)，其中 vehicle_indexes 為 {車牌: 圖片索引}。
+    """
+    main_index_data = archive.read_main_index(PAGES_DIR)
+
+    vehicle_indexes = {}
+    for plate in main_index_data:
+        try:
+            with open(archive.vehicle_index_path(PAGES_DIR, plate), 'rb') as f:
+                vehicle_indexes[plate] = archive.parse_vehicle_index(f.read())
+        except FileNotFoundError:
+            vehicle_indexes[plate] = {}
+        except json.JSONDecodeError:
+            print(f"警告：'{plate}' 的索引檔格式錯誤，已跳過。")
+            vehicle_indexes[plate] = {}
+    return main_index_data, vehicle_indexes
+
+
+def build_photo_records(main_index_data, vehicle_indexes):
+    """
+    將所有車輛的圖片索引攤平成照片清單，順序依車牌排序並保留每車的圖片順序。
+    path 為圖片在 pages 中的實際位置 (分片配置下為 '分片/車牌/檔名')，與鏡像後的網站路徑一致。
+    """
+    photos = []
+    for plate in sorted(main_index_data.keys()):
+        plate_path = os.path.relpath(archive.plate_dir(PAGES_DIR, plate), PAGES_DIR).replace(os.sep, '/')
+        for image_name, image_info in vehicle_indexes.get(plate, {}).items():
+            photos.append({
+                "plate": plate,
+                "path": f"{plate_path}/{image_name}",
+                "date": image_info.date,
+                "description": image_info.description,
+                "width": image_info.width or 0,
+                "height": image_info.height or 0,
+            })
+    return photos
+
+
+def month_key(date_str):
+    """由 YYYY-MM-DD 取得 YYYY-MM；無法解析時歸入 unknown。"""
+    match = re.match(r"^(\d{4}-\d{2})-\d{2}$", date_str or "")
+    return match.group(1) if match else UNKNOWN_MONTH
+
+
+def company_key(vehicle_info):
+    return vehicle_info.company.strip() or UNKNOWN_COMPANY
+
+
+def build_manifest_body(main_index_data, photos):
+    """組合一份 (子) 清單的內容：只包含實際出現在照片中的車輛。"""
+    plates = sorted({photo["plate"] for photo in photos})
+    return {
+        "vehicle_count": len(plates),
+        "photo_count": len(photos),
+        "vehicles": {plate: main_index_data[plate].to_dict() for plate in plates},
+        "photos": photos,
+    }
+
+
+def write_json(path, data):
+    """
+    以緊湊格式寫入 JSON，並回傳寫入內容的 (sha256, 位元組數)。
+    先寫入暫存檔再以 os.replace 取代，讀取端不會看到寫到一半的清單檔。
+    """
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return hashlib.sha256(payload).hexdigest(), len(payload)
+
+
+def build_single_manifest(main_index_data, vehicle_indexes):
+    """產生單一的全域清單檔。"""
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    photos = build_photo_records(main_index_data, vehicle_indexes)
+    manifest = {"generated_at": datetime.datetime.now().isoformat(timespec='seconds')}
+    manifest.update(build_manifest_body(main_index_data, photos))
+    # 全域清單也包含尚無照片的車輛
+    manifest["vehicles"] = {plate: main_index_data[plate].to_dict() for plate in sorted(main_index_data.keys())}
+    manifest["vehicle_count"] = len(main_index_data)
+    root_path = os.path.join(MANIFEST_DIR, ROOT_MANIFEST_NAME)
+    write_json(root_path, manifest)
+    return root_path, manifest
+
+
+def build_sharded_manifest(main_index_data, vehicle_indexes):
+    """
+    依客運與拍攝月份產生分片清單，並產生一份只列出分片與其雜湊值的根清單。
+    分片本身不含產生時間，內容未變動時雜湊值不變，客戶端可直接沿用快取。
+    """
+    photos = build_photo_records(main_index_data, vehicle_indexes)
+
+    groups = {"company": {}, "month": {}}
+    for photo in photos:
+        vehicle_info = main_index_data[photo["plate"]]
+        groups["company"].setdefault(company_key(vehicle_info), []).append(photo)
+        groups["month"].setdefault(month_key(photo["date"]), []).append(photo)
+
+    shards_dir = os.path.join(MANIFEST_DIR, SHARDS_DIR_NAME)
+    written_files = set()
+    root_manifest = {
+        "generated_at": datetime.datetime.now().isoformat(timespec='seconds'),
+        "vehicle_count": len(main_index_data),
+        "photo_count": len(photos),
+        "shards": {},
+    }
+
+    for shard_type in sorted(groups.keys()):
+        type_dir = os.path.join(shards_dir, shard_type)
+        os.makedirs(type_dir, exist_ok=True)
+        entries = []
+        used_names = set()
+        for key in sorted(groups[shard_type].keys()):
+            # 避免不同鍵值在清理字元後得到相同檔名
+            base_name = sanitize_filename(key)
+            file_name = f"{base_name}.json"
+            suffix = 2
+            while file_name in used_names:
+                file_name = f"{base_name}_{suffix}.json"
+                suffix += 1
+            used_names.add(file_name)
+
+            shard = {"type": shard_type, "key": key}
+            shard.update(build_manifest_body(main_index_data, groups[shard_type][key]))
+            shard_path = os.path.join(type_dir, file_name)
+            sha256, size = write_json(shard_path, shard)
+            written_files.add(os.path.abspath(shard_path))
+            entries.append({
+                "key": key,
+                "path": f"{SHARDS_DIR_NAME}/{shard_type}/{file_name}",
+                "sha256": sha256,
+                "bytes": size,
+                "vehicle_count": shard["vehicle_count"],
+                "photo_count": shard["photo_count"],
+            })
+        root_manifest["shards"][shard_type] = entries
+
+    # 根清單在所有分片之後寫入，確保其列出的分片皆已存在
+    root_path = os.path.join(MANIFEST_DIR, ROOT_MANIFEST_NAME)
+    write_json(root_path, root_manifest)
+
+    # 新的根清單生效後，才移除上一次產生、但這次已不存在的分片
+    for dirpath, _, filenames in os.walk(shards_dir):
+        for filename in filenames:
+            path = os.path.abspath(os.path.join(dirpath, filename))
+            if filename.endswith('.json') and path not in written_files:
+                os.remove(path)
+    return root_path, root_manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="產生圖庫網站使用的照片清單 (manifest)。")
+    parser.add_argument("--shard", action="store_true",
+                        help="依客運與拍攝月份產生分片清單，並產生列出各分片雜湊值的根清單")
+    args = parser.parse_args()
+
+    if not os.path.exists(MAIN_INDEX_FILE):
+        print(f"錯誤：找不到主索引檔 '{MAIN_INDEX_FILE}'。")
+        print("請確認此腳本是否與 manager.py 在同一個資料夾，且 'pages' 資料夾已存在。")
+        return
+
+    try:
+        main_index_data, vehicle_indexes = load_archive()
+    except json.JSONDecodeError:
+        print(f"錯誤：主索引檔 '{MAIN_INDEX_FILE}' 格式損毀，無法解析。")
+        return
+
+    if args.shard:
+        root_path, root_manifest = build_sharded_manifest(main_index_data, vehicle_indexes)
+        print("-" * 40)
+        for shard_type, entries in root_manifest["shards"].items():
+            print(f"{shard_type}: {len(entries)} 個分片")
+    else:
+        root_path, root_manifest = build_single_manifest(main_index_data, vehicle_indexes)
+        print("-" * 40)
+
+    print(f"共 {root_manifest['vehicle_count']} 輛車、{root_manifest['photo_count']} 張照片。")
+    print(f"清單已寫入 '{os.path.abspath(root_path)}'。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# mirror.py
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import archive
+
+# --- 常數設定 ---
+# 假設此腳本與 manager.py 在同一個目錄下
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(SCRIPT_DIR, "pages")
+# 記錄在目的地中，上次同步時每個檔案的 [大小, 修改時間, SHA-256]
+MIRROR_MANIFEST_NAME = ".mirror_manifest.json"
+DEFAULT_WORKERS = 8
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def is_index_file(rel_path):
+    """索引檔與資料夾配置檔：在所有圖片到位之後才寫入。"""
+    return os.path.basename(rel_path) == archive.INDEX_FILENAME or rel_path == archive.LAYOUT_FILENAME
+
+
+def scan_tree(root):
+    """
+    列出資料夾中所有檔案的 {相對路徑 ('/' 分隔): (大小, mtime_ns)}，略過隱藏檔與暫存檔。
+    根目錄的資料夾配置檔 (.layout.json) 例外，目的地才能得知車牌資料夾是平面還是分片配置。
+    """
+    result = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for filename in filenames:
+            if filename.endswith('.tmp') or (filename.startswith('.') and not (
+                    dirpath == root and filename == archive.LAYOUT_FILENAME)):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            rel_path = os.path.relpath(path, root).replace(os.sep, '/')
+            result[rel_path] = (st.st_size, st.st_mtime_ns)
+    return result
+
+
+def load_mirror_manifest(dest_dir):
+    try:
+        with open(os.path.join(dest_dir, MIRROR_MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def plan_file(rel_path, source_dir, dest_dir, source_stat, dest_stat, previous, checksum):
+    """
+    判斷單一檔案是否需要複製 (在工作執行緒中執行)，回傳 (動作, 清單項目)。
+    1. 來源的大小與修改時間和上次同步時相同、目的地檔案大小也相符 -> 略過，不需計算雜湊。
+    2. 否則計算來源的 SHA-256；與上次同步的雜湊相同且目的地檔案大小相符 -> 只更新清單。
+    3. 沒有上次的記錄時比對目的地檔案的雜湊；不同或不存在 -> 複製。
+    checksum 為 True 時一律計算來源與目的地的雜湊進行比對。
+    """
+    size, mtime_ns = source_stat
+    dest_size = dest_stat[0] if dest_stat else None
+    if not checksum and previous and previous[:2] == [size, mtime_ns] and dest_size == size:
+        return "skip", previous
+
+    source_hash = file_sha256(os.path.join(source_dir, rel_path))
+    entry = [size, mtime_ns, source_hash]
+    if dest_size == size:
+        if not checksum and previous and previous[2] == source_hash:
+            return "skip", entry
+        # 沒有上次同步的記錄 (例如目的地是手動複製過去的) 或要求完整比對時，直接比對目的地的雜湊
+        if (checksum or not previous) and file_sha256(os.path.join(dest_dir, rel_path)) == source_hash:
+            return "skip", entry
+    return "copy", entry
+
+
+def copy_atomic(source_path, dest_path):
+    """先複製為暫存檔再以 os.replace 取代，目的地不會出現複製到一半的檔案。"""
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(dest_path), f".{os.path.basename(dest_path)}.tmp")
+    try:
+        shutil.copy2(source_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def sync_file(task):
+    """處理單一檔案 (在工作執行緒中執行)：判斷是否需要複製並在需要時複製，回傳 (動作, 清單項目)。"""
+    rel_path = task["rel_path"]
+    action, entry = plan_file(rel_path, task["source_dir"], task["dest_dir"], task["source_stat"],
+                              task["dest_stat"], task["previous"], task["checksum"])
+    if action == "copy" and not task["dry_run"]:
+        copy_atomic(os.path.join(task["source_dir"], rel_path), os.path.join(task["dest_dir"], rel_path))
+    return action, entry
+
+
+def mirror(source_dir, dest_dir, workers=DEFAULT_WORKERS, checksum=False, delete=True, dry_run=False):
+    """
+    將 source_dir 同步到 dest_dir，回傳 (複製數, 刪除數, 失敗數)：
+    1. 建立來源與目的地的 (路徑, 大小, 修改時間) 清單，並與目的地中上次同步的雜湊清單比對。
+    2. 以多執行緒平行計算雜湊並複製新增或變動的圖片。
+    3. 圖片全部到位後才以原子方式寫入車輛索引，最後才是主索引，
+       目的地的索引永遠不會指向尚未複製完成的檔案。
+    4. 索引更新後才刪除來源中已不存在的檔案與空資料夾。
+    有任何檔案複製失敗時不會更新索引也不會刪除檔案，修正後重新執行即可接續。
+    """
+    source_files = scan_tree(source_dir)
+    dest_files = scan_tree(dest_dir) if os.path.isdir(dest_dir) else {}
+    previous_manifest = load_mirror_manifest(dest_dir)
+    manifest = {}
+    counts = {"copy": 0, "skip": 0, "failed": 0}
+
+    def make_task(rel_path):
+        return {"rel_path": rel_path, "source_dir": source_dir, "dest_dir": dest_dir,
+                "source_stat": source_files[rel_path], "dest_stat": dest_files.get(rel_path),
+                "previous": previous_manifest.get(rel_path), "checksum": checksum, "dry_run": dry_run}
+
+    def record(rel_path, get_result):
+        try:
+            action, entry = get_result()
+        except Exception as e:
+            print(f"錯誤：同步 '{rel_path}' 時失敗: {e}")
+            counts["failed"] += 1
+            if rel_path in previous_manifest:
+                manifest[rel_path] = previous_manifest[rel_path]
+            return
+        manifest[rel_path] = entry
+        counts[action] += 1
+        if action == "copy":
+            print(f"  > {'將複製' if dry_run else '已複製'}: {rel_path}")
+
+    def write_manifest():
+        if not dry_run:
+            archive.write_json_atomic(os.path.join(dest_dir, MIRROR_MANIFEST_NAME),
+                                      {key: manifest[key] for key in sorted(manifest)})
+
+    data_files = [p for p in sorted(source_files) if not is_index_file(p)]
+    # 車輛索引在前、根目錄的資料夾配置檔與主索引最後 ('.layout.json' 排在 'index.json' 之前)
+    index_files = sorted((p for p in source_files if is_index_file(p)), key=lambda p: ('/' not in p, p))
+
+    if not dry_run:
+        os.makedirs(dest_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(sync_file, make_task(rel_path)): rel_path for rel_path in data_files}
+        for future in as_completed(futures):
+            record(futures[future], future.result)
+
+    if counts["failed"]:
+        print("有檔案複製失敗，為避免索引指向缺少的檔案，本次不更新索引也不刪除任何檔案。")
+        for rel_path in index_files:
+            if rel_path in previous_manifest:
+                manifest[rel_path] = previous_manifest[rel_path]
+        write_manifest()
+        return counts["copy"], 0, counts["failed"]
+
+    # 所有圖片都已到位後才依序寫入索引檔
+    for rel_path in index_files:
+        record(rel_path, lambda: sync_file(make_task(rel_path)))
+
+    deleted_count = 0
+    for rel_path in (sorted(set(dest_files) - set(source_files)) if delete else []):
+        print(f"  > {'將刪除' if dry_run else '已刪除'}: {rel_path}")
+        deleted_count += 1
+        if dry_run:
+            continue
+        try:
+            os.remove(os.path.join(dest_dir, rel_path))
+        except FileNotFoundError:
+            pass
+        # 移除因此變空的資料夾 (不會刪到目的地根目錄)
+        parent = os.path.dirname(os.path.join(dest_dir, rel_path))
+        while os.path.normpath(parent) != os.path.normpath(dest_dir) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+
+    write_manifest()
+    return counts["copy"], deleted_count, counts["failed"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="將 pages 資料夾鏡像同步到本機或已掛載的目的地資料夾，只複製新增或變動的檔案。")
+    parser.add_argument("dest", help="目的地資料夾")
+    parser.add_argument("--source", default=PAGES_DIR, help="來源資料夾 (預設為 pages)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"平行複製的執行緒數 (預設 {DEFAULT_WORKERS})")
+    parser.add_argument("--checksum", action="store_true", help="忽略大小與修改時間的快速判斷，比對所有檔案的雜湊值")
+    parser.add_argument("--no-delete", action="store_true", help="不刪除目的地中來源已不存在的檔案")
+    parser.add_argument("--dry-run", action="store_true", help="只列出會進行的動作，不修改目的地")
+    args = parser.parse_args(argv)
+
+    source_dir = os.path.abspath(args.source)
+    dest_dir = os.path.abspath(args.dest)
+    if not os.path.isdir(source_dir):
+        print(f"錯誤：找不到來源資料夾 '{source_dir}'。")
+        return 1
+    if os.path.commonpath([source_dir, dest_dir]) in (source_dir, dest_dir):
+        print("錯誤：來源與目的地不能相同，也不能互相包含。")
+        return 1
+
+    copied, deleted, failed = mirror(source_dir, dest_dir, args.workers, args.checksum,
+                                     delete=not args.no_delete, dry_run=args.dry_run)
+    print("-" * 40)
+    if args.dry_run:
+        print("(試執行) 未修改目的地。")
+    else:
+        print("同步完成！" if not failed else "同步未完成！")
+    print(f"複製 {copied} 個檔案，刪除 {deleted} 個檔案，失敗 {failed} 個。")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
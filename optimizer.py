@@ -0,0 +1,247 @@
+# optimizer.py
+import os
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image, features
+import piexif
+import archive
+
+# --- 常數設定 ---
+# 假設此腳本與 manager.py 在同一個目錄下
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(SCRIPT_DIR, "pages")
+OPTIMIZED_DIR = os.path.join(SCRIPT_DIR, "optimized")
+LEDGER_FILE = os.path.join(OPTIMIZED_DIR, "optimize_manifest.json")
+
+Image.MAX_IMAGE_PIXELS = None
+SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+EXTRA_FORMATS = ('webp', 'avif')
+DEFAULT_MAX_EDGE = 2560
+DEFAULT_QUALITY = 85
+
+# 只保留拍攝日期與方向，其餘相機 EXIF 一律移除
+KEPT_EXIF_TAGS = {
+    "0th": (piexif.ImageIFD.Orientation, piexif.ImageIFD.DateTime),
+    "Exif": (piexif.ExifIFD.DateTimeOriginal, piexif.ExifIFD.DateTimeDigitized),
+}
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def minimal_exif(exif_bytes):
+    """從原始 EXIF 中只取出日期與方向欄位，無法解析或沒有欄位時回傳 None。"""
+    if not exif_bytes:
+        return None
+    try:
+        source = piexif.load(exif_bytes)
+    except Exception:
+        return None
+    kept = {}
+    for ifd, tags in KEPT_EXIF_TAGS.items():
+        values = {tag: source[ifd][tag] for tag in tags if tag in source.get(ifd, {})}
+        if values:
+            kept[ifd] = values
+    return piexif.dump(kept) if kept else None
+
+
+def output_ext(fmt):
+    return ".jpg" if fmt == "jpeg" else f".{fmt}"
+
+
+def derivative_bases(rel_paths):
+    """
+    回傳 {原始相對路徑: 衍生檔的相對路徑 (不含副檔名)} 以及名稱衝突的原始檔分組。
+    一般情況下去掉原始副檔名 ('車牌/X.png' -> '車牌/X')；同一資料夾中有同名但副檔名不同的原始檔
+    (例如 X.jpg 與 X.png，不分大小寫) 時，這些檔案改為保留原始副檔名 ('車牌/X.png')，避免互相覆蓋。
+    """
+    groups = {}
+    for rel_path in rel_paths:
+        groups.setdefault(os.path.splitext(rel_path)[0].lower(), []).append(rel_path)
+    collisions = [sorted(group) for group in groups.values() if len(group) > 1]
+    colliding = {rel_path for group in collisions for rel_path in group}
+    bases = {rel_path: rel_path if rel_path in colliding else os.path.splitext(rel_path)[0] for rel_path in rel_paths}
+    return bases, collisions
+
+
+def optimize_one(task):
+    """
+    處理單一原始圖片 (在子行程中執行)：
+    1. 以大小與修改時間快速判斷；若有變動再比對 SHA-256，判斷是否已處理過。
+    2. 縮小至長邊上限，輸出漸進式、最佳化 Huffman 表的 JPEG 及選用的 WebP/AVIF。
+    3. 只保留拍攝日期與方向的 EXIF。
+    回傳要寫入紀錄檔的項目。
+    """
+    source_path = task["source_path"]
+    previous = task["previous"]
+    settings = task["settings"]
+    out_base = task["out_base"]
+    stat = os.stat(source_path)
+
+    def outputs_current(entry):
+        # 衍生檔名稱可能因為出現 (或不再有) 同名的原始檔而改變，此時需要重新輸出
+        return all(out["path"] == out_base + output_ext(fmt) and os.path.exists(os.path.join(OPTIMIZED_DIR, out["path"]))
+                   for fmt, out in entry.get("outputs", {}).items())
+
+    if previous and previous.get("settings") == settings and outputs_current(previous):
+        if previous.get("source_bytes") == stat.st_size and previous.get("source_mtime_ns") == stat.st_mtime_ns:
+            return {"rel_path": task["rel_path"], "status": "skipped", "entry": previous}
+        source_hash = file_sha256(source_path)
+        if previous.get("source_sha256") == source_hash:
+            entry = dict(previous, source_mtime_ns=stat.st_mtime_ns)
+            return {"rel_path": task["rel_path"], "status": "skipped", "entry": entry}
+    else:
+        source_hash = file_sha256(source_path)
+
+    outputs = {}
+    with Image.open(source_path) as img:
+        exif_bytes = minimal_exif(img.info.get("exif"))
+        # 載入時先以 draft 讓 JPEG 解碼器直接以縮小的比例解碼，節省時間與記憶體
+        max_edge = settings["max_edge"]
+        img.draft('RGB', (max_edge, max_edge))
+        work = img.convert('RGB')
+        work.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        for fmt in ("jpeg",) + tuple(settings["formats"]):
+            out_rel = out_base + output_ext(fmt)
+            out_path = os.path.join(OPTIMIZED_DIR, out_rel)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            tmp_path = out_path + ".tmp"
+            save_kwargs = {"quality": settings["quality"]}
+            if exif_bytes:
+                save_kwargs["exif"] = exif_bytes
+            if fmt == "jpeg":
+                save_kwargs.update(progressive=True, optimize=True)
+                work.save(tmp_path, "JPEG", **save_kwargs)
+            elif fmt == "webp":
+                save_kwargs.update(method=6)
+                work.save(tmp_path, "WEBP", **save_kwargs)
+            else:
+                work.save(tmp_path, "AVIF", **save_kwargs)
+            os.replace(tmp_path, out_path)
+            outputs[fmt] = {"path": out_rel.replace(os.sep, '/'), "bytes": os.path.getsize(out_path)}
+        work.close()
+
+    entry = {
+        "source_sha256": source_hash,
+        "source_bytes": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "settings": settings,
+        "outputs": outputs,
+        "saved_bytes": stat.st_size - outputs["jpeg"]["bytes"],
+    }
+    return {"rel_path": task["rel_path"], "status": "optimized", "entry": entry}
+
+
+def load_ledger():
+    try:
+        with open(LEDGER_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_ledger(ledger):
+    os.makedirs(OPTIMIZED_DIR, exist_ok=True)
+    tmp_path = LEDGER_FILE + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({key: ledger[key] for key in sorted(ledger)}, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, LEDGER_FILE)
+
+
+def collect_sources():
+    """列出 pages 底下所有車牌資料夾中的原始圖片 {相對路徑 ('車牌/檔名'，與資料夾配置無關): 完整路徑}。"""
+    sources = {}
+    for plate, plate_dir in sorted(archive.list_plate_dirs(PAGES_DIR).items()):
+        for filename in sorted(os.listdir(plate_dir)):
+            if filename.lower().endswith(SUPPORTED_FORMATS):
+                sources[f"{plate}/{filename}"] = os.path.join(plate_dir, filename)
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="為 pages 中的原始圖片產生最佳化的發佈版本 (原始檔不會被修改)。")
+    parser.add_argument("--max-edge", type=int, default=DEFAULT_MAX_EDGE, help=f"長邊上限像素 (預設 {DEFAULT_MAX_EDGE})")
+    parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY, help=f"壓縮品質 (預設 {DEFAULT_QUALITY})")
+    parser.add_argument("--formats", nargs='*', default=[], choices=EXTRA_FORMATS,
+                        help="除了 JPEG 之外額外輸出的格式")
+    parser.add_argument("--workers", type=int, default=None, help="平行處理的行程數 (預設為 CPU 核心數)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(PAGES_DIR):
+        print(f"錯誤：找不到 'pages' 資料夾 '{PAGES_DIR}'。")
+        return
+
+    formats = []
+    for fmt in args.formats:
+        if features.check(fmt):
+            formats.append(fmt)
+        else:
+            print(f"警告：目前安裝的 Pillow 不支援 {fmt.upper()}，已略過此格式。")
+    settings = {"max_edge": args.max_edge, "quality": args.quality, "formats": sorted(formats)}
+
+    ledger = load_ledger()
+    sources = collect_sources()
+    out_bases, collisions = derivative_bases(sources)
+    for group in collisions:
+        print(f"注意：{'、'.join(group)} 的衍生檔名稱相同，已改用包含原始副檔名的名稱 (例如 '{out_bases[group[0]]}.jpg')。")
+    tasks = [{
+        "rel_path": rel_path,
+        "source_path": source_path,
+        "out_base": out_bases[rel_path],
+        "previous": ledger.get(rel_path),
+        "settings": settings,
+    } for rel_path, source_path in sources.items()]
+
+    optimized_count, skipped_count, failed_count = 0, 0, 0
+    new_ledger = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(optimize_one, task): task["rel_path"] for task in tasks}
+        for future in as_completed(futures):
+            rel_path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"錯誤：處理 '{rel_path}' 時失敗: {e}")
+                failed_count += 1
+                if rel_path in ledger:
+                    new_ledger[rel_path] = ledger[rel_path]
+                continue
+            new_ledger[rel_path] = result["entry"]
+            if result["status"] == "optimized":
+                optimized_count += 1
+                saved = result["entry"]["saved_bytes"]
+                print(f"  > 已最佳化: {rel_path} (節省 {saved / 1024:.0f} KB)")
+            else:
+                skipped_count += 1
+
+    # 移除原始檔已不存在、或已改用其他名稱的衍生檔
+    current_outputs = {output["path"] for entry in new_ledger.values() for output in entry.get("outputs", {}).values()}
+    for rel_path, entry in ledger.items():
+        for output in entry.get("outputs", {}).values():
+            out_path = os.path.join(OPTIMIZED_DIR, output["path"])
+            if output["path"] not in current_outputs and os.path.exists(out_path):
+                os.remove(out_path)
+
+    write_ledger(new_ledger)
+
+    total_source = sum(entry["source_bytes"] for entry in new_ledger.values())
+    total_saved = sum(entry["saved_bytes"] for entry in new_ledger.values())
+    print("-" * 40)
+    print("處理完成！")
+    print(f"新處理 {optimized_count} 張，略過 {skipped_count} 張 (已是最新)，失敗 {failed_count} 張。")
+    if total_source:
+        print(f"原始檔共 {total_source / 1024 / 1024:.1f} MB，JPEG 版本共節省 "
+              f"{total_saved / 1024 / 1024:.1f} MB ({total_saved / total_source:.0%})。")
+    print(f"紀錄檔已寫入 '{os.path.abspath(LEDGER_FILE)}'。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# perceptual.py
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+import archive
+from tracing import span
+
+# dHash 的尺寸：比較 (HASH_SIZE + 1) x HASH_SIZE 灰階縮圖中相鄰像素的明暗，得到 64 位元的雜湊
+HASH_SIZE = 8
+# 拍攝時間相近 (連拍) 時允許較大的差異，因為車輛在連拍間會移動；沒有拍攝時間時只接受幾乎相同的畫面
+BURST_MAX_GAP_SECONDS = 8
+BURST_MAX_DISTANCE_TIMED = 20
+BURST_MAX_DISTANCE_UNTIMED = 10
+
+EXIF_IFD_POINTER = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_DATETIME = 0x0132
+
+
+def capture_time(img):
+    """由 EXIF 取得拍攝時間 (datetime)，沒有或無法解析時回傳 None。"""
+    try:
+        exif = img.getexif()
+        value = exif.get_ifd(EXIF_IFD_POINTER).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+        taken_at = datetime.datetime.strptime(value.strip('\x00 '), "%Y:%m:%d %H:%M:%S") if value else None
+    except Exception:
+        return None
+    # 本工具歸檔時只寫入日期 (時間為 00:00:00)，這類時間無法用來判斷連拍
+    if taken_at and taken_at.time() == datetime.time(0, 0):
+        return None
+    return taken_at
+
+
+def dhash(img):
+    """計算差異雜湊 (dHash)：對縮圖、構圖相近的照片，雜湊之間的漢明距離很小。"""
+    Image = archive.load_pil_image()
+    small = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def fingerprint(path):
+    """回傳圖片的 (dHash, 拍攝時間)。以 draft 讓 JPEG 以縮小比例解碼，每張只需數毫秒。"""
+    Image = archive.load_pil_image()
+    with span("perceptual.fingerprint"), Image.open(path) as img:
+        taken_at = capture_time(img)
+        img.draft('L', (HASH_SIZE * 16, HASH_SIZE * 16))
+        return dhash(img), taken_at
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def same_burst(previous, current):
+    """判斷兩張照片的指紋 (dHash, 拍攝時間) 是否屬於同一組連拍。"""
+    (previous_hash, previous_time), (current_hash, current_time) = previous, current
+    distance = hamming_distance(previous_hash, current_hash)
+    if previous_time and current_time:
+        gap = abs((current_time - previous_time).total_seconds())
+        return gap <= BURST_MAX_GAP_SECONDS and distance <= BURST_MAX_DISTANCE_TIMED
+    return distance <= BURST_MAX_DISTANCE_UNTIMED
+
+
+class BackgroundFingerprinter:
+    """
+    在背景執行緒中計算圖片指紋。request() 排入工作，result() 不會阻塞，尚未完成時回傳 None。
+    無法讀取的圖片結果也是 None (之後不會再重試)。
+    """
+
+    def __init__(self, workers=1):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fingerprint")
+        self._futures = {}
+
+    def request(self, paths):
+        for path in paths:
+            if path not in self._futures:
+                self._futures[path] = self._executor.submit(fingerprint, path)
+
+    def is_ready(self, path):
+        future = self._futures.get(path)
+        return future is not None and future.done()
+
+    def result(self, path):
+        future = self._futures.get(path)
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._futures.clear()
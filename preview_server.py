@@ -0,0 +1,305 @@
+# preview_server.py
+import os
+import re
+import sys
+import html
+import argparse
+import threading
+import mimetypes
+import urllib.parse
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import archive
+
+# --- 常數設定 ---
+# 假設此腳本與 manager.py 在同一個目錄下
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(SCRIPT_DIR, "pages")
+# 縮圖依 (尺寸, 車牌, 檔名) 快取在磁碟上，原始圖片較新時才重新產生
+THUMB_CACHE_DIR = os.path.join(SCRIPT_DIR, ".preview_cache")
+# 只接受固定的縮圖尺寸，避免任意尺寸把快取塞滿
+THUMB_SIZES = (160, 320, 640, 1280)
+THUMB_QUALITY = 85
+DEFAULT_PORT = 8000
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def make_etag(st):
+    """由檔案的大小與修改時間 (奈秒) 產生 ETag；內容被替換時這兩者必定至少有一個改變。"""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    解析單一區段的 Range 標頭，回傳 (起點, 終點) (包含終點)；
+    標頭格式不支援 (例如多個區段) 時回傳 None，區段無法滿足時回傳 ()。
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if size == 0:
+        return ()  # 空檔案沒有任何可以滿足的區段
+    if start == '':
+        # bytes=-N：最後 N 個位元組
+        length = int(end)
+        if length == 0:
+            return ()
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return ()
+    return start, end
+
+
+def is_inside(path, root):
+    """解析符號連結後，path 是否仍位於 root 之中。"""
+    real_root = os.path.realpath(root)
+    return os.path.commonpath([os.path.realpath(path), real_root]) == real_root
+
+
+class ThumbnailCache:
+    """在磁碟上快取縮圖；同一張縮圖同時被多個請求要求時只產生一次。"""
+
+    def __init__(self, cache_dir=THUMB_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, source_path, plate, filename, size):
+        """回傳縮圖的路徑，不存在或比原始圖片舊時先產生。"""
+        thumb_path = os.path.join(self.cache_dir, str(size), plate, os.path.splitext(filename)[0] + ".jpg")
+        with self._lock_for(thumb_path):
+            try:
+                if os.stat(thumb_path).st_mtime_ns >= os.stat(source_path).st_mtime_ns:
+                    return thumb_path
+            except FileNotFoundError:
+                pass
+            self._render(source_path, thumb_path, size)
+        return thumb_path
+
+    @staticmethod
+    def _render(source_path, thumb_path, size):
+        Image = archive.load_pil_image()
+        from PIL import ImageOps
+        with Image.open(source_path) as img:
+            # 讓 JPEG 解碼器直接以縮小的比例解碼
+            img.draft('RGB', (size, size))
+            thumb = ImageOps.exif_transpose(img).convert('RGB')
+        thumb.thumbnail((size, size), Image.Resampling.LANCZOS)
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        tmp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+        try:
+            thumb.save(tmp_path, "JPEG", quality=THUMB_QUALITY, optimize=True)
+            os.replace(tmp_path, thumb_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class PreviewRequestHandler(BaseHTTPRequestHandler):
+    """
+    提供 pages 資料夾的唯讀預覽：
+    - /index.json、/<車牌>/index.json 與圖片檔案，支援 ETag / If-None-Match 與單一區段的 Range 請求。
+    - /<車牌>/<圖片>?thumb=<尺寸> 回傳快取在磁碟上的縮圖。
+    - / 與 /<車牌>/ 為簡易的瀏覽頁面。
+    檔案內容以 socket.sendfile 傳送 (平台支援時為零複製的 os.sendfile)。
+    """
+    server_version = "BusGalleryPreview/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.handle_get(head_only=True)
+
+    def do_GET(self):
+        self.handle_get(head_only=False)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # --- 路由 ---
+
+    def handle_get(self, head_only):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        parts = [part for part in urllib.parse.unquote(url.path).split('/') if part]
+        # 只允許 pages 底下的一層車牌資料夾，拒絕 '..'、隱藏檔 (例如鎖定檔與暫存檔)、
+        # Windows 的磁碟機代號或替代資料流 (':') 以及任何絕對路徑
+        if len(parts) > 2 or any(part.startswith('.') or '\\' in part or ':' in part or '\0' in part
+                                 or os.path.isabs(part) or os.path.splitdrive(part)[0] for part in parts):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        pages_dir = self.server.pages_dir
+        if not parts:
+            self.send_html(self.render_plate_list(), head_only)
+            return
+        # 網址固定為 /<車牌>/<圖片>，與資料夾配置 (平面或分片) 無關
+        if len(parts) == 1 and os.path.isdir(archive.plate_dir(pages_dir, parts[0])) \
+                and is_inside(archive.plate_dir(pages_dir, parts[0]), pages_dir):
+            if not url.path.endswith('/'):
+                self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+                self.send_header("Location", f"/{urllib.parse.quote(parts[0])}/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_html(self.render_plate_page(parts[0]), head_only)
+            return
+
+        path = archive.image_path(pages_dir, *parts) if len(parts) == 2 else os.path.join(pages_dir, *parts)
+        if not is_inside(path, pages_dir) or not os.path.isfile(path):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        if "thumb" in query and len(parts) == 2 and parts[1].lower().endswith(archive.SUPPORTED_FORMATS):
+            try:
+                size = int(query["thumb"][0])
+            except ValueError:
+                size = 0
+            if size not in THUMB_SIZES:
+                self.send_error(HTTPStatus.BAD_REQUEST, explain=f"縮圖尺寸須為 {', '.join(map(str, THUMB_SIZES))} 其中之一")
+                return
+            try:
+                path = self.server.thumbnails.get(path, parts[0], parts[1], size)
+            except Exception as e:
+                self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, explain=f"無法產生縮圖: {e}")
+                return
+        self.send_file(path, head_only)
+
+    # --- 回應 ---
+
+    def send_file(self, path, head_only):
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            etag = make_etag(st)
+            if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(',')]:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                return
+
+            start, end = 0, st.st_size - 1
+            status = HTTPStatus.OK
+            range_header = self.headers.get("Range")
+            # If-Range 與目前的 ETag 不符時忽略 Range，回傳完整內容
+            if range_header and self.headers.get("If-Range", etag) == etag:
+                byte_range = parse_range(range_header, st.st_size)
+                if byte_range == ():
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header("Content-Range", f"bytes */{st.st_size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if byte_range:
+                    start, end = byte_range
+                    status = HTTPStatus.PARTIAL_CONTENT
+
+            length = max(0, end - start + 1)
+            self.send_response(status)
+            self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(length))
+            self.send_header("ETag", etag)
+            self.send_header("Accept-Ranges", "bytes")
+            # 每次都以 ETag 重新驗證，編輯後的索引與圖片能立即反映在預覽中
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{st.st_size}")
+            self.end_headers()
+            if not head_only and length:
+                try:
+                    self.connection.sendfile(f, start, length)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+    def send_html(self, body, head_only):
+        data = body.encode('utf-8')
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(data)
+
+    # --- 簡易瀏覽頁面 ---
+
+    def render_plate_list(self):
+        try:
+            vehicles = archive.read_main_index(self.server.pages_dir)
+        except Exception:
+            vehicles = {}
+        rows = []
+        for plate, info in vehicles.items():
+            details = " ".join(filter(None, (info.company, info.year, info.manufacturer, info.model)))
+            rows.append(f'<li><a href="/{urllib.parse.quote(plate)}/">{html.escape(plate)}</a> '
+                        f'{html.escape(details)}</li>')
+        return self._page("圖庫預覽", f"<p>共 {len(vehicles)} 輛車</p><ul>{''.join(rows)}</ul>")
+
+    def render_plate_page(self, plate):
+        photos = archive.read_vehicle_index(self.server.pages_dir, plate)
+        quoted_plate = urllib.parse.quote(plate)
+        items = []
+        for filename, photo in photos.items():
+            url = f"/{quoted_plate}/{urllib.parse.quote(filename)}"
+            items.append(f'<figure><a href="{url}"><img loading="lazy" src="{url}?thumb=320" alt=""></a>'
+                         f'<figcaption>{html.escape(filename)}<br>{html.escape(photo.date)} '
+                         f'{html.escape(photo.description)}</figcaption></figure>')
+        return self._page(plate, f'<p><a href="/">← 所有車輛</a></p>{"".join(items)}')
+
+    @staticmethod
+    def _page(title, body):
+        return (f'<!DOCTYPE html><html lang="zh-Hant"><head><meta charset="utf-8">'
+                f'<meta name="viewport" content="width=device-width, initial-scale=1">'
+                f'<title>{html.escape(title)}</title><style>'
+                f'figure{{display:inline-block;margin:4px;width:330px;vertical-align:top}}'
+                f'img{{max-width:320px;max-height:320px}}</style></head>'
+                f'<body><h1>{html.escape(title)}</h1>{body}</body></html>')
+
+
+class PreviewServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, pages_dir=PAGES_DIR, cache_dir=THUMB_CACHE_DIR, verbose=False):
+        super().__init__(address, PreviewRequestHandler)
+        self.pages_dir = pages_dir
+        self.thumbnails = ThumbnailCache(cache_dir)
+        self.verbose = verbose
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在本機 (或區域網路) 啟動 pages 資料夾的預覽伺服器。")
+    parser.add_argument("--host", default="127.0.0.1", help="監聽的位址 (區域網路中的平板預覽請使用 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"監聽的連接埠 (預設 {DEFAULT_PORT})")
+    parser.add_argument("--verbose", action="store_true", help="顯示每個請求的記錄")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(PAGES_DIR):
+        print(f"錯誤：找不到 'pages' 資料夾 '{PAGES_DIR}'。")
+        return 1
+
+    server = PreviewServer((args.host, args.port), verbose=args.verbose)
+    print(f"預覽伺服器已啟動：http://{args.host}:{server.server_address[1]}/ (按 Ctrl+C 停止)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n預覽伺服器已停止。")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+# similarity.py
+import os
+import sys
+import json
+import argparse
+import archive
+import perceptual
+
+# --- 常數設定 ---
+# 假設此腳本與 manager.py 在同一個目錄下
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(SCRIPT_DIR, "pages")
+# 每張圖片的 [大小, mtime_ns, dHash (16 進位)]，圖片未變動時不需重新解碼
+HASH_CACHE_FILE = os.path.join(SCRIPT_DIR, "similarity_cache.json")
+# 兩張照片的 dHash 漢明距離在此以內才視為相似 (64 位元中最多 12 位元不同)
+SIMILAR_MAX_DISTANCE = 12
+
+
+def hash_image(path):
+    """計算單一圖片的 dHash (在子行程中執行)，無法讀取時回傳 None。"""
+    try:
+        return perceptual.fingerprint(path)[0]
+    except Exception:
+        return None
+
+
+class BKTree:
+    """
+    以漢明距離為度量的 BK 樹。查詢半徑 r 時，只需走訪與節點距離落在 [d - r, d + r] 的子樹，
+    不必與每一張圖片比較。節點為 [雜湊, [項目], {距離: 子節點}]；移除項目時保留節點作為路由。
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = perceptual.hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def remove(self, value, item):
+        node = self.root
+        while node is not None:
+            distance = perceptual.hamming_distance(value, node[0])
+            if distance == 0:
+                if item in node[1]:
+                    node[1].remove(item)
+                    self.size -= 1
+                return
+            node = node[2].get(distance)
+
+    def query(self, value, radius):
+        """回傳與 value 距離不超過 radius 的 [(距離, 項目)]。"""
+        results = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = perceptual.hamming_distance(value, node[0])
+            if distance <= radius:
+                results.extend((distance, item) for item in node[1])
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return results
+
+
+class SimilarityIndex:
+    """
+    圖庫中所有圖片的 dHash 與 BK 樹索引，用來找出「看起來是同一輛車」的其他車牌 (例如車輛改號)。
+    雜湊以 (大小, mtime_ns) 快取在磁碟上；refresh() 只解碼新增或變動的圖片，
+    重新命名的圖片 (大小與修改時間不變) 也會沿用原本的雜湊。
+    """
+
+    def __init__(self, pages_dir=PAGES_DIR, cache_file=HASH_CACHE_FILE):
+        self.pages_dir = pages_dir
+        self.cache_file = cache_file
+        self.entries = {}  # '車牌/檔名' -> [大小, mtime_ns, dHash]
+        self.tree = BKTree()
+        self._loaded = False
+
+    def load(self):
+        self.entries = {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            cached = {}
+        self.tree = BKTree()
+        for rel_path, (size, mtime_ns, hex_hash) in cached.items():
+            self.entries[rel_path] = [size, mtime_ns, int(hex_hash, 16)]
+            self.tree.add(self.entries[rel_path][2], rel_path)
+        self._loaded = True
+
+    def save(self):
+        archive.write_json_atomic(self.cache_file, {rel_path: [size, mtime_ns, f"{value:016x}"]
+                                                    for rel_path, (size, mtime_ns, value) in sorted(self.entries.items())})
+
+    def _scan_plate(self, plate):
+        """列出車牌資料夾中的圖片 {'車牌/檔名': (大小, mtime_ns)}。"""
+        plate_dir = archive.plate_dir(self.pages_dir, plate)
+        result = {}
+        for filename in archive.list_images(plate_dir) if os.path.isdir(plate_dir) else []:
+            try:
+                st = os.stat(os.path.join(plate_dir, filename))
+            except FileNotFoundError:
+                continue
+            result[f"{plate}/{filename}"] = (st.st_size, st.st_mtime_ns)
+        return result
+
+    def refresh(self, plates=None, workers=None):
+        """
+        與圖庫對齊，回傳重新計算雜湊的圖片數。plates 為 None 時比對所有車牌，否則只比對指定的車牌
+        (例如 _sync_vehicle_index 發現有新圖片的車牌)。需要解碼的圖片以行程池平行處理。
+        """
+        if not self._loaded:
+            self.load()
+            plates = None
+        if plates is None:
+            plates = list(archive.list_plate_dirs(self.pages_dir))
+            scope = None
+        else:
+            scope = set(plates)
+
+        found = {}
+        for plate in plates:
+            found.update(self._scan_plate(plate))
+
+        # 移除已不存在或已變動的圖片，保留其雜湊供重新命名的圖片沿用
+        reusable = {}
+        for rel_path in [p for p in self.entries if scope is None or p.split('/', 1)[0] in scope]:
+            size, mtime_ns, value = self.entries[rel_path]
+            if found.get(rel_path) != (size, mtime_ns):
+                reusable[(size, mtime_ns)] = value
+                self.tree.remove(value, rel_path)
+                del self.entries[rel_path]
+
+        to_hash = []
+        for rel_path, (size, mtime_ns) in found.items():
+            if rel_path in self.entries:
+                continue
+            value = reusable.get((size, mtime_ns))
+            if value is not None:
+                self._add(rel_path, size, mtime_ns, value)
+            else:
+                to_hash.append(rel_path)
+
+        if to_hash:
+            paths = [archive.image_path(self.pages_dir, *rel_path.split('/', 1)) for rel_path in to_hash]
+            if len(paths) == 1:
+                values = [hash_image(paths[0])]
+            else:
+                # 延遲匯入：只有需要解碼多張圖片時才建立行程池
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    values = list(executor.map(hash_image, paths, chunksize=16))
+            for rel_path, value in zip(to_hash, values):
+                if value is not None:
+                    self._add(rel_path, *found[rel_path], value)
+        if to_hash or reusable:
+            self.save()
+        return len(to_hash)
+
+    def _add(self, rel_path, size, mtime_ns, value):
+        self.entries[rel_path] = [size, mtime_ns, value]
+        self.tree.add(value, rel_path)
+
+    def find_similar_plates(self, plate, max_distance=SIMILAR_MAX_DISTANCE):
+        """
+        以指定車牌的每張圖片查詢 BK 樹，回傳其他車牌的候選列表
+        [(車牌, 最小距離, [(距離, 本車圖片, 對方圖片)])]，依最小距離與相似照片數排序。
+        """
+        prefix = plate + "/"
+        candidates = {}
+        for rel_path, (_, _, value) in self.entries.items():
+            if not rel_path.startswith(prefix):
+                continue
+            for distance, other in self.tree.query(value, max_distance):
+                other_plate, other_file = other.split('/', 1)
+                if other_plate != plate:
+                    candidates.setdefault(other_plate, []).append((distance, rel_path[len(prefix):], other_file))
+        result = [(other_plate, min(match[0] for match in matches), sorted(matches))
+                  for other_plate, matches in candidates.items()]
+        result.sort(key=lambda candidate: (candidate[1], -len(candidate[2]), candidate[0]))
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="找出圖片與指定車牌相似的其他車牌 (例如同一輛車改號)。")
+    parser.add_argument("plates", nargs='+', help="要查詢的車牌")
+    parser.add_argument("--max-distance", type=int, default=SIMILAR_MAX_DISTANCE,
+                        help=f"dHash 漢明距離上限 (預設 {SIMILAR_MAX_DISTANCE})")
+    parser.add_argument("--workers", type=int, default=None, help="平行處理的行程數 (預設為 CPU 核心數)")
+    args = parser.parse_args(argv)
+
+    index = SimilarityIndex()
+    hashed = index.refresh(workers=args.workers)
+    print(f"索引共 {len(index.entries)} 張圖片 (本次計算 {hashed} 張)。")
+    for plate in args.plates:
+        plate = plate.upper()
+        candidates = index.find_similar_plates(plate, args.max_distance)
+        print(f"{plate}:" if candidates else f"{plate}: 沒有相似的車牌")
+        for other_plate, best, matches in candidates:
+            print(f"  {other_plate}: 最小距離 {best}，{len(matches)} 組相似照片")
+            for distance, mine, theirs in matches[:3]:
+                print(f"    {distance:2d}  {mine} ~ {theirs}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# startup_profile.py
+import sys
+import time
+import importlib
+import importlib.abc
+
+# 以命令列旗標開啟；未開啟時所有方法都是空操作，不會安裝任何匯入掛鉤
+PROFILE_FLAG = "--profile-startup"
+ENABLED = PROFILE_FLAG in sys.argv
+
+
+class _ImportTimingFinder(importlib.abc.MetaPathFinder):
+    """包裝其他 finder 回傳的 loader，記錄每個模組執行所花的時間 (含/不含子模組)。"""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self._stack = []
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                spec.loader = _TimedLoader(spec.loader, self)
+            return spec
+        return None
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader, finder):
+        self._loader = loader
+        self._finder = finder
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        stack = self._finder._stack
+        stack.append([time.perf_counter(), 0.0])
+        try:
+            self._loader.exec_module(module)
+        finally:
+            start, child_time = stack.pop()
+            inclusive = time.perf_counter() - start
+            if stack:
+                stack[-1][1] += inclusive
+            self._finder.profiler.record_import(module.__name__, inclusive, inclusive - child_time)
+
+
+class StartupProfiler:
+    """
+    記錄啟動過程的匯入時間與各階段耗時。
+    使用 mark() 標記階段結束點，report() 輸出分析並與啟動預算比較。
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+        self.imports = {}
+        self.reported = False
+        if enabled:
+            sys.meta_path.insert(0, _ImportTimingFinder(self))
+
+    def record_import(self, name, inclusive, self_time):
+        self.imports[name] = (inclusive, self_time)
+
+    def mark(self, label):
+        """標記一個階段結束，記錄自上一個標記以來的時間。"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((label, now - self.last, now - self.start))
+        self.last = now
+
+    def import_module(self, name):
+        """匯入模組 (用於延遲匯入)；開啟分析時另外記錄為一個階段。"""
+        if not self.enabled or name in sys.modules:
+            return importlib.import_module(name)
+        self.mark("(閒置)")
+        module = importlib.import_module(name)
+        self.mark(f"延遲匯入 {name}")
+        return module
+
+    def elapsed_ms(self, label):
+        for phase_label, _, since_start in self.phases:
+            if phase_label == label:
+                return since_start * 1000
+        return None
+
+    def report(self, title, interactive_label=None, budget_ms=None, top=15):
+        """輸出匯入時間與階段時間；若超出預算則顯示警告。只會輸出一次。"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        out = sys.stderr
+        print(f"===== 啟動分析：{title} =====", file=out)
+
+        print("-- 匯入時間 (最慢的頂層模組，含子模組) --", file=out)
+        top_level = [(name, inclusive, self_time) for name, (inclusive, self_time) in self.imports.items()
+                     if '.' not in name]
+        for name, inclusive, self_time in sorted(top_level, key=lambda x: -x[1])[:top]:
+            print(f"  {inclusive * 1000:8.1f} ms  (自身 {self_time * 1000:7.1f} ms)  {name}", file=out)
+
+        print("-- 階段時間 --", file=out)
+        for label, duration, since_start in self.phases:
+            print(f"  {duration * 1000:8.1f} ms  (累計 {since_start * 1000:8.1f} ms)  {label}", file=out)
+
+        if interactive_label and budget_ms is not None:
+            interactive_ms = self.elapsed_ms(interactive_label)
+            if interactive_ms is None:
+                print(f"警告：找不到階段 '{interactive_label}'，無法檢查啟動預算。", file=out)
+            elif interactive_ms > budget_ms:
+                print(f"警告：首次可互動時間 {interactive_ms:.0f} ms 超出預算 {budget_ms} ms！", file=out)
+            else:
+                print(f"首次可互動時間 {interactive_ms:.0f} ms，在預算 {budget_ms} ms 以內。", file=out)
+
+
+PROFILER = StartupProfiler(ENABLED)
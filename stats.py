@@ -0,0 +1,261 @@
+# stats.py
+import os
+import re
+import sys
+import json
+import argparse
+import datetime
+import archive
+
+# --- 常數設定 ---
+# 假設此腳本與 manager.py 在同一個目錄下
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(SCRIPT_DIR, "pages")
+# 每輛車上次統計時的圖片索引狀態、車輛資訊與各月份照片數；彙總數字由此在記憶體中重建
+STATS_CACHE_FILE = os.path.join(SCRIPT_DIR, "stats_cache.json")
+# 給圖庫網站使用的統計資料，與索引一起放在 pages 底下
+STATS_OUTPUT_NAME = "stats.json"
+
+DIMENSIONS = ("company", "manufacturer", "model", "month", "company_month")
+UNKNOWN_LABEL = "(未填)"
+UNKNOWN_MONTH = "unknown"
+MONTH_IN_DATE = re.compile(r"^(\d{4}-\d{2})-\d{2}$")
+
+
+def photo_month(photo_date):
+    match = MONTH_IN_DATE.match(photo_date or "")
+    return match.group(1) if match else UNKNOWN_MONTH
+
+
+def count_months(photos):
+    """回傳 {月份 (YYYY-MM): 照片數}。"""
+    months = {}
+    for photo in photos.values():
+        month = photo_month(photo.date)
+        months[month] = months.get(month, 0) + 1
+    return months
+
+
+def read_plate_months(task):
+    """讀取單一車輛的圖片索引並統計各月份照片數 (在子行程中執行)，回傳 (車牌, 索引狀態, {月份: 照片數})。"""
+    plate, path = task
+    try:
+        st = os.stat(path)
+        with open(path, 'rb') as f:
+            photos = archive.parse_vehicle_index(f.read())
+    except (OSError, json.JSONDecodeError):
+        return plate, None, {}
+    return plate, [st.st_mtime_ns, st.st_size], count_months(photos)
+
+
+class ArchiveStats:
+    """
+    依客運、廠牌、型號、月份 (以及客運 x 月份) 彙總的車輛數與照片數。
+    每輛車的貢獻 (車輛資訊與各月份照片數) 分別記錄，新增、刪除、重命名或修改一輛車時
+    只需扣除舊的貢獻再加上新的，不需重新讀取其他車輛的索引。
+    """
+
+    def __init__(self, pages_dir=PAGES_DIR, cache_file=STATS_CACHE_FILE):
+        self.pages_dir = pages_dir
+        self.cache_file = cache_file
+        self.plates = {}  # 車牌 -> {"index": [mtime_ns, size] 或 None, "vehicle": Vehicle, "months": {月份: 照片數}}
+        self.totals = {dimension: {} for dimension in DIMENSIONS}  # 維度 -> {鍵: [車輛數, 照片數]}
+        self.dirty = False
+        self._loaded = False
+
+    # --- 增量更新 ---
+
+    @staticmethod
+    def _contributions(entry):
+        vehicle, months = entry["vehicle"], entry["months"]
+        company = vehicle.company or UNKNOWN_LABEL
+        photo_count = sum(months.values())
+        yield "company", company, photo_count
+        yield "manufacturer", vehicle.manufacturer or UNKNOWN_LABEL, photo_count
+        yield "model", " ".join(filter(None, (vehicle.manufacturer, vehicle.model))) or UNKNOWN_LABEL, photo_count
+        for month, count in months.items():
+            yield "month", month, count
+            yield "company_month", (company, month), count
+
+    def _apply(self, entry, sign):
+        for dimension, key, photo_count in self._contributions(entry):
+            counts = self.totals[dimension].setdefault(key, [0, 0])
+            counts[0] += sign
+            counts[1] += sign * photo_count
+            if counts[0] == 0:
+                del self.totals[dimension][key]
+
+    def _set(self, plate, entry):
+        self._ensure_loaded()
+        old = self.plates.pop(plate, None)
+        if old:
+            self._apply(old, -1)
+        if entry is not None:
+            self.plates[plate] = entry
+            self._apply(entry, 1)
+        self.dirty = True
+
+    def update_photos(self, plate, photos):
+        """車輛的圖片索引寫入後呼叫：以記憶體中的圖片索引更新該車的各月份照片數。"""
+        self._ensure_loaded()
+        entry = self.plates.get(plate)
+        vehicle = entry["vehicle"] if entry else archive.empty_vehicle_info()
+        index_key = archive.file_key(archive.vehicle_index_path(self.pages_dir, plate))
+        self._set(plate, {"index": list(index_key) if index_key else None, "vehicle": vehicle,
+                          "months": count_months(photos)})
+
+    def update_vehicle(self, plate, vehicle):
+        self._ensure_loaded()
+        entry = self.plates.get(plate)
+        if entry and entry["vehicle"] == vehicle:
+            return
+        self._set(plate, {"index": entry["index"] if entry else None, "vehicle": vehicle,
+                          "months": entry["months"] if entry else {}})
+
+    def remove_plate(self, plate):
+        self._ensure_loaded()
+        if plate in self.plates:
+            self._set(plate, None)
+
+    def rename_plate(self, old_name, new_name):
+        """重命名時照片數隨車輛移動；合併 (新車牌已存在) 時由之後的 update_photos 重新計算。"""
+        self._ensure_loaded()
+        entry = self.plates.get(old_name)
+        self.remove_plate(old_name)
+        if entry and new_name not in self.plates:
+            self._set(new_name, {**entry, "index": None})
+
+    def sync_vehicles(self, vehicles):
+        """與主索引 ({車牌: Vehicle}) 比對，套用新增、刪除與資訊修改 (只比對記憶體中的資料)。"""
+        self._ensure_loaded()
+        for plate in [plate for plate in self.plates if plate not in vehicles]:
+            self.remove_plate(plate)
+        for plate, vehicle in vehicles.items():
+            self.update_vehicle(plate, vehicle)
+
+    # --- 重建與持久化 ---
+
+    def refresh(self, vehicles, rebuild=False, workers=None):
+        """
+        與磁碟上的索引對齊，回傳重新讀取的車輛索引數：
+        1. 以主索引更新車輛資訊與車輛清單。
+        2. 只重新讀取狀態 (mtime_ns, 大小) 與上次統計時不同的圖片索引；rebuild 為 True 時讀取全部。
+        需要讀取的索引以行程池平行處理。
+        """
+        self._ensure_loaded()
+        if rebuild:
+            self.plates = {}
+            self.totals = {dimension: {} for dimension in DIMENSIONS}
+            self.dirty = True
+        self.sync_vehicles(vehicles)
+
+        tasks = []
+        for plate in vehicles:
+            path = archive.vehicle_index_path(self.pages_dir, plate)
+            index_key = archive.file_key(path)
+            if rebuild or (list(index_key) if index_key else None) != self.plates[plate]["index"]:
+                tasks.append((plate, path))
+        if not tasks:
+            return 0
+
+        if len(tasks) == 1:
+            results = [read_plate_months(tasks[0])]
+        else:
+            # 延遲匯入：只有需要重新讀取多個索引時才建立行程池
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(read_plate_months, tasks, chunksize=64))
+        for plate, index_key, months in results:
+            self._set(plate, {"index": index_key, "vehicle": vehicles[plate], "months": months})
+        return len(tasks)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def load(self):
+        """讀取上次的統計快取並在記憶體中重建彙總數字；檔案不存在或損毀時從空白開始。"""
+        self._loaded = True
+        self.plates = {}
+        self.totals = {dimension: {} for dimension in DIMENSIONS}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for plate, entry in cached.get("plates", {}).items():
+            entry = {"index": entry.get("index"), "vehicle": archive.Vehicle.from_dict(entry.get("vehicle", {})),
+                     "months": entry.get("months", {})}
+            self.plates[plate] = entry
+            self._apply(entry, 1)
+        self.dirty = False
+
+    def save(self):
+        """將每輛車的統計貢獻寫入快取 (只在有變動時寫入)。"""
+        if not self._loaded or not self.dirty:
+            return
+        archive.write_json_atomic(self.cache_file, {"plates": {
+            plate: {"index": entry["index"], "vehicle": entry["vehicle"].to_dict(), "months": entry["months"]}
+            for plate, entry in sorted(self.plates.items())}})
+        self.dirty = False
+
+    def to_dict(self):
+        """彙總結果，供網站使用的 JSON 格式。"""
+        self._ensure_loaded()
+
+        def counts_dict(counts):
+            return {"vehicles": counts[0], "photos": counts[1]}
+
+        result = {
+            "generated_at": datetime.datetime.now().isoformat(timespec='seconds'),
+            "total": {"vehicles": len(self.plates),
+                      "photos": sum(sum(entry["months"].values()) for entry in self.plates.values())},
+        }
+        for dimension in ("company", "manufacturer", "model", "month"):
+            result[f"by_{dimension}"] = {key: counts_dict(counts)
+                                         for key, counts in sorted(self.totals[dimension].items())}
+        by_company_month = {}
+        for (company, month), counts in sorted(self.totals["company_month"].items()):
+            by_company_month.setdefault(company, {})[month] = counts_dict(counts)
+        result["by_company_month"] = by_company_month
+        return result
+
+    def write_output(self, path=None):
+        """寫入給網站使用的統計 JSON (預設為 pages/stats.json)，回傳寫入的路徑。"""
+        path = path or os.path.join(self.pages_dir, STATS_OUTPUT_NAME)
+        archive.write_json_atomic(path, self.to_dict())
+        return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="統計各客運、廠牌、型號、月份的車輛數與照片數，並輸出給圖庫網站使用的 JSON。")
+    parser.add_argument("--rebuild", action="store_true", help="忽略快取，平行重新讀取所有車輛索引")
+    parser.add_argument("--workers", type=int, default=None, help="平行處理的行程數 (預設為 CPU 核心數)")
+    parser.add_argument("--output", default=None, help=f"輸出檔案 (預設為 pages/{STATS_OUTPUT_NAME})")
+    args = parser.parse_args(argv)
+
+    try:
+        vehicles = archive.read_main_index(PAGES_DIR)
+    except FileNotFoundError:
+        print(f"錯誤：找不到主索引檔 '{archive.main_index_path(PAGES_DIR)}'。")
+        return 1
+    except json.JSONDecodeError:
+        print(f"錯誤：主索引檔 '{archive.main_index_path(PAGES_DIR)}' 格式損毀，無法解析。")
+        return 1
+
+    stats = ArchiveStats(PAGES_DIR)
+    reread = stats.refresh(vehicles, rebuild=args.rebuild, workers=args.workers)
+    stats.save()
+    output_path = stats.write_output(args.output)
+
+    summary = stats.to_dict()
+    for company, counts in sorted(summary["by_company"].items(), key=lambda item: -item[1]["photos"]):
+        print(f"  {company}: {counts['vehicles']} 輛車，{counts['photos']} 張照片")
+    print("-" * 40)
+    print(f"共 {summary['total']['vehicles']} 輛車，{summary['total']['photos']} 張照片 (重新讀取 {reread} 個車輛索引)。")
+    print(f"統計資料已寫入 '{os.path.abspath(output_path)}'。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# tests/test_archive.py
+# 三方合併 (merge_records) 與 ArchiveModel 在索引被其他程式修改後的寫入行為。
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive
+
+
+class MergeRecordsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base = {
+            "EAL-3100": archive.Vehicle("大都會客運", "2020", "成運", "MB120"),
+            "KKA-0001": archive.Vehicle("首都客運", "", "", ""),
+        }
+
+    def test_fields_changed_on_each_side_are_combined(self):
+        ours = dict(self.base, **{"EAL-3100": archive.Vehicle("大都會客運", "2021", "成運", "MB120")})
+        theirs = dict(self.base, **{"EAL-3100": archive.Vehicle("大都會客運", "2020", "成運", "MB120 Ultra")})
+        merged = archive.merge_records(self.base, ours, theirs)
+        self.assertEqual(merged["EAL-3100"], archive.Vehicle("大都會客運", "2021", "成運", "MB120 Ultra"))
+
+    def test_same_field_changed_on_both_sides_keeps_ours(self):
+        ours = dict(self.base, **{"KKA-0001": archive.Vehicle("首都客運", "2019", "", "")})
+        theirs = dict(self.base, **{"KKA-0001": archive.Vehicle("首都客運", "2018", "", "")})
+        merged = archive.merge_records(self.base, ours, theirs)
+        self.assertEqual(merged["KKA-0001"].year, "2019")
+
+    def test_additions_and_deletions(self):
+        ours = {"EAL-3100": self.base["EAL-3100"], "NEW-0001": archive.empty_vehicle_info()}
+        theirs = dict(self.base, **{"OTH-0002": archive.empty_vehicle_info()})
+        merged = archive.merge_records(self.base, ours, theirs)
+        # 我們刪除的 KKA-0001 被移除，雙方新增的項目都保留，其他程式新增的接在最後
+        self.assertEqual(list(merged), ["EAL-3100", "NEW-0001", "OTH-0002"])
+
+    def test_entry_deleted_by_them_is_kept_only_if_we_changed_it(self):
+        ours = dict(self.base, **{"KKA-0001": archive.Vehicle("首都客運", "2019", "", "")})
+        theirs = {"EAL-3100": self.base["EAL-3100"]}
+        self.assertIn("KKA-0001", archive.merge_records(self.base, ours, theirs))
+        self.assertNotIn("KKA-0001", archive.merge_records(self.base, dict(self.base), theirs))
+
+    def test_photos_merge_by_field(self):
+        base = {"a.jpg": archive.Photo("2025-06-01", "")}
+        ours = {"a.jpg": archive.Photo("2025-06-02", "")}
+        theirs = {"a.jpg": archive.Photo("2025-06-01", "夜間"), "b.jpg": archive.Photo("2025-06-03", "")}
+        merged = archive.merge_records(base, ours, theirs)
+        self.assertEqual(merged["a.jpg"].to_dict(), archive.Photo("2025-06-02", "夜間").to_dict())
+        self.assertIn("b.jpg", merged)
+
+
+class ArchiveModelConcurrentWriteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pages_dir = os.path.join(tempfile.mkdtemp(), "pages")
+        os.makedirs(archive.plate_dir(self.pages_dir, "EAL-3100"))
+        archive.write_main_index(self.pages_dir, {"EAL-3100": archive.Vehicle("大都會客運", "", "", "")})
+        archive.write_vehicle_index(self.pages_dir, "EAL-3100", {"a.jpg": archive.Photo("2025-06-01")})
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.pages_dir))
+
+    @staticmethod
+    def touch_later(path):
+        """確保檔案狀態改變，不受檔案系統時間精度影響。"""
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    def test_vehicle_writes_from_two_models_are_merged(self):
+        first, second = archive.ArchiveModel(self.pages_dir), archive.ArchiveModel(self.pages_dir)
+        first.load_vehicles()
+        second.load_vehicles()
+        first.update_vehicles(["EAL-3100"], {"year": "2020"})
+        self.touch_later(archive.main_index_path(self.pages_dir))
+        second.update_vehicles(["EAL-3100"], {"model": "MB120"})
+        self.assertEqual(archive.read_main_index(self.pages_dir)["EAL-3100"],
+                         archive.Vehicle("大都會客運", "2020", "", "MB120"))
+
+    def test_photo_writes_from_two_models_are_merged(self):
+        first, second = archive.ArchiveModel(self.pages_dir), archive.ArchiveModel(self.pages_dir)
+        mine, theirs = first.photos("EAL-3100"), second.photos("EAL-3100")
+        theirs["b.jpg"] = archive.Photo("2025-06-02")
+        second.write_photos("EAL-3100", theirs)
+        self.touch_later(archive.vehicle_index_path(self.pages_dir, "EAL-3100"))
+        mine["a.jpg"] = archive.Photo("2025-06-01", "夜間")
+        first.write_photos("EAL-3100", mine)
+        on_disk = archive.read_vehicle_index(self.pages_dir, "EAL-3100")
+        self.assertEqual(sorted(on_disk), ["a.jpg", "b.jpg"])
+        self.assertEqual(on_disk["a.jpg"].description, "夜間")
+        self.assertEqual(sorted(mine), ["a.jpg", "b.jpg"])
+
+
+if __name__ == "__main__":
+    unittest.main()
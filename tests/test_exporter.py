@@ -0,0 +1,99 @@
+# tests/test_exporter.py
+# 「自上次發布以來的變更」：scan_archive_state 產生的指紋與 compute_delta 算出的新增、修改、刪除。
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive
+import exporter
+
+
+class PublishDeltaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.pages_dir = os.path.join(self.work_dir, "pages")
+        self.vehicles = {"EAL-3100": archive.Vehicle("大都會客運", "2020", "成運", "MB120"),
+                         "KKA-0001": archive.Vehicle("首都客運", "", "", "")}
+        for plate in self.vehicles:
+            os.makedirs(archive.plate_dir(self.pages_dir, plate))
+            photos = {}
+            for i in (1, 2):
+                name = f"{plate}_2025-06-01_{i:02d}.jpg"
+                with open(archive.image_path(self.pages_dir, plate, name), 'wb') as f:
+                    f.write(f"{plate}-{i}".encode())
+                photos[name] = archive.Photo("2025-06-01")
+            archive.write_vehicle_index(self.pages_dir, plate, photos)
+        archive.write_main_index(self.pages_dir, self.vehicles)
+        self.published = exporter.scan_archive_state(self.pages_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def delta(self):
+        current = exporter.scan_archive_state(self.pages_dir, {"plates": self.published})
+        return exporter.compute_delta(self.published, current)
+
+    def test_no_changes(self):
+        self.assertEqual(self.delta(), ([], [], [], []))
+
+    def test_mtime_only_change_is_reported_as_changed(self):
+        path = archive.image_path(self.pages_dir, "EAL-3100", "EAL-3100_2025-06-01_01.jpg")
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(self.delta(), ([], [("EAL-3100", "EAL-3100_2025-06-01_01.jpg")], [], []))
+
+    def test_deleted_photo(self):
+        name = "KKA-0001_2025-06-01_02.jpg"
+        os.remove(archive.image_path(self.pages_dir, "KKA-0001", name))
+        photos = archive.read_vehicle_index(self.pages_dir, "KKA-0001")
+        del photos[name]
+        archive.write_vehicle_index(self.pages_dir, "KKA-0001", photos)
+        self.assertEqual(self.delta(), ([], [], [("KKA-0001", name)], []))
+
+    def test_renamed_photo_is_deleted_and_added(self):
+        old, new = "EAL-3100_2025-06-01_02.jpg", "EAL-3100_2025-06-02_01.jpg"
+        os.rename(archive.image_path(self.pages_dir, "EAL-3100", old), archive.image_path(self.pages_dir, "EAL-3100", new))
+        photos = archive.read_vehicle_index(self.pages_dir, "EAL-3100")
+        photos[new] = archive.Photo("2025-06-02")
+        del photos[old]
+        archive.write_vehicle_index(self.pages_dir, "EAL-3100", photos)
+        self.assertEqual(self.delta(), ([("EAL-3100", new)], [], [("EAL-3100", old)], []))
+
+    def test_renamed_plate_moves_all_photos(self):
+        archive.rename_plate_folder(self.pages_dir, "KKA-0001", "KKA-0002")
+        archive.sync_vehicle_index(self.pages_dir, "KKA-0002")
+        vehicles = dict(self.vehicles)
+        vehicles["KKA-0002"] = vehicles.pop("KKA-0001")
+        archive.write_main_index(self.pages_dir, vehicles)
+        added, changed, deleted, vehicle_changed = self.delta()
+        # 車輛資訊只在車牌前後都存在時才算「變動」，重命名以照片的刪除與新增表示
+        self.assertEqual([plate for plate, _ in added], ["KKA-0002", "KKA-0002"])
+        self.assertEqual([plate for plate, _ in deleted], ["KKA-0001", "KKA-0001"])
+        self.assertEqual((changed, vehicle_changed), ([], []))
+
+    def test_description_and_vehicle_info_changes(self):
+        photos = archive.read_vehicle_index(self.pages_dir, "EAL-3100")
+        photos["EAL-3100_2025-06-01_01.jpg"] = archive.Photo("2025-06-01", "夜間")
+        archive.write_vehicle_index(self.pages_dir, "EAL-3100", photos)
+        vehicles = dict(self.vehicles, **{"KKA-0001": archive.Vehicle("首都客運", "2019", "", "")})
+        archive.write_main_index(self.pages_dir, vehicles)
+        self.assertEqual(self.delta(), ([], [("EAL-3100", "EAL-3100_2025-06-01_01.jpg")], [], ["KKA-0001"]))
+
+    def test_unchanged_index_is_not_reparsed(self):
+        # 索引檔的 mtime 與大小未變時沿用上次的日期與說明：換成同樣大小的無效內容也不會被讀取
+        path = archive.vehicle_index_path(self.pages_dir, "EAL-3100")
+        st = os.stat(path)
+        with open(path, 'wb') as f:
+            f.write(b'x' * st.st_size)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        state = exporter.scan_archive_state(self.pages_dir, {"plates": self.published})
+        self.assertEqual(state, self.published)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# tests/test_mirror.py
+# 鏡像同步：重複執行不複製任何檔案、索引在圖片之後寫入、有失敗時不更新索引也不刪除檔案。
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive
+import mirror
+
+
+class MirrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.work_dir, "pages")
+        self.dest = os.path.join(self.work_dir, "site")
+        for plate in ("EAL-3100", "KKA-0001"):
+            os.makedirs(archive.plate_dir(self.source, plate))
+            photos = {}
+            for i in (1, 2):
+                name = f"{plate}_2025-06-01_{i:02d}.jpg"
+                self.write(f"{plate}/{name}", f"{plate}-{i}")
+                photos[name] = archive.Photo("2025-06-01")
+            archive.write_vehicle_index(self.source, plate, photos)
+        archive.write_main_index(self.source, {"EAL-3100": archive.empty_vehicle_info(),
+                                               "KKA-0001": archive.empty_vehicle_info()})
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def write(self, rel_path, text):
+        with open(os.path.join(self.source, rel_path), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def run_mirror(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return mirror.mirror(self.source, self.dest, workers=1, **kwargs)
+
+    def test_second_run_copies_nothing(self):
+        self.assertEqual(self.run_mirror(), (7, 0, 0))
+        self.assertEqual(self.run_mirror(), (0, 0, 0))
+        # 沒有上次同步的記錄時 (例如手動複製過去的目的地) 以雜湊比對，內容相同就不複製
+        os.remove(os.path.join(self.dest, mirror.MIRROR_MANIFEST_NAME))
+        self.assertEqual(self.run_mirror(), (0, 0, 0))
+
+    def test_changed_file_is_copied_again(self):
+        self.run_mirror()
+        self.write("EAL-3100/EAL-3100_2025-06-01_01.jpg", "EAL-3100-1 (edited)")
+        self.assertEqual(self.run_mirror(), (1, 0, 0))
+        with open(os.path.join(self.dest, "EAL-3100", "EAL-3100_2025-06-01_01.jpg"), encoding='utf-8') as f:
+            self.assertEqual(f.read(), "EAL-3100-1 (edited)")
+
+    def test_indexes_are_written_after_images_and_main_index_last(self):
+        order = []
+        real_copy = mirror.copy_atomic
+
+        def record(source_path, dest_path):
+            order.append(os.path.relpath(dest_path, self.dest).replace(os.sep, '/'))
+            real_copy(source_path, dest_path)
+
+        with mock.patch.object(mirror, "copy_atomic", record):
+            self.run_mirror()
+        first_index = min(i for i, rel_path in enumerate(order) if mirror.is_index_file(rel_path))
+        self.assertTrue(all(not mirror.is_index_file(rel_path) for rel_path in order[:first_index]))
+        self.assertTrue(all(mirror.is_index_file(rel_path) for rel_path in order[first_index:]))
+        self.assertEqual(order[-1], archive.INDEX_FILENAME)
+
+    def test_removed_files_and_empty_folders_are_deleted(self):
+        self.run_mirror()
+        shutil.rmtree(archive.plate_dir(self.source, "KKA-0001"))
+        self.assertEqual(self.run_mirror(), (0, 3, 0))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "KKA-0001")))
+        self.run_mirror()
+        self.assertEqual(self.run_mirror(delete=False), (0, 0, 0))
+
+    def test_failed_copy_keeps_old_indexes_and_deletes_nothing(self):
+        self.run_mirror()
+        self.write("EAL-3100/EAL-3100_2025-06-01_03.jpg", "new photo")
+        self.write("EAL-3100/index.json", "{}")
+        os.remove(os.path.join(self.source, "KKA-0001", "KKA-0001_2025-06-01_02.jpg"))
+        real_copy = mirror.copy_atomic
+
+        def failing(source_path, dest_path):
+            if dest_path.endswith("_03.jpg"):
+                raise OSError("disk full")
+            real_copy(source_path, dest_path)
+
+        with mock.patch.object(mirror, "copy_atomic", failing):
+            self.assertEqual(self.run_mirror(), (0, 0, 1))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "KKA-0001", "KKA-0001_2025-06-01_02.jpg")))
+        with open(os.path.join(self.dest, "EAL-3100", "index.json"), encoding='utf-8') as f:
+            self.assertNotEqual(f.read(), "{}")
+        # 修正後重新執行即可接續
+        self.assertEqual(self.run_mirror(), (2, 1, 0))
+
+    def test_dry_run_changes_nothing(self):
+        self.assertEqual(self.run_mirror(dry_run=True), (7, 0, 0))
+        self.assertFalse(os.path.exists(self.dest))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+# tests/test_optimizer.py
+# 衍生檔名稱：同一資料夾中只有副檔名不同的原始檔 (X.jpg 與 X.png) 不可互相覆蓋。
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import optimizer
+
+
+class DerivativeBasesTest(unittest.TestCase):
+
+    def test_unique_names_drop_the_source_extension(self):
+        bases, collisions = optimizer.derivative_bases(["EAL-3100/a.jpg", "EAL-3100/b.png", "KKA-0001/a.jpg"])
+        self.assertEqual(bases, {"EAL-3100/a.jpg": "EAL-3100/a", "EAL-3100/b.png": "EAL-3100/b",
+                                 "KKA-0001/a.jpg": "KKA-0001/a"})
+        self.assertEqual(collisions, [])
+
+    def test_colliding_names_keep_the_source_extension(self):
+        bases, collisions = optimizer.derivative_bases(["EAL-3100/X.jpg", "EAL-3100/X.png", "EAL-3100/Y.jpg"])
+        self.assertEqual(bases["EAL-3100/X.jpg"], "EAL-3100/X.jpg")
+        self.assertEqual(bases["EAL-3100/X.png"], "EAL-3100/X.png")
+        self.assertEqual(bases["EAL-3100/Y.jpg"], "EAL-3100/Y")
+        self.assertEqual(collisions, [["EAL-3100/X.jpg", "EAL-3100/X.png"]])
+
+    def test_collisions_ignore_case(self):
+        bases, collisions = optimizer.derivative_bases(["EAL-3100/x.JPG", "EAL-3100/X.jpeg"])
+        self.assertEqual(len(set(bases.values())), 2)
+        self.assertEqual(collisions, [["EAL-3100/X.jpeg", "EAL-3100/x.JPG"]])
+
+
+class OptimizeCollisionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.pages_dir = os.path.join(self.work_dir, "pages")
+        self.optimized_dir = os.path.join(self.work_dir, "optimized")
+        os.makedirs(os.path.join(self.pages_dir, "EAL-3100"))
+        Image.new('RGB', (40, 30), 'red').save(os.path.join(self.pages_dir, "EAL-3100", "X.jpg"))
+        Image.new('RGB', (40, 30), 'blue').save(os.path.join(self.pages_dir, "EAL-3100", "X.png"))
+        patcher = mock.patch.multiple(optimizer, PAGES_DIR=self.pages_dir, OPTIMIZED_DIR=self.optimized_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def optimize(self, rel_path, out_base, previous=None):
+        settings = {"max_edge": 100, "quality": 85, "formats": []}
+        return optimizer.optimize_one({"rel_path": rel_path, "source_path": os.path.join(self.pages_dir, rel_path),
+                                       "out_base": out_base, "previous": previous, "settings": settings})
+
+    def test_colliding_sources_produce_separate_derivatives(self):
+        sources = optimizer.collect_sources()
+        bases, _ = optimizer.derivative_bases(sources)
+        results = {rel_path: self.optimize(rel_path, bases[rel_path]) for rel_path in sources}
+        paths = {rel_path: result["entry"]["outputs"]["jpeg"]["path"] for rel_path, result in results.items()}
+        self.assertEqual(paths, {"EAL-3100/X.jpg": "EAL-3100/X.jpg.jpg", "EAL-3100/X.png": "EAL-3100/X.png.jpg"})
+        with Image.open(os.path.join(self.optimized_dir, paths["EAL-3100/X.png"])) as img:
+            self.assertGreater(img.convert('RGB').getpixel((20, 15))[2], 200)
+
+    def test_name_change_forces_a_new_derivative(self):
+        first = self.optimize("EAL-3100/X.jpg", "EAL-3100/X")
+        self.assertEqual(self.optimize("EAL-3100/X.jpg", "EAL-3100/X", first["entry"])["status"], "skipped")
+        # 出現同名的原始檔後，衍生檔名稱改變，即使原始檔未變動也要重新輸出
+        renamed = self.optimize("EAL-3100/X.jpg", "EAL-3100/X.jpg", first["entry"])
+        self.assertEqual(renamed["status"], "optimized")
+        self.assertEqual(renamed["entry"]["outputs"]["jpeg"]["path"], "EAL-3100/X.jpg.jpg")
+
+
+if __name__ == "__main__":
+    unittest.main()
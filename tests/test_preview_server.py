@@ -0,0 +1,116 @@
+# tests/test_preview_server.py
+# Range 標頭的解析，以及預覽伺服器只提供 pages 底下的檔案 (拒絕路徑穿越、隱藏檔與符號連結)。
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+import http.client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive
+import preview_server
+
+
+class ParseRangeTest(unittest.TestCase):
+
+    def test_open_ended_and_explicit_ranges(self):
+        self.assertEqual(preview_server.parse_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(preview_server.parse_range("bytes=500-", 1000), (500, 999))
+        self.assertEqual(preview_server.parse_range("bytes=900-5000", 1000), (900, 999))
+
+    def test_suffix_ranges(self):
+        self.assertEqual(preview_server.parse_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(preview_server.parse_range("bytes=-5000", 1000), (0, 999))
+        self.assertEqual(preview_server.parse_range("bytes=-0", 1000), ())
+
+    def test_unsatisfiable_ranges(self):
+        self.assertEqual(preview_server.parse_range("bytes=1000-", 1000), ())
+        self.assertEqual(preview_server.parse_range("bytes=500-400", 1000), ())
+
+    def test_zero_length_file(self):
+        for header in ("bytes=0-", "bytes=0-0", "bytes=-1"):
+            self.assertEqual(preview_server.parse_range(header, 0), ())
+
+    def test_unsupported_headers_are_ignored(self):
+        for header in ("bytes=-", "bytes=0-1,5-6", "items=0-1", "bytes=a-b"):
+            self.assertIsNone(preview_server.parse_range(header, 1000))
+
+
+class PreviewServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.work_dir = tempfile.mkdtemp()
+        cls.pages_dir = os.path.join(cls.work_dir, "pages")
+        os.makedirs(archive.plate_dir(cls.pages_dir, "EAL-3100"))
+        cls.photo = "EAL-3100_2025-06-01_01.jpg"
+        with open(archive.image_path(cls.pages_dir, "EAL-3100", cls.photo), 'wb') as f:
+            f.write(bytes(range(256)) * 4)
+        archive.write_vehicle_index(cls.pages_dir, "EAL-3100", {cls.photo: archive.Photo("2025-06-01")})
+        archive.write_main_index(cls.pages_dir, {"EAL-3100": archive.empty_vehicle_info()})
+        with open(os.path.join(cls.work_dir, "secret.txt"), 'w', encoding='utf-8') as f:
+            f.write("secret")
+        os.makedirs(os.path.join(cls.pages_dir, archive.LOCKS_DIRNAME))
+        with open(os.path.join(cls.pages_dir, archive.LOCKS_DIRNAME, "EAL-3100.lock"), 'w') as f:
+            f.write("")
+        cls.has_symlink = hasattr(os, "symlink")
+        if cls.has_symlink:
+            try:
+                os.symlink(os.path.join(cls.work_dir, "secret.txt"),
+                           archive.image_path(cls.pages_dir, "EAL-3100", "link.jpg"))
+            except OSError:  # Windows 需要額外權限才能建立符號連結
+                cls.has_symlink = False
+
+        cls.server = preview_server.PreviewServer(("127.0.0.1", 0), pages_dir=cls.pages_dir,
+                                                  cache_dir=os.path.join(cls.work_dir, "cache"))
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.work_dir)
+
+    def request(self, path, headers=None):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+        try:
+            connection.request("GET", path, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            connection.close()
+
+    def test_serves_photos_with_range_and_etag(self):
+        status, headers, body = self.request(f"/EAL-3100/{self.photo}")
+        self.assertEqual((status, len(body)), (200, 1024))
+        status, headers, body = self.request(f"/EAL-3100/{self.photo}", {"Range": "bytes=0-99"})
+        self.assertEqual((status, body, headers["Content-Range"]), (206, bytes(range(100)), "bytes 0-99/1024"))
+        status, _, _ = self.request(f"/EAL-3100/{self.photo}", {"Range": "bytes=2000-"})
+        self.assertEqual(status, 416)
+        status, _, body = self.request(f"/EAL-3100/{self.photo}", {"If-None-Match": headers["ETag"]})
+        self.assertEqual((status, body), (304, b""))
+
+    def test_rejects_paths_outside_pages(self):
+        for path in ("/../secret.txt", "/..%2fsecret.txt", "/EAL-3100/..%2f..%2fsecret.txt",
+                     "/%2e%2e/secret.txt", "/C:/secret.txt", "/EAL-3100/a:b", "/%2Fetc%2Fpasswd",
+                     "/EAL-3100/..%5c..%5csecret.txt", f"/{archive.LOCKS_DIRNAME}/EAL-3100.lock",
+                     "/EAL-3100/.index.json.lock"):
+            with self.subTest(path=path):
+                status, _, body = self.request(path)
+                self.assertEqual(status, 404)
+                self.assertNotIn(b"secret", body)
+
+    def test_rejects_symlinks_leaving_pages(self):
+        if not self.has_symlink:
+            self.skipTest("無法建立符號連結")
+        status, _, body = self.request("/EAL-3100/link.jpg")
+        self.assertEqual(status, 404)
+        self.assertNotIn(b"secret", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# tests/test_similarity.py
+# BK 樹的半徑查詢必須與逐一比較的結果相同；SimilarityIndex 的雜湊快取在重新載入後必須沿用。
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+import archive
+import perceptual
+import similarity
+
+
+class BKTreeTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(0)
+        # 以少數幾個中心加上隨機翻轉的位元產生雜湊，讓各種距離都會出現
+        centers = [rng.getrandbits(64) for _ in range(8)]
+        self.values = []
+        for i in range(400):
+            value = rng.choice(centers)
+            for _ in range(rng.randrange(0, 20)):
+                value ^= 1 << rng.randrange(64)
+            self.values.append((value, f"item{i}"))
+        self.tree = similarity.BKTree()
+        for value, item in self.values:
+            self.tree.add(value, item)
+
+    def brute_force(self, value, radius):
+        return sorted((perceptual.hamming_distance(value, other), item)
+                      for other, item in self.values if perceptual.hamming_distance(value, other) <= radius)
+
+    def test_query_matches_brute_force(self):
+        rng = random.Random(1)
+        queries = [value for value, _ in self.values[:20]] + [rng.getrandbits(64) for _ in range(20)]
+        for value in queries:
+            for radius in (0, 1, 5, 12, 30, 64):
+                self.assertEqual(sorted(self.tree.query(value, radius)), self.brute_force(value, radius))
+        self.assertEqual(self.tree.size, len(self.values))
+
+    def test_duplicate_hashes_share_a_node(self):
+        tree = similarity.BKTree()
+        tree.add(0xABCD, "a/1.jpg")
+        tree.add(0xABCD, "b/1.jpg")
+        tree.add(0xABCF, "c/1.jpg")
+        self.assertEqual(sorted(tree.query(0xABCD, 0)), [(0, "a/1.jpg"), (0, "b/1.jpg")])
+        tree.remove(0xABCD, "a/1.jpg")
+        self.assertEqual(sorted(tree.query(0xABCD, 1)), [(0, "b/1.jpg"), (1, "c/1.jpg")])
+        self.assertEqual(tree.size, 2)
+
+    def test_remove_keeps_routing_nodes(self):
+        removed = self.values[::3]
+        for value, item in removed:
+            self.tree.remove(value, item)
+        self.values = [entry for entry in self.values if entry not in removed]
+        for value, _ in self.values[:20]:
+            self.assertEqual(sorted(self.tree.query(value, 10)), self.brute_force(value, 10))
+
+
+def draw_bus(path, seed):
+    """產生一張簡單的測試圖片，相同的 seed 產生相同的內容。"""
+    rng = random.Random(seed)
+    img = Image.new('RGB', (64, 48), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        x, y = rng.randrange(48), rng.randrange(32)
+        draw.rectangle((x, y, x + 16, y + 16), fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    img.save(path, "JPEG", quality=95)
+
+
+class SimilarityIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.pages_dir = os.path.join(self.work_dir, "pages")
+        self.cache_file = os.path.join(self.work_dir, "similarity_cache.json")
+        for plate, seeds in {"EAL-3100": [1, 2], "EAL-3101": [1], "KKA-0001": [3]}.items():
+            os.makedirs(archive.plate_dir(self.pages_dir, plate))
+            for i, seed in enumerate(seeds, 1):
+                draw_bus(archive.image_path(self.pages_dir, plate, f"{plate}_2025-06-01_{i:02d}.jpg"), seed)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def new_index(self):
+        return similarity.SimilarityIndex(self.pages_dir, self.cache_file)
+
+    def test_identical_photo_under_another_plate_is_found(self):
+        index = self.new_index()
+        self.assertEqual(index.refresh(workers=1), 4)
+        candidates = index.find_similar_plates("EAL-3101", max_distance=0)
+        self.assertEqual([plate for plate, _, _ in candidates], ["EAL-3100"])
+        self.assertEqual(candidates[0][2], [(0, "EAL-3101_2025-06-01_01.jpg", "EAL-3100_2025-06-01_01.jpg")])
+
+    def test_cache_reload_reuses_hashes(self):
+        first = self.new_index()
+        first.refresh(workers=1)
+        reloaded = self.new_index()
+        self.assertEqual(reloaded.refresh(workers=1), 0)
+        self.assertEqual(reloaded.entries, first.entries)
+        self.assertEqual(reloaded.find_similar_plates("EAL-3100"), first.find_similar_plates("EAL-3100"))
+
+    def test_renamed_photo_reuses_its_hash(self):
+        index = self.new_index()
+        index.refresh(workers=1)
+        old_path = archive.image_path(self.pages_dir, "KKA-0001", "KKA-0001_2025-06-01_01.jpg")
+        os.rename(old_path, archive.image_path(self.pages_dir, "KKA-0001", "KKA-0001_2025-06-02_01.jpg"))
+        self.assertEqual(index.refresh(["KKA-0001"], workers=1), 0)
+        self.assertIn("KKA-0001/KKA-0001_2025-06-02_01.jpg", index.entries)
+        self.assertNotIn("KKA-0001/KKA-0001_2025-06-01_01.jpg", index.entries)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+# tests/test_stats.py
+# 增量統計 (ArchiveStats) 經過重命名、刪除與重新加入後，必須與從頭重建的結果一致。
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive
+import stats
+
+
+def make_gallery(pages_dir, plates):
+    """建立只有索引的測試圖庫。plates 為 {車牌: (Vehicle, [拍攝日期])}，回傳主索引資料。"""
+    vehicles = {}
+    for plate, (vehicle, dates) in plates.items():
+        os.makedirs(archive.plate_dir(pages_dir, plate))
+        archive.write_vehicle_index(pages_dir, plate, {f"{plate}_{date}_{i:02d}.jpg": archive.Photo(date=date)
+                                                       for i, date in enumerate(dates, 1)})
+        vehicles[plate] = vehicle
+    archive.write_main_index(pages_dir, vehicles)
+    return vehicles
+
+
+class ArchiveStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.pages_dir = os.path.join(self.work_dir, "pages")
+        self.vehicles = make_gallery(self.pages_dir, {
+            "EAL-3100": (archive.Vehicle("大都會客運", "2020", "成運", "MB120"), ["2025-06-01", "2025-06-02", "2025-07-01"]),
+            "KKA-0001": (archive.Vehicle("首都客運", "2019", "成運", "MB120"), ["2025-07-03"]),
+            "FAC-123": (archive.Vehicle("", "", "", ""), ["YYYY-MM-DD"]),
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def new_stats(self, name):
+        return stats.ArchiveStats(self.pages_dir, os.path.join(self.work_dir, name))
+
+    def rebuilt_totals(self, vehicles):
+        fresh = self.new_stats("rebuild_cache.json")
+        fresh.refresh(vehicles, rebuild=True, workers=1)
+        return fresh.totals
+
+    def test_rename_round_trip_matches_rebuild(self):
+        incremental = self.new_stats("stats_cache.json")
+        incremental.refresh(self.vehicles, workers=1)
+
+        archive.rename_plate_folder(self.pages_dir, "EAL-3100", "EAL-3101")
+        incremental.rename_plate("EAL-3100", "EAL-3101")
+        renamed = {("EAL-3101" if plate == "EAL-3100" else plate): vehicle for plate, vehicle in self.vehicles.items()}
+        self.assertEqual(incremental.totals, self.rebuilt_totals(renamed))
+
+        archive.rename_plate_folder(self.pages_dir, "EAL-3101", "EAL-3100")
+        incremental.rename_plate("EAL-3101", "EAL-3100")
+        self.assertEqual(incremental.totals, self.rebuilt_totals(self.vehicles))
+
+    def test_remove_and_readd_matches_rebuild(self):
+        incremental = self.new_stats("stats_cache.json")
+        incremental.refresh(self.vehicles, workers=1)
+
+        incremental.remove_plate("KKA-0001")
+        remaining = {plate: vehicle for plate, vehicle in self.vehicles.items() if plate != "KKA-0001"}
+        self.assertNotIn("首都客運", incremental.totals["company"])
+        self.assertEqual(incremental.totals["month"]["2025-07"], [1, 1])
+
+        incremental.update_vehicle("KKA-0001", self.vehicles["KKA-0001"])
+        incremental.update_photos("KKA-0001", archive.read_vehicle_index(self.pages_dir, "KKA-0001"))
+        self.assertEqual(incremental.totals, self.rebuilt_totals(self.vehicles))
+        self.assertNotEqual(incremental.totals, self.rebuilt_totals(remaining))
+
+    def test_cache_reload_matches_rebuild(self):
+        incremental = self.new_stats("stats_cache.json")
+        incremental.refresh(self.vehicles, workers=1)
+        incremental.save()
+
+        reloaded = self.new_stats("stats_cache.json")
+        self.assertEqual(reloaded.refresh(self.vehicles, workers=1), 0)
+        self.assertEqual(reloaded.totals, self.rebuilt_totals(self.vehicles))
+
+
+if __name__ == "__main__":
+    unittest.main()
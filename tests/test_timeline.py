@@ -0,0 +1,82 @@
+# tests/test_timeline.py
+# 跨車牌日期索引 (DateIndex) 的查詢與增量更新必須與從頭建立的結果一致。
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive
+import timeline
+
+
+def photos(**dates):
+    return {name.replace('_', '-') + ".jpg": archive.Photo(date) for name, date in dates.items()}
+
+
+class DateIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plates = {
+            "EAL-3100": photos(a1="2025-06-01", a2="2025-06-01", a3="2025-07-15"),
+            "KKA-0001": photos(b1="2025-06-01", b2=""),
+            "FAC-123": photos(c1="2024-12-31"),
+        }
+        self.index = timeline.DateIndex()
+        for plate, plate_photos in self.plates.items():
+            self.index.set_plate(plate, plate_photos)
+
+    def rebuilt(self):
+        fresh = timeline.DateIndex()
+        for plate, plate_photos in self.plates.items():
+            fresh.set_plate(plate, plate_photos)
+        return fresh
+
+    def assertMatchesRebuild(self):
+        fresh = self.rebuilt()
+        self.assertEqual(self.index.days(), fresh.days())
+        self.assertEqual(self.index.by_date, fresh.by_date)
+        self.assertEqual(self.index.photo_count(), fresh.photo_count())
+
+    def test_days_are_newest_first_with_unknown_last(self):
+        self.assertEqual(self.index.days(), [("2025-07-15", 1), ("2025-06-01", 3), ("2024-12-31", 1),
+                                             (timeline.UNKNOWN_DATE, 1)])
+        self.assertEqual(self.index.photo_count(), 6)
+
+    def test_photos_on_a_day_span_plates_in_order(self):
+        self.assertEqual(self.index.photos_on("2025-06-01"),
+                         [("EAL-3100", "a1.jpg"), ("EAL-3100", "a2.jpg"), ("KKA-0001", "b1.jpg")])
+        self.assertEqual(self.index.photos_on(timeline.UNKNOWN_DATE), [("KKA-0001", "b2.jpg")])
+        self.assertEqual(self.index.photos_on("2000-01-01"), [])
+
+    def test_update_photo_moves_between_days(self):
+        self.index.update_photo("EAL-3100", "a3.jpg", "2025-06-01")
+        self.plates["EAL-3100"]["a3.jpg"] = archive.Photo("2025-06-01")
+        self.assertNotIn("2025-07-15", dict(self.index.days()))
+        self.assertMatchesRebuild()
+
+        self.index.update_photo("KKA-0001", "b3.jpg", "2025-08-01")
+        self.plates["KKA-0001"]["b3.jpg"] = archive.Photo("2025-08-01")
+        self.assertEqual(self.index.days()[0], ("2025-08-01", 1))
+        self.assertMatchesRebuild()
+
+    def test_set_plate_only_applies_differences(self):
+        self.plates["EAL-3100"] = photos(a1="2025-06-01", a4="2025-07-16")
+        self.index.set_plate("EAL-3100", self.plates["EAL-3100"])
+        self.assertMatchesRebuild()
+        days = self.index.days()
+        # 內容未變時不會讓排序快取失效
+        self.index.set_plate("EAL-3100", self.plates["EAL-3100"])
+        self.assertIs(self.index.days(), days)
+
+    def test_remove_plate(self):
+        self.index.remove_plate("FAC-123")
+        del self.plates["FAC-123"]
+        self.assertNotIn("2024-12-31", dict(self.index.days()))
+        self.assertMatchesRebuild()
+        self.index.remove_plate("NOT-THERE")
+        self.assertMatchesRebuild()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+# tests/test_widgets.py
+# 車牌列表的資料模型 (SortedFilterModel)：排序、篩選與增量新增、刪除必須與重新建立的結果一致。
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from widgets import SortedFilterModel
+
+
+class SortedFilterModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.items = ["KKA-0001", "EAL-3100", "FAC-123", "EAL-3101", "kkb-0002"]
+        self.model = SortedFilterModel(self.items)
+
+    def expected_view(self, term):
+        return sorted(item for item in self.items if term.upper() in item.upper())
+
+    def test_items_are_sorted(self):
+        self.assertEqual(self.model.all_items, sorted(self.items))
+        self.assertEqual(self.model.view_items, sorted(self.items))
+
+    def test_filter_is_case_insensitive_substring(self):
+        self.assertTrue(self.model.set_filter("eal"))
+        self.assertEqual(self.model.view_items, ["EAL-3100", "EAL-3101"])
+        self.assertFalse(self.model.set_filter("EAL"))
+        self.assertTrue(self.model.set_filter("kk"))
+        self.assertEqual(self.model.view_items, ["KKA-0001", "kkb-0002"])
+
+    def test_narrowing_and_widening_the_filter(self):
+        for term in ("E", "EA", "EAL-310", "EAL-3101", "EAL", "", "0"):
+            self.model.set_filter(term)
+            self.assertEqual(self.model.view_items, self.expected_view(term), term)
+
+    def test_insert_keeps_order_and_respects_filter(self):
+        self.model.set_filter("EAL")
+        self.assertEqual(self.model.insert("EAL-3099"), 0)
+        self.assertEqual(self.model.insert("KKA-0003"), -1)  # 不符合篩選條件
+        self.assertEqual(self.model.insert("EAL-3099"), -1)  # 已存在
+        self.items += ["EAL-3099", "KKA-0003"]
+        self.assertEqual(self.model.all_items, sorted(self.items))
+        self.assertEqual(self.model.view_items, self.expected_view("EAL"))
+        self.assertEqual(self.model.index_of("EAL-3101"), 2)
+        self.assertEqual(self.model.index_of("KKA-0003"), -1)
+
+    def test_remove(self):
+        self.model.set_filter("EAL")
+        self.assertEqual(self.model.remove("EAL-3100"), 0)
+        self.assertEqual(self.model.remove("FAC-123"), -1)  # 存在但不在篩選結果中
+        self.assertEqual(self.model.remove("NOT-THERE"), -1)
+        self.items = [item for item in self.items if item not in ("EAL-3100", "FAC-123")]
+        self.assertEqual(self.model.all_items, sorted(self.items))
+        self.assertEqual(self.model.view_items, self.expected_view("EAL"))
+
+    def test_random_edits_match_rebuild(self):
+        rng = random.Random(0)
+        pool = [f"{prefix}-{n:04d}" for prefix in ("EAL", "KKA", "FAC") for n in range(40)]
+        self.items = []
+        self.model = SortedFilterModel()
+        for step in range(500):
+            item = rng.choice(pool)
+            if item in self.items:
+                self.model.remove(item)
+                self.items.remove(item)
+            else:
+                self.model.insert(item)
+                self.items.append(item)
+            if step % 50 == 0:
+                self.model.set_filter(rng.choice(["", "EAL", "00", "KKA-001", "A"]))
+            self.assertEqual(self.model.all_items, sorted(self.items))
+            self.assertEqual(self.model.view_items, self.expected_view(self.model.filter_term))
+
+
+if __name__ == "__main__":
+    unittest.main()
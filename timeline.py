@@ -0,0 +1,77 @@
+# timeline.py
+# 跨車牌的日期索引：日期 -> 當天拍攝的 (車牌, 圖片)，供管理器的時間軸面板使用。
+
+UNKNOWN_DATE = ""
+UNKNOWN_DATE_LABEL = "(未填日期)"
+
+
+class DateIndex:
+    """
+    在記憶體中維護「日期 -> {(車牌, 圖片)}」以及反向的「車牌 -> {圖片: 日期}」。
+    以車牌為單位更新：set_plate 只比對該車牌的圖片，update_photo 只移動一張圖片，
+    切換日期時直接查表，不需重新讀取任何索引。
+    """
+
+    def __init__(self):
+        self.by_date = {}  # 日期 -> {(車牌, 圖片)}
+        self.by_plate = {}  # 車牌 -> {圖片: 日期}
+        self._days = None  # 排序後的 [(日期, 照片數)]，有變動時才重新排序
+
+    def _add(self, day, plate, image):
+        self.by_date.setdefault(day, set()).add((plate, image))
+
+    def _discard(self, day, plate, image):
+        photos = self.by_date.get(day)
+        if photos is not None:
+            photos.discard((plate, image))
+            if not photos:
+                del self.by_date[day]
+
+    def update_photo(self, plate, image, day):
+        """單張圖片的日期被修改 (或新增圖片) 時呼叫。"""
+        day = day or UNKNOWN_DATE
+        images = self.by_plate.setdefault(plate, {})
+        old_day = images.get(image)
+        if image in images and old_day == day:
+            return
+        if image in images:
+            self._discard(old_day, plate, image)
+        images[image] = day
+        self._add(day, plate, image)
+        self._days = None
+
+    def set_plate(self, plate, photos):
+        """以車輛的圖片索引 ({圖片: Photo}) 取代該車牌的所有項目，只更新有差異的圖片。"""
+        images = self.by_plate.get(plate, {})
+        new_images = {image: photo.date or UNKNOWN_DATE for image, photo in photos.items()}
+        if images == new_images:
+            return
+        for image, day in images.items():
+            if new_images.get(image) != day:
+                self._discard(day, plate, image)
+        for image, day in new_images.items():
+            if images.get(image) != day:
+                self._add(day, plate, image)
+        self.by_plate[plate] = new_images
+        self._days = None
+
+    def remove_plate(self, plate):
+        for image, day in self.by_plate.pop(plate, {}).items():
+            self._discard(day, plate, image)
+        self._days = None
+
+    def days(self):
+        """回傳 [(日期, 照片數)]，新的日期在前，未填日期的照片排在最後。"""
+        if self._days is None:
+            dated = sorted((day for day in self.by_date if day != UNKNOWN_DATE), reverse=True)
+            if UNKNOWN_DATE in self.by_date:
+                dated.append(UNKNOWN_DATE)
+            self._days = [(day, len(self.by_date[day])) for day in dated]
+        return self._days
+
+    def photos_on(self, day):
+        """回傳當天的 [(車牌, 圖片)]，依車牌與檔名排序。"""
+        return sorted(self.by_date.get(day, ()))
+
+    def photo_count(self):
+        return sum(len(images) for images in self.by_plate.values())
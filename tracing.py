@@ -0,0 +1,181 @@
+# tracing.py
+import os
+import sys
+import json
+import time
+import atexit
+import bisect
+import datetime
+import functools
+import threading
+
+# 以環境變數 BUS_GALLERY_TRACE=<檔案路徑> 或命令列旗標 --trace 開啟；
+# 未開啟時 span() 直接回傳共用的空物件，幾乎沒有額外成本。
+TRACE_FLAG = "--trace"
+TRACE_ENV = "BUS_GALLERY_TRACE"
+DEFAULT_TRACE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trace.jsonl")
+# 直方圖的區間上限 (毫秒)，最後一格為無上限
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Histogram:
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+
+    def percentile(self, fraction):
+        """以直方圖估計百分位數 (回傳該區間的上限，最後一格回傳最大值)。"""
+        target = fraction * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= target:
+                return BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        labels = [f"<={bound}" for bound in BUCKET_BOUNDS_MS] + [f">{BUCKET_BOUNDS_MS[-1]}"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0,
+            "min_ms": round(self.min, 3),
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.tracer._depth.value = getattr(self.tracer._depth, 'value', 0) + 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.start) * 1000
+        self.tracer._depth.value -= 1
+        self.tracer.record(self.name, ms, top_level=self.tracer._depth.value == 0)
+        return False
+
+
+class Tracer:
+    """
+    收集具名區段的耗時直方圖，程式結束時以 JSONL 格式附加寫入檔案 (每個操作一行)。
+    last_operation 保存最近一次「最外層」區段的名稱與耗時，供介面顯示。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.enabled = path is not None
+        self.histograms = {}
+        self.last_operation = None
+        self._lock = threading.Lock()
+        self._depth = threading.local()
+        self._session_start = datetime.datetime.now().isoformat(timespec='seconds')
+        if self.enabled:
+            atexit.register(self.flush)
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, ms, top_level=True):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = _Histogram()
+            histogram.add(ms)
+            if top_level:
+                self.last_operation = (name, ms)
+
+    def flush(self):
+        """將目前累積的直方圖附加寫入 JSONL 檔並清空。"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histograms, self.histograms = self.histograms, {}
+        if not histograms:
+            return
+        program = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python"
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for name in sorted(histograms):
+                    record = {"session": self._session_start, "program": program, "op": name}
+                    record.update(histograms[name].to_dict())
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"警告：無法寫入追蹤檔 '{self.path}': {e}", file=sys.stderr)
+
+
+def _trace_path_from_environment(argv=None):
+    """
+    由環境變數或命令列決定追蹤檔路徑，接受 '--trace'、'--trace=PATH' 與 '--trace PATH'
+    (與 argparse 的 nargs='?' 相同：下一個參數不是旗標時視為路徑)。
+    模組匯入時就需要決定 (traced 裝飾器在定義函數時檢查)，因此不能等待 argparse。
+    """
+    if os.environ.get(TRACE_ENV):
+        return os.environ[TRACE_ENV]
+    args = sys.argv[1:] if argv is None else argv
+    for i, arg in enumerate(args):
+        if arg == "--":
+            break
+        if arg == TRACE_FLAG:
+            if i + 1 < len(args) and not args[i + 1].startswith('-'):
+                return args[i + 1]
+            return DEFAULT_TRACE_FILE
+        if arg.startswith(TRACE_FLAG + "="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+TRACER = Tracer(_trace_path_from_environment())
+span = TRACER.span
+
+
+def traced(name):
+    """方法/函數裝飾器：以整個呼叫為一個區段。未開啟追蹤時直接回傳原函數，沒有任何額外成本。"""
+    def decorator(func):
+        if not TRACER.enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
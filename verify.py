@@ -0,0 +1,209 @@
+# verify.py
+import io
+import os
+import sys
+import json
+import hashlib
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import archive
+
+# --- 常數設定 ---
+# 假設此腳本與 manager.py 在同一個目錄下
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(SCRIPT_DIR, "pages")
+# 每個檔案上次檢查時的大小、修改時間、SHA-256 與檢查結果
+CHECKSUM_FILE = os.path.join(SCRIPT_DIR, "checksums.json")
+
+JPEG_SOI = b'\xff\xd8'
+JPEG_EOI = b'\xff\xd9'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_IEND = b'IEND\xaeB`\x82'
+# 解碼檢查時縮小到的尺寸，JPEG 可藉由 draft 以 1/8 比例快速解碼
+DECODE_CHECK_SIZE = (256, 256)
+
+
+def check_structure(data, filename):
+    """檢查檔案的結構標記，回傳錯誤訊息 (正常時為 None)。"""
+    lower = filename.lower()
+    if lower.endswith(('.jpg', '.jpeg')):
+        if not data.startswith(JPEG_SOI):
+            return "缺少 JPEG 起始標記 (SOI)"
+        # 部分相機會在 EOI 之後補上填充位元組，只檢查去除填充後的結尾
+        if not data.rstrip(b'\x00').endswith(JPEG_EOI):
+            return "缺少 JPEG 結束標記 (EOI)，檔案可能被截斷"
+    elif lower.endswith('.png'):
+        if not data.startswith(PNG_SIGNATURE):
+            return "PNG 檔頭不正確"
+        if not data.endswith(PNG_IEND):
+            return "缺少 PNG 結尾區塊 (IEND)，檔案可能被截斷"
+    return None
+
+
+def check_decode(data):
+    """以 PIL 驗證檔案並實際解碼一次 (縮小解碼)，回傳錯誤訊息 (正常時為 None)。"""
+    from PIL import Image
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+        # verify() 之後圖片物件無法再使用，需重新開啟才能解碼
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft('RGB', DECODE_CHECK_SIZE)
+            img.load()
+    except Exception as e:
+        return f"無法解碼: {e}"
+    return None
+
+
+def verify_one(task):
+    """
+    檢查單一圖片 (在子行程中執行)：讀取一次檔案內容，計算 SHA-256 並檢查結構與解碼。
+    回傳要寫入檢查紀錄的項目。
+    """
+    path = task["path"]
+    try:
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        return unreadable_entry(path, e)
+    error = check_structure(data, path) or check_decode(data)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "status": "error" if error else "ok",
+        "error": error,
+        "checked_at": datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def unreadable_entry(path, error):
+    """
+    無法讀取的檔案 (權限不足、I/O 錯誤) 也寫入紀錄，健康檢查才能顯示；
+    狀態為 'unreadable' 的檔案每次都會重新檢查，不會因為大小與修改時間未變而略過。
+    """
+    try:
+        stat = os.stat(path)
+        size, mtime_ns = stat.st_size, stat.st_mtime_ns
+    except OSError:
+        size = mtime_ns = None
+    return {
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "sha256": None,
+        "status": "unreadable",
+        "error": f"無法讀取: {error}",
+        "checked_at": datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def load_checksums(checksum_file=CHECKSUM_FILE):
+    try:
+        with open(checksum_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def failed_files(checksum_file=CHECKSUM_FILE):
+    """回傳上次檢查時有問題的檔案 {相對路徑: 錯誤訊息}，供健康檢查顯示。"""
+    return {rel_path: entry.get("error") or "" for rel_path, entry in load_checksums(checksum_file).items()
+            if entry.get("status") != "ok"}
+
+
+def collect_images(pages_dir):
+    """列出 pages 底下所有車牌資料夾中的圖片 {相對路徑 ('車牌/檔名'，與資料夾配置無關): 完整路徑}。"""
+    images = {}
+    for plate, plate_dir in sorted(archive.list_plate_dirs(pages_dir).items()):
+        for filename in sorted(archive.list_images(plate_dir)):
+            images[f"{plate}/{filename}"] = os.path.join(plate_dir, filename)
+    return images
+
+
+def verify_archive(pages_dir=PAGES_DIR, checksum_file=CHECKSUM_FILE, full=False, workers=None):
+    """
+    檢查圖庫中的圖片，回傳 (檢查數, 略過數, 有問題的檔案, 位元腐壞的檔案, 已消失的檔案)：
+    1. 大小與修改時間和上次記錄相同的檔案直接略過；full 為 True 時重新檢查所有檔案。
+    2. 重新檢查時若大小與修改時間都沒變、雜湊值卻不同，代表檔案內容在沒有被修改的情況下改變 (位元腐壞)。
+    3. 檢查結果寫回紀錄檔。
+    """
+    previous = load_checksums(checksum_file)
+    images = collect_images(pages_dir)
+    checksums, tasks = {}, []
+    skipped_count = 0
+    for rel_path, path in images.items():
+        entry = previous.get(rel_path)
+        if not full and entry and entry.get("status") != "unreadable":
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+                checksums[rel_path] = entry
+                skipped_count += 1
+                continue
+        tasks.append((rel_path, path))
+
+    problems, bit_rot = {}, []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(verify_one, {"path": path}): rel_path for rel_path, path in tasks}
+        for future in as_completed(futures):
+            rel_path = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                entry = unreadable_entry(images[rel_path], e)
+            if entry["status"] == "unreadable":
+                print(f"錯誤：'{rel_path}' {entry['error']}")
+            old = previous.get(rel_path)
+            if (old and old.get("sha256") and entry["sha256"] and old.get("size") == entry["size"]
+                    and old.get("mtime_ns") == entry["mtime_ns"] and old.get("sha256") != entry["sha256"]):
+                bit_rot.append(rel_path)
+                entry["status"] = "error"
+                entry["error"] = entry["error"] or "檔案內容改變但大小與修改時間未變 (可能為位元腐壞)"
+            if entry["status"] != "ok":
+                problems[rel_path] = entry["error"]
+            checksums[rel_path] = entry
+
+    # 上次檢查過但仍有問題、本次略過的檔案也一併回報
+    for rel_path, entry in checksums.items():
+        if entry.get("status") != "ok" and rel_path not in problems:
+            problems[rel_path] = entry.get("error") or ""
+
+    missing = sorted(set(previous) - set(images))
+    archive.write_json_atomic(checksum_file, {key: checksums[key] for key in sorted(checksums)})
+    return len(tasks), skipped_count, problems, sorted(bit_rot), missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="平行檢查 pages 中所有圖片的完整性，並記錄每個檔案的 SHA-256。")
+    parser.add_argument("--full", action="store_true", help="重新檢查所有檔案 (包含未變動的)，用於偵測位元腐壞")
+    parser.add_argument("--workers", type=int, default=None, help="平行處理的行程數 (預設為 CPU 核心數)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(PAGES_DIR):
+        print(f"錯誤：找不到 'pages' 資料夾 '{PAGES_DIR}'。")
+        return 1
+
+    checked, skipped, problems, bit_rot, missing = verify_archive(full=args.full, workers=args.workers)
+    for rel_path in sorted(problems):
+        print(f"  > 有問題: {rel_path}: {problems[rel_path]}")
+    for rel_path in missing:
+        print(f"  > 已消失: {rel_path}")
+
+    print("-" * 40)
+    print("檢查完成！")
+    print(f"檢查 {checked} 個檔案，略過 {skipped} 個 (未變動)，{len(problems)} 個有問題。")
+    if bit_rot:
+        print(f"警告：{len(bit_rot)} 個檔案的內容在未被修改的情況下改變，可能發生位元腐壞！")
+    if missing:
+        print(f"{len(missing)} 個上次檢查過的檔案已不存在。")
+    print(f"檢查紀錄已寫入 '{os.path.abspath(CHECKSUM_FILE)}'。")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
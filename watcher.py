@@ -0,0 +1,200 @@
+# watcher.py
+import os
+import sys
+import struct
+import select
+import threading
+import archive
+
+SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+
+# --- inotify 常數 (見 <sys/inotify.h>) ---
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct('iIII')
+
+# 此名稱代表「整個 pages 資料夾都需要重新比對」 (例如 inotify 佇列溢位)
+RESCAN_ALL = None
+# 分片資料夾的監看標記 (不可能是車牌名稱)
+SHARD_WATCH = '/'
+
+
+def _load_libc():
+    """在 Linux 上載入 libc 並確認 inotify 可用，否則回傳 None。"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class PagesWatcher:
+    """
+    監看 pages 資料夾，在背景執行緒中收集「哪些車牌資料夾有變動」。
+    Linux 上使用 inotify，其他平台 (或 inotify 無法使用時) 改為定期比對資料夾修改時間。
+    收集到的車牌由主執行緒呼叫 drain() 取出，watcher 本身不會碰觸任何 Tk 元件。
+    """
+
+    def __init__(self, pages_dir, poll_interval=2.0):
+        self.pages_dir = pages_dir
+        self.poll_interval = poll_interval
+        self._dirty_plates = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._libc = _load_libc()
+        self.backend = 'inotify' if self._libc else 'polling'
+
+    # --- 公開介面 ---
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        target = self._run_inotify if self._libc else self._run_polling
+        self._thread = threading.Thread(target=target, name="PagesWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def drain(self):
+        """取出並清空目前累積的變動車牌集合；集合中若含 RESCAN_ALL 代表需完整比對。"""
+        with self._lock:
+            plates, self._dirty_plates = self._dirty_plates, set()
+        return plates
+
+    # --- 內部實作 ---
+
+    def _mark(self, plate):
+        with self._lock:
+            self._dirty_plates.add(plate)
+
+    def _scan_layout(self):
+        """回傳 ({車牌: 資料夾路徑}, [分片資料夾路徑])，支援平面與分片配置 (見 archive.scan_layout)。"""
+        try:
+            return archive.scan_layout(self.pages_dir)
+        except FileNotFoundError:
+            return {}, []
+
+    def _run_inotify(self):
+        libc = self._libc
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            # inotify 無法初始化 (例如已達 max_user_instances)，改用輪詢
+            self.backend = 'polling'
+            self._run_polling()
+            return
+
+        watch_to_plate = {}
+        flat = archive.read_layout(self.pages_dir) == archive.LAYOUT_FLAT
+
+        def add_watch(path, plate):
+            wd = libc.inotify_add_watch(fd, os.fsencode(path), WATCH_MASK)
+            if wd >= 0:
+                watch_to_plate[wd] = plate
+
+        def add_layout_watches():
+            """監看所有分片與車牌資料夾 (已監看的路徑會沿用原本的 watch)，回傳目前的車牌集合。"""
+            plates, shards = self._scan_layout()
+            for shard_path in shards:
+                add_watch(shard_path, SHARD_WATCH)
+            for plate, path in plates.items():
+                add_watch(path, plate)
+            return plates
+
+        try:
+            add_watch(self.pages_dir, '')
+            add_layout_watches()
+
+            while not self._stop_event.is_set():
+                ready, _, _ = select.select([fd], [], [], 0.5)
+                if not ready:
+                    continue
+                try:
+                    buffer = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+
+                offset = 0
+                while offset + EVENT_HEADER.size <= len(buffer):
+                    wd, mask, _, name_len = EVENT_HEADER.unpack_from(buffer, offset)
+                    offset += EVENT_HEADER.size
+                    name = os.fsdecode(buffer[offset:offset + name_len].rstrip(b'\0'))
+                    offset += name_len
+
+                    if mask & IN_Q_OVERFLOW:
+                        self._mark(RESCAN_ALL)
+                        continue
+                    if mask & IN_IGNORED:
+                        watch_to_plate.pop(wd, None)
+                        continue
+
+                    parent_plate = watch_to_plate.get(wd)
+                    if parent_plate is None:
+                        continue
+
+                    if parent_plate in ('', SHARD_WATCH):
+                        # pages 根目錄或分片資料夾：只關心車牌 (或分片) 資料夾的新增、刪除與搬移
+                        if not (mask & IN_ISDIR) or not name or name.startswith('.'):
+                            continue  # 隱藏資料夾 (例如 .locks) 不是車牌
+                        if flat:
+                            if mask & (IN_CREATE | IN_MOVED_TO):
+                                add_watch(os.path.join(self.pages_dir, name), name)
+                            self._mark(name)
+                            continue
+                        plates = add_layout_watches()
+                        # 根目錄中新增或刪除的是分片時，無法得知其中有哪些車牌，改為完整比對
+                        self._mark(name if parent_plate == SHARD_WATCH or name in plates else RESCAN_ALL)
+                    elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                        self._mark(parent_plate)
+                    elif name.lower().endswith(SUPPORTED_FORMATS) and not mask & IN_CREATE:
+                        # 新建檔案要等到 IN_CLOSE_WRITE 才算寫入完成；
+                        # 自身寫入的 index.json 也不觸發同步，避免無限循環
+                        self._mark(parent_plate)
+        finally:
+            os.close(fd)
+
+    def _run_polling(self):
+        def snapshot():
+            result = {}
+            for plate, path in self._scan_layout()[0].items():
+                try:
+                    result[plate] = os.stat(path).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+            return result
+
+        previous = snapshot()
+        pending = set()
+        while not self._stop_event.wait(self.poll_interval):
+            # 上一輪偵測到的變動延後一輪才送出，讓正在寫入的圖片有時間完成
+            for plate in pending:
+                self._mark(plate)
+            current = snapshot()
+            # 資料夾內新增、刪除或重新命名檔案時，資料夾的修改時間會改變
+            pending = {plate for plate in previous.keys() | current.keys()
+                       if previous.get(plate) != current.get(plate)}
+            previous = current
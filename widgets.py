@@ -0,0 +1,503 @@
+# widgets.py
+import bisect
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import Frame, Listbox, Scrollbar, Canvas
+from tkinter import font as tkfont
+from tracing import span
+
+
+class SortedFilterModel:
+    """
+    排序好的項目集合與其篩選結果，不依賴 Tk，可單獨用於測試與效能量測。
+    新增、刪除以二分搜尋定位；篩選條件為不分大小寫的子字串比對。
+    """
+
+    def __init__(self, items=()):
+        self.all_items = sorted(items)
+        self.view_items = list(self.all_items)
+        self.filter_term = ""
+
+    def set_items(self, items):
+        self.all_items = sorted(items)
+        self._rebuild_view(self.filter_term, self.all_items)
+
+    def set_filter(self, term):
+        """設定篩選條件；若新條件是舊條件的延伸，只需在目前結果中繼續篩選。回傳結果是否改變。"""
+        term = term.upper()
+        if term == self.filter_term:
+            return False
+        source = self.view_items if term.startswith(self.filter_term) else self.all_items
+        self._rebuild_view(term, source)
+        return True
+
+    def insert(self, item):
+        """插入項目；回傳它在篩選結果中的位置，若已存在或不符合篩選條件則回傳 -1。"""
+        index = bisect.bisect_left(self.all_items, item)
+        if index < len(self.all_items) and self.all_items[index] == item:
+            return -1
+        self.all_items.insert(index, item)
+        if not self.matches(item):
+            return -1
+        view_index = bisect.bisect_left(self.view_items, item)
+        self.view_items.insert(view_index, item)
+        return view_index
+
+    def remove(self, item):
+        """移除項目；回傳它原本在篩選結果中的位置，若不存在於篩選結果則回傳 -1。"""
+        index = bisect.bisect_left(self.all_items, item)
+        if index >= len(self.all_items) or self.all_items[index] != item:
+            return -1
+        del self.all_items[index]
+        view_index = self.index_of(item)
+        if view_index >= 0:
+            del self.view_items[view_index]
+        return view_index
+
+    def index_of(self, item):
+        """項目在篩選結果中的位置，找不到時回傳 -1。"""
+        index = bisect.bisect_left(self.view_items, item)
+        if index < len(self.view_items) and self.view_items[index] == item:
+            return index
+        return -1
+
+    def matches(self, item):
+        return self.filter_term in item.upper()
+
+    def _rebuild_view(self, term, source):
+        self.filter_term = term
+        self.view_items = [item for item in source if self.matches(item)] if term else list(source)
+
+
+class VirtualListbox(Frame):
+    """
+    只繪製可見列的虛擬化列表。
+    所有項目保存在記憶體中的 SortedFilterModel，Tk 的 Listbox 永遠只放目前畫面上看得到的那幾列，
+    因此篩選、新增、刪除都不需要對每個項目呼叫一次 Tk，捲動時才重新填入可見範圍。
+    選取狀態以「項目」而非「列號」記錄，篩選或捲動後仍會保留。
+    multiple 為 True 時支援 Ctrl+點擊 切換選取、Shift+點擊 選取範圍 (範圍可跨越目前看不到的列)。
+    選取變更時會在此元件上觸發 <<ListboxSelect>> 事件。
+    """
+
+    def __init__(self, master, multiple=False, **kwargs):
+        super().__init__(master)
+        self.model = SortedFilterModel()
+        self.multiple = multiple
+        self._selected = set()
+        self._anchor = None       # 最近一次單獨點擊的項目，作為範圍選取的起點
+        self._top = 0             # 可見範圍的第一列在篩選結果中的位置
+        self._visible_rows = 1
+
+        self._scrollbar = Scrollbar(self, command=self.yview)
+        self._scrollbar.pack(side='right', fill='y')
+        self._listbox = Listbox(self, exportselection=False, activestyle='none', **kwargs)
+        self._listbox.pack(side='left', fill='both', expand=True)
+
+        self._listbox.bind('<<ListboxSelect>>', self._on_listbox_select)
+        if multiple:
+            self._listbox.bind('<Control-Button-1>', self._on_toggle_click)
+            self._listbox.bind('<Shift-Button-1>', self._on_range_click)
+        self._listbox.bind('<Configure>', self._on_configure)
+        self._listbox.bind('<MouseWheel>', self._on_mousewheel)
+        self._listbox.bind('<Button-4>', lambda e: self._scroll_by(-3))
+        self._listbox.bind('<Button-5>', lambda e: self._scroll_by(3))
+        self._listbox.bind('<Up>', lambda e: self._move_selection(-1))
+        self._listbox.bind('<Down>', lambda e: self._move_selection(1))
+        self._listbox.bind('<Prior>', lambda e: self._move_selection(-self._visible_rows))
+        self._listbox.bind('<Next>', lambda e: self._move_selection(self._visible_rows))
+
+    # --- 資料模型 ---
+
+    def set_items(self, items):
+        """以新的項目集合取代整個模型 (會排序)，保留篩選條件與仍存在的選取項目。"""
+        self.model.set_items(items)
+        self._selected &= set(self.model.all_items)
+        self._top = 0
+        self._render()
+
+    def set_filter(self, term):
+        if self.model.set_filter(term):
+            self._top = 0
+            self._render()
+
+    def insert_item(self, item):
+        """插入單一項目；只有在它落在篩選結果中時才需要重新繪製。"""
+        view_index = self.model.insert(item)
+        if view_index < 0:
+            return
+        if view_index < self._top:
+            self._top += 1  # 保持畫面上看到的內容不跳動
+        self._render()
+
+    def remove_item(self, item):
+        self._selected.discard(item)
+        view_index = self.model.remove(item)
+        if view_index < 0:
+            return
+        if view_index < self._top:
+            self._top -= 1
+        self._clamp_top()
+        self._render()
+
+    def size(self):
+        """符合目前篩選條件的項目數。"""
+        return len(self.model.view_items)
+
+    def index_of(self, item):
+        return self.model.index_of(item)
+
+    # --- 選取 ---
+
+    def selected_item(self):
+        """回傳目前選取的項目 (無選取時為 None)；多選時優先回傳最近一次點擊的項目。"""
+        if self._anchor in self._selected:
+            return self._anchor
+        return next(iter(self._selected), None)
+
+    def selected_items(self):
+        """回傳所有選取的項目 (已排序)，包含因篩選而暫時看不到的項目。"""
+        return sorted(self._selected)
+
+    def select_item(self, item, notify=True):
+        """選取指定項目並捲動到可見範圍；notify 為 True 時觸發 <<ListboxSelect>>。"""
+        index = self.index_of(item)
+        if index < 0:
+            return False
+        self._selected = {item}
+        self._anchor = item
+        self.see(index)
+        self._render()
+        if notify:
+            self.event_generate('<<ListboxSelect>>')
+        return True
+
+    def clear_selection(self):
+        self._selected.clear()
+        self._render()
+
+    # --- 捲動與繪製 ---
+
+    def see(self, index):
+        if index < self._top:
+            self._top = index
+        elif index >= self._top + self._visible_rows:
+            self._top = index - self._visible_rows + 1
+        self._clamp_top()
+        self._render()
+
+    def yview(self, *args):
+        """供 Scrollbar 呼叫，支援 moveto 與 scroll 兩種指令。"""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self._top = int(float(args[1]) * len(self.model.view_items))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            step = self._visible_rows if args[2] == 'pages' else 1
+            self._top += amount * step
+        self._clamp_top()
+        self._render()
+
+    def _scroll_by(self, rows):
+        self._top += rows
+        self._clamp_top()
+        self._render()
+        return "break"
+
+    def _on_mousewheel(self, event):
+        # Windows 上 delta 為 120 的倍數，macOS 則為較小的整數
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_by(-delta * 3)
+
+    def _on_configure(self, event=None):
+        row_height = tkfont.Font(font=self._listbox.cget('font')).metrics('linespace') + 1
+        bbox = self._listbox.bbox(0)
+        if bbox:
+            row_height = bbox[3] + 1
+        self._visible_rows = max(1, self._listbox.winfo_height() // max(1, row_height))
+        self._clamp_top()
+        self._render()
+
+    def _clamp_top(self):
+        max_top = max(0, len(self.model.view_items) - self._visible_rows)
+        self._top = min(max(0, self._top), max_top)
+
+    def _render(self):
+        """只把可見範圍內的項目放進 Tk Listbox，並同步捲軸與選取狀態。"""
+        with span("tk.plates_listbox"):
+            visible = self.model.view_items[self._top:self._top + self._visible_rows]
+            self._listbox.delete(0, 'end')
+            if visible:
+                self._listbox.insert('end', *visible)
+            for row, item in enumerate(visible):
+                if item in self._selected:
+                    self._listbox.selection_set(row)
+            total = len(self.model.view_items)
+            if total:
+                self._scrollbar.set(self._top / total, min(1.0, (self._top + len(visible)) / total))
+            else:
+                self._scrollbar.set(0.0, 1.0)
+
+    # --- 事件 ---
+
+    def _on_listbox_select(self, event):
+        rows = self._listbox.curselection()
+        if not rows:
+            return
+        item = self.model.view_items[self._top + rows[0]]
+        self._selected = {item}
+        self._anchor = item
+        self._render()  # 清除其他頁面上仍被選取的列
+        self.event_generate('<<ListboxSelect>>')
+
+    def _item_at(self, event):
+        row = self._listbox.nearest(event.y)
+        index = self._top + row
+        if row < 0 or index >= len(self.model.view_items):
+            return None
+        return self.model.view_items[index]
+
+    def _on_toggle_click(self, event):
+        item = self._item_at(event)
+        if item is not None:
+            if item in self._selected:
+                self._selected.discard(item)
+            else:
+                self._selected.add(item)
+                self._anchor = item
+            self._render()
+            self.event_generate('<<ListboxSelect>>')
+        return "break"
+
+    def _on_range_click(self, event):
+        item = self._item_at(event)
+        if item is None:
+            return "break"
+        anchor_index = self.index_of(self._anchor) if self._anchor is not None else -1
+        if anchor_index < 0:
+            self._selected = {item}
+            self._anchor = item
+        else:
+            index = self.index_of(item)
+            low, high = min(anchor_index, index), max(anchor_index, index)
+            self._selected = set(self.model.view_items[low:high + 1])
+        self._render()
+        self.event_generate('<<ListboxSelect>>')
+        return "break"
+
+    def _move_selection(self, step):
+        if not self.model.view_items:
+            return "break"
+        current = self.selected_item()
+        index = self.index_of(current) if current is not None else -1
+        new_index = min(max(0, index + step), len(self.model.view_items) - 1)
+        self.select_item(self.model.view_items[new_index])
+        return "break"
+
+
+class Filmstrip(Frame):
+    """
+    水平的縮圖列，只繪製可見範圍內的縮圖，可用於數千張圖片的資料夾。
+    縮圖以 load_thumbnail(路徑, (寬, 高)) 在背景執行緒解碼 (回傳 PIL 圖片)，
+    完成後在主執行緒以 to_photo() 轉為 Tk 圖片；已轉換的縮圖以 LRU 方式保留最多 cache_size 張。
+    點擊縮圖時觸發 <<FilmstripActivate>> (activated_index 為被點擊的位置)；
+    Ctrl+點擊 切換選取、Shift+點擊 選取範圍時觸發 <<FilmstripSelect>>。
+    """
+
+    POLL_INTERVAL_MS = 40
+
+    def __init__(self, master, load_thumbnail, to_photo, thumb_size=96, cache_size=300, workers=2):
+        super().__init__(master)
+        self.load_thumbnail = load_thumbnail
+        self.to_photo = to_photo
+        self.thumb_size = thumb_size
+        self.slot_width = thumb_size + 8
+        self.cache_size = cache_size
+        self.paths = []
+        self.done = set()
+        self.selected = set()
+        self.current = None
+        self.activated_index = None
+        self._anchor = None
+        self._photos = OrderedDict()   # 位置 -> Tk 圖片
+        self._pending = {}             # 位置 -> Future
+        self._polling = False
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+
+        self.canvas = Canvas(self, height=thumb_size + 24, bg="gray25", highlightthickness=0)
+        self.canvas.pack(fill='x')
+        self._scrollbar = Scrollbar(self, orient='horizontal', command=self._xview)
+        self._scrollbar.pack(fill='x')
+        self.canvas.configure(xscrollcommand=self._scrollbar.set)
+
+        self.canvas.bind('<Configure>', lambda e: self._render())
+        self.canvas.bind('<Button-1>', self._on_click)
+        self.canvas.bind('<Control-Button-1>', self._on_toggle_click)
+        self.canvas.bind('<Shift-Button-1>', self._on_range_click)
+        self.canvas.bind('<MouseWheel>', self._on_mousewheel)
+        self.canvas.bind('<Button-4>', lambda e: self._xview('scroll', -3, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self._xview('scroll', 3, 'units'))
+
+    # --- 資料 ---
+
+    def set_items(self, paths):
+        """以新的圖片列表取代全部內容；尚未完成的舊解碼工作結果會被捨棄。"""
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self._photos.clear()
+        self.paths = list(paths)
+        self.done.clear()
+        self.selected.clear()
+        self.current = None
+        self._anchor = None
+        self.canvas.configure(scrollregion=(0, 0, len(self.paths) * self.slot_width, self.thumb_size + 24),
+                              xscrollincrement=self.slot_width)
+        self.canvas.xview_moveto(0)
+        self._render()
+
+    def set_current(self, index):
+        self.current = index
+        self.see(index)
+        self._render()
+
+    def mark_done(self, indices):
+        self.done.update(indices)
+        self.selected.difference_update(indices)
+        self._render()
+
+    def selected_indices(self):
+        return sorted(self.selected)
+
+    def clear_selection(self):
+        self.selected.clear()
+        self._render()
+
+    def see(self, index):
+        if not self.paths or index is None or index >= len(self.paths):
+            return
+        first, last = self._visible_range()
+        if index < first or index >= last - 1:
+            self.canvas.xview_moveto(max(0, index - 1) / len(self.paths))
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- 繪製 ---
+
+    def _xview(self, *args):
+        self.canvas.xview(*args)
+        self._render()
+
+    def _on_mousewheel(self, event):
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self._xview('scroll', -delta * 3, 'units')
+
+    def _visible_range(self):
+        left = self.canvas.canvasx(0)
+        right = self.canvas.canvasx(self.canvas.winfo_width())
+        first = max(0, int(left // self.slot_width))
+        last = min(len(self.paths), int(right // self.slot_width) + 1)
+        return first, last
+
+    def _render(self):
+        with span("tk.filmstrip"):
+            self.canvas.delete('all')
+            first, last = self._visible_range()
+            # 捲出畫面的縮圖若還沒開始解碼就取消，讓可見範圍優先
+            for index in [i for i in self._pending if not first <= i < last]:
+                if self._pending[index].cancel():
+                    del self._pending[index]
+
+            size = self.thumb_size
+            for index in range(first, last):
+                x = index * self.slot_width + 4
+                if index == self.current:
+                    outline, width = "gold", 3
+                elif index in self.selected:
+                    outline, width = "deep sky blue", 3
+                else:
+                    outline, width = "gray50", 1
+                self.canvas.create_rectangle(x, 4, x + size, 4 + size, outline=outline, width=width)
+                photo = self._photos.get(index)
+                if photo is not None:
+                    self._photos.move_to_end(index)
+                    self.canvas.create_image(x + size / 2, 4 + size / 2, image=photo)
+                else:
+                    self.canvas.create_text(x + size / 2, 4 + size / 2, text="…", fill="gray70")
+                    self._request(index)
+                if index in self.done:
+                    self.canvas.create_rectangle(x, 4, x + size, 4 + size, fill="gray20", stipple="gray50", width=0)
+                    self.canvas.create_text(x + size - 10, 14, text="✓", fill="lime green", font=("Arial", 12, "bold"))
+                self.canvas.create_text(x + size / 2, size + 14, text=f"{index + 1}", fill="white", font=("Arial", 8))
+
+    def _request(self, index):
+        if index in self._pending:
+            return
+        self._pending[index] = self._executor.submit(self.load_thumbnail, self.paths[index],
+                                                     (self.thumb_size, self.thumb_size))
+        if not self._polling:
+            self._polling = True
+            self.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        """在主執行緒中收取已完成的縮圖；舊列表的工作已從 _pending 移除，結果自然會被捨棄。"""
+        changed = False
+        for index, future in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[index]
+            if future.cancelled() or future.exception() is not None:
+                continue
+            self._photos[index] = self.to_photo(future.result())
+            changed = True
+        while len(self._photos) > self.cache_size:
+            self._photos.popitem(last=False)
+        if changed:
+            self._render()
+        if self._pending:
+            self.after(self.POLL_INTERVAL_MS, self._poll)
+        else:
+            self._polling = False
+
+    # --- 事件 ---
+
+    def _index_at(self, event):
+        index = int(self.canvas.canvasx(event.x) // self.slot_width)
+        return index if 0 <= index < len(self.paths) else None
+
+    def _on_click(self, event):
+        index = self._index_at(event)
+        if index is None:
+            return
+        self.selected = {index}
+        self._anchor = index
+        self.activated_index = index
+        self._render()
+        self.event_generate('<<FilmstripActivate>>')
+
+    def _on_toggle_click(self, event):
+        index = self._index_at(event)
+        if index is not None:
+            if index in self.selected:
+                self.selected.discard(index)
+            else:
+                self.selected.add(index)
+                self._anchor = index
+            self._render()
+            self.event_generate('<<FilmstripSelect>>')
+        return "break"
+
+    def _on_range_click(self, event):
+        index = self._index_at(event)
+        if index is None:
+            return "break"
+        if self._anchor is None:
+            self.selected = {index}
+            self._anchor = index
+        else:
+            low, high = min(self._anchor, index), max(self._anchor, index)
+            self.selected = set(range(low, high + 1))
+        self._render()
+        self.event_generate('<<FilmstripSelect>>')
+        return "break"